@@ -0,0 +1,86 @@
+"""Бенчмарк контроля допуска: python benchmarks/bench_admission.py
+
+Моделирует пик записи: пул из CAPACITY потоков (gunicorn --threads)
+обрабатывает поток «просмотров» (available_dates, долгие) вперемешку с
+записями (create, короткие). Сравнивает задержку записей без
+core.middleware.AdmissionControlMiddleware и с ним.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis_backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from core.middleware import AdmissionControlMiddleware  # noqa: E402
+
+BROWSE = "/api/consultations/available_dates/"
+WRITE = "/api/consultations/"
+
+
+def make_view(browse_ms, write_ms):
+    def view(request):
+        time.sleep((browse_ms if request.method == "GET" else write_ms) / 1000)
+        return HttpResponse()
+    return view
+
+
+def run(handler, browse, writes, arrival_ms):
+    factory = RequestFactory()
+    requests = []
+    for i in range(browse + writes):
+        if i % ((browse + writes) // writes) == 0:
+            requests.append(factory.post(WRITE))
+        else:
+            requests.append(factory.get(BROWSE))
+
+    def timed(request, submitted):
+        response = handler(request)
+        return request.method, response.status_code, time.perf_counter() - submitted
+
+    capacity = settings.ADMISSION_CONTROL["CAPACITY"]
+    with ThreadPoolExecutor(capacity) as pool:
+        futures = []
+        for request in requests:
+            futures.append(pool.submit(timed, request, time.perf_counter()))
+            time.sleep(arrival_ms / 1000)
+        results = [future.result() for future in futures]
+    write_latency = sorted(elapsed for method, _, elapsed in results
+                           if method == "POST")
+    shed = sum(status == 503 for _, status, _ in results)
+    return write_latency, shed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--browse", type=int, default=300)
+    parser.add_argument("--writes", type=int, default=30)
+    parser.add_argument("--browse-ms", type=float, default=40)
+    parser.add_argument("--write-ms", type=float, default=5)
+    parser.add_argument("--arrival-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    view = make_view(args.browse_ms, args.write_ms)
+    for name, handler in (("without", view),
+                          ("with", AdmissionControlMiddleware(view))):
+        latency, shed = run(handler, args.browse, args.writes, args.arrival_ms)
+        p95 = latency[int(len(latency) * 0.95) - 1]
+        print(f"{name:>7} admission: writes p50 "
+              f"{statistics.median(latency) * 1000:7.1f} ms, p95 "
+              f"{p95 * 1000:7.1f} ms, shed {shed} browse requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Бенчмарк входа: python benchmarks/bench_login.py
+
+1. Проверок пароля в секунду на одно ядро для PBKDF2 (по умолчанию в
+   Django) и для Argon2 с параметрами из настроек ARGON2_*.
+2. Задержка event loop при пачке одновременных входов: проверка пароля
+   прямо в loop (как в синхронном представлении) против пула
+   core.hashers.login_executor, которым пользуется /api/login/.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis_backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+
+from core.hashers import check_login_password, login_executor  # noqa: E402
+
+HASHERS = {
+    "pbkdf2": "pbkdf2_sha256",
+    "argon2": "argon2",
+}
+
+
+def verify_rate(algorithm, seconds):
+    encoded = make_password("secret", hasher=algorithm)
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        check_login_password("secret", encoded)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+async def loop_lag(encoded, logins, offload):
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not done.is_set():
+            expected = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - expected)
+
+    async def one_login():
+        if offload:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                login_executor(), check_login_password, "secret", encoded)
+        else:
+            check_login_password("secret", encoded)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await task
+    return logins / elapsed, lag
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--logins", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"cpu_count={os.cpu_count()}")
+    for name, algorithm in HASHERS.items():
+        rate = verify_rate(algorithm, args.seconds)
+        print(f"{name:>7}: {rate:8.1f} logins/s per core")
+    for name, algorithm in HASHERS.items():
+        encoded = make_password("secret", hasher=algorithm)
+        for offload in (False, True):
+            rate, lag = asyncio.run(loop_lag(encoded, args.logins, offload))
+            mode = "pool" if offload else "inline"
+            print(f"{name:>7} {mode:>6}: {rate:8.1f} logins/s, "
+                  f"max event loop lag {lag * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Бенчмарк профилирующего middleware: python benchmarks/bench_profiling.py
+
+Замеряет накладные расходы core.middleware.RequestProfilingMiddleware на
+запрос, когда профилирование выключено (нет заголовка, доля выборки 0),
+по сравнению с прямым вызовом представления.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis_backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from core.middleware import RequestProfilingMiddleware  # noqa: E402
+
+RESPONSE = HttpResponse("ok")
+
+
+def view(request):
+    return RESPONSE
+
+
+def per_call(handler, request, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        handler(request)
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    request = RequestFactory().get("/api/consultations/available_dates/")
+    middleware = RequestProfilingMiddleware(view)
+    bare = per_call(view, request, args.calls)
+    wrapped = per_call(middleware, request, args.calls)
+    print(f"      view: {bare * 1e9:8.0f} ns/request")
+    print(f"middleware: {wrapped * 1e9:8.0f} ns/request "
+          f"(+{(wrapped - bare) * 1e9:.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
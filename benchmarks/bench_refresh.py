@@ -0,0 +1,71 @@
+"""Бенчмарк проверки отзыва refresh-токенов: python benchmarks/bench_refresh.py
+
+Создаёт временную тестовую БД, записывает N отозванных токенов и сравнивает
+проверку JTI запросом RevokedToken.objects.filter(jti=...).exists() на
+каждый refresh с core.revocation.RevocationList (фильтр Блума в памяти,
+в БД — только положительные ответы).
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis_backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.utils.timezone import now  # noqa: E402
+
+from core.models import RevokedToken  # noqa: E402
+from core.revocation import RevocationList  # noqa: E402
+
+
+def rate(check, jtis):
+    started = time.perf_counter()
+    for jti in jtis:
+        check(jti)
+    return len(jtis) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--revoked", type=int, default=50000)
+    parser.add_argument("--checks", type=int, default=20000)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        expires_at = now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=uuid.uuid4().hex, expires_at=expires_at)
+             for _ in range(args.revoked)], batch_size=5000)
+        jtis = [uuid.uuid4().hex for _ in range(args.checks)]
+
+        def database(jti):
+            return RevokedToken.objects.filter(jti=jti).exists()
+
+        revocations = RevocationList()
+        started = time.perf_counter()
+        revocations.is_revoked("warm-up")
+        build = time.perf_counter() - started
+
+        print(f"revoked={args.revoked} checks={args.checks} "
+              f"vendor={connection.vendor}")
+        print(f"database: {rate(database, jtis):10.0f} checks/s")
+        print(f"   bloom: {rate(revocations.is_revoked, jtis):10.0f} checks/s "
+              f"(build {build * 1000:.0f} ms, "
+              f"{len(revocations._bloom.bits) / 1024:.0f} KiB, "
+              f"false positives {revocations.false_positives})")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
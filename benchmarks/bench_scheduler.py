@@ -0,0 +1,76 @@
+"""Бенчмарк распределения заявок: python benchmarks/bench_scheduler.py
+
+Генерирует 10 000 ожидающих заявок (по умолчанию) на 14 дней и замеряет
+только расчёт расписания в памяти (core.scheduling.plan_schedule);
+запись результата — один bulk_update в транзакции.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis_backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils.timezone import localdate, make_aware  # noqa: E402
+
+from core.scheduling import plan_schedule  # noqa: E402
+
+
+def generate(pending_count, doctors, clinics, days, seed):
+    rng = random.Random(seed)
+    first_day = localdate() + timedelta(days=1)
+    doctor_clinics = [rng.sample(range(clinics), 2) for _ in range(doctors)]
+    booked = []
+    for doctor_id in range(doctors):
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            clinic_id = rng.choice(doctor_clinics[doctor_id])
+            for hour in rng.sample(range(9, 17), 3):
+                start = make_aware(datetime(day.year, day.month, day.day, hour))
+                booked.append((doctor_id, clinic_id, start,
+                               start + timedelta(hours=1)))
+    pending = []
+    for consultation_id in range(pending_count):
+        day = first_day + timedelta(days=rng.randrange(days))
+        start = make_aware(datetime(day.year, day.month, day.day,
+                                    rng.randrange(9, 17)))
+        doctor_id = rng.randrange(doctors)
+        pending.append((consultation_id, doctor_id,
+                        rng.choice(doctor_clinics[doctor_id]), start))
+    return pending, booked, first_day + timedelta(days=days - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pending", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--clinics", type=int, default=20)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pending, booked, last_day = generate(
+        args.pending, args.doctors, args.clinics, args.days, args.seed)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        assignments, unplaced = plan_schedule(pending, booked, last_day)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"pending={len(pending)} booked={len(booked)} "
+          f"scheduled={len(assignments)} unplaced={len(unplaced)}")
+    print(f"best={best * 1000:.1f} ms "
+          f"({len(pending) / best:,.0f} requests/s)")
+
+
+if __name__ == "__main__":
+    main()
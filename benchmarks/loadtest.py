@@ -0,0 +1,479 @@
+"""Нагрузочный тест сценариев записи: python benchmarks/loadtest.py
+
+Гоняет запущенный сервер (runserver, gunicorn, docker-compose) по пути
+пациента: register/ → login/ → specializations →
+clinics_by_specialization → doctors_by_clinic → available_dates →
+POST consultations, после чего администратор назначает время
+(set_schedule) и подтверждает оплату (set_paid_status) одной из
+завершённых консультаций.
+
+Модели нагрузки:
+  --concurrency N           N виртуальных пользователей подряд проходят
+                            сценарии (закрытая модель);
+  --rate R --concurrency N  сценарии начинаются пуассоновским потоком
+                            R в секунду, одновременно не больше N
+                            (открытая модель, ожидание свободного места
+                            входит во время сценария).
+Останов по --journeys или --duration.
+
+Отчёт: пропускная способность, перцентили задержки и доли ответов по
+шагам: ok (2xx), conflict (400/409/422 — отказ по правилам записи),
+shed (429/503 — контроль допуска) и error (остальное, обрывы).
+Оборванный запрос повторяется один раз, только если он идемпотентен
+(GET и т. п. или запрос с Idempotency-Key); оборванная попытка
+остаётся в отчёте как error. --json
+сохраняет результат, --compare сравнивает его с прошлым прогоном и с
+--fail-on-regression завершается с кодом 1, если p95 шага или
+пропускная способность ухудшились больше порога.
+
+--seed создаёт через ORM (та же база, что у сервера) администратора,
+клиники, врачей и завершённые консультации для оплаты.
+
+    python benchmarks/loadtest.py --seed --concurrency 8 --journeys 200 \\
+        --json before.json
+    python benchmarks/loadtest.py --concurrency 8 --journeys 200 \\
+        --compare before.json --fail-on-regression 20
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+STEPS = (
+    "register", "login", "specializations", "clinics_by_specialization",
+    "doctors_by_clinic", "available_dates", "book", "set_schedule",
+    "set_paid_status", "journey")
+PERCENTILES = (50, 90, 95, 99)
+PASSWORD = "load-test-password"
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def outcome(status):
+    if 200 <= status < 300:
+        return "ok"
+    if status in (400, 409, 422):
+        return "conflict"
+    if status in (429, 503):
+        return "shed"
+    return "error"
+
+
+def percentile(values, p):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class Client:
+    """HTTP-клиент с keep-alive соединением на поток."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.connection_class = (http.client.HTTPSConnection
+                                 if parts.scheme == "https"
+                                 else http.client.HTTPConnection)
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = self.connection_class(
+                self.netloc, timeout=self.timeout)
+        return self.local.connection
+
+    def request(self, method, path, data=None, token=None, params=None,
+                headers=None):
+        """Возвращает (статус, JSON-ответ или None); 0 — обрыв соединения."""
+        url = self.prefix + path
+        if params:
+            url += "?" + urlencode(params)
+        headers = dict(headers or {})
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        connection = self._connection()
+        try:
+            connection.request(method, url, body, headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            # Сервер может закрыть простаивающее keep-alive соединение:
+            # следующий запрос пойдёт по новому.
+            connection.close()
+            self.local.connection = None
+            return 0, None
+        try:
+            return response.status, json.loads(payload) if payload else None
+        except ValueError:
+            return response.status, None
+
+
+def retryable(method, headers):
+    """Можно ли повторить запрос после обрыва: повтор POST/PATCH без
+    Idempotency-Key мог бы выполнить действие дважды."""
+    return method in IDEMPOTENT_METHODS or "Idempotency-Key" in (headers or {})
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.journeys = defaultdict(int)
+
+    def add(self, step, elapsed, result):
+        with self.lock:
+            self.latency[step].append(elapsed)
+            self.outcomes[step][result] += 1
+
+    def finish_journey(self, completed):
+        with self.lock:
+            self.journeys["completed" if completed else "aborted"] += 1
+
+    def summary(self, wall_time):
+        steps = {}
+        requests = 0
+        for step in STEPS:
+            latency = sorted(self.latency.get(step, ()))
+            if not latency:
+                continue
+            outcomes = dict(self.outcomes[step])
+            count = len(latency)
+            if step != "journey":
+                requests += count
+            steps[step] = {
+                "count": count,
+                "outcomes": outcomes,
+                "error_rate": round(outcomes.get("error", 0) / count, 4),
+                "conflict_rate": round(outcomes.get("conflict", 0) / count, 4),
+                "shed_rate": round(outcomes.get("shed", 0) / count, 4),
+                "mean_ms": round(sum(latency) / count * 1000, 2),
+                "max_ms": round(latency[-1] * 1000, 2),
+                **{f"p{p}_ms": round(percentile(latency, p) * 1000, 2)
+                   for p in PERCENTILES},
+            }
+        journeys = dict(self.journeys)
+        return {
+            "wall_time_s": round(wall_time, 3),
+            "requests": requests,
+            "requests_per_s": round(requests / wall_time, 2),
+            "journeys": journeys,
+            "journeys_per_s": round(
+                journeys.get("completed", 0) / wall_time, 2),
+            "steps": steps,
+        }
+
+
+class Journey:
+    """Один сценарий пациента и действия администратора по его записи."""
+
+    def __init__(self, client, recorder, admin_token, paid_pool, run_id):
+        self.client = client
+        self.recorder = recorder
+        self.admin_token = admin_token
+        self.paid_pool = paid_pool
+        self.paid_lock = threading.Lock()
+        self.run_id = run_id
+
+    def step(self, name, method, path, **kwargs):
+        """Оборванный запрос повторяется один раз, если это безопасно
+        (см. retryable); каждая попытка попадает в отчёт, оборванная —
+        как error."""
+        for attempt in range(2):
+            started = time.perf_counter()
+            status, data = self.client.request(method, path, **kwargs)
+            self.recorder.add(
+                name, time.perf_counter() - started, outcome(status))
+            if status or attempt or not retryable(
+                    method, kwargs.get("headers")):
+                return status, data
+
+    def __call__(self, index, submitted=None):
+        started = submitted or time.perf_counter()
+        completed = self.run(index, random.Random(f"{self.run_id}-{index}"))
+        self.recorder.add(
+            "journey", time.perf_counter() - started,
+            "ok" if completed else "error")
+        self.recorder.finish_journey(completed)
+
+    def run(self, index, rng):
+        username = f"load-{self.run_id}-{index}"
+        status, _ = self.step("register", "POST", "/api/register/", data={
+            "username": username, "password": PASSWORD,
+            "email": f"{username}@example.com", "role": "patient"})
+        if status != 201:
+            return False
+        status, data = self.step("login", "POST", "/api/login/", data={
+            "username": username, "password": PASSWORD})
+        if status != 200:
+            return False
+        token = data["access"]
+
+        status, data = self.step(
+            "specializations", "GET",
+            "/api/consultations/specializations/", token=token)
+        if status != 200 or not data["specializations"]:
+            return False
+        specialization = rng.choice(data["specializations"])
+        status, data = self.step(
+            "clinics_by_specialization", "GET",
+            "/api/consultations/clinics_by_specialization/", token=token,
+            params={"specialization": specialization})
+        if status != 200 or not data["clinics"]:
+            return False
+        clinic = rng.choice(data["clinics"])["id"]
+        status, data = self.step(
+            "doctors_by_clinic", "GET",
+            "/api/consultations/doctors_by_clinic/", token=token,
+            params={"specialization": specialization, "clinic": clinic})
+        if status != 200 or not data:
+            return False
+        doctor = rng.choice(data)["id"]
+        status, data = self.step(
+            "available_dates", "GET",
+            "/api/consultations/available_dates/", token=token,
+            params={"doctor": doctor})
+        if status != 200 or not data["available_dates"]:
+            return False
+        day = rng.choice(data["available_dates"])
+        hour, scheduled_hour = rng.sample(range(9, 17), 2)
+        start_time = f"{day}T{hour:02d}:00:00+00:00"
+
+        status, data = self.step(
+            "book", "POST", "/api/consultations/", token=token,
+            data={"doctor": doctor, "clinic": clinic, "start_time": start_time},
+            headers={"Idempotency-Key": str(uuid.uuid4())})
+        if status != 201:
+            return False
+        booked = data["id"]
+        # set_schedule проверяет пересечения и с самой консультацией,
+        # поэтому администратор назначает другой час того же дня.
+        status, _ = self.step(
+            "set_schedule", "PATCH",
+            f"/api/consultations/{booked}/set_schedule/",
+            token=self.admin_token,
+            data={"start_time": f"{day}T{scheduled_hour:02d}:00:00+00:00"},
+            headers={"Idempotency-Key": str(uuid.uuid4())})
+        if status != 200:
+            return False
+        with self.paid_lock:
+            # Свежая запись ещё не завершена: без запаса завершённых
+            # консультаций шаг вернёт conflict.
+            paid = self.paid_pool.pop() if self.paid_pool else booked
+        status, _ = self.step(
+            "set_paid_status", "PATCH",
+            f"/api/consultations/{paid}/set_paid_status/",
+            token=self.admin_token,
+            headers={"Idempotency-Key": str(uuid.uuid4())})
+        return status == 200
+
+
+def seed(args):
+    """Справочники и завершённые консультации для прогона (через ORM)."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis_backend.settings")
+    import django
+
+    django.setup()
+    from datetime import timedelta
+
+    from django.utils.timezone import now
+
+    from core.models import (Clinic, Consultation, DoctorProfile,
+                             Specialization, User)
+
+    admin = User.objects.filter(username=args.admin_user).first()
+    if admin is None:
+        User.objects.create_superuser(
+            username=args.admin_user, password=args.admin_password,
+            role="admin")
+    rng = random.Random(0)
+    specializations = [Specialization.objects.get_or_create(name=name)[0]
+                       for name in ("Кардиолог", "Терапевт", "Невролог")]
+    clinics = [Clinic.objects.get_or_create(
+        name=f"Load clinic {index}",
+        defaults={"legal_address": "-", "physical_address": "-"})[0]
+        for index in range(args.seed_clinics)]
+    patient, _ = User.objects.get_or_create(
+        username="load-seed-patient", defaults={"role": "patient"})
+    finished = now() - timedelta(days=30)
+    for index in range(args.seed_doctors):
+        doctor, created = User.objects.get_or_create(
+            username=f"load-doctor-{index}",
+            defaults={"role": "doctor", "last_name": f"Врач {index}"})
+        if not created:
+            continue
+        profile = DoctorProfile.objects.create(
+            user=doctor, specialization=specializations[
+                index % len(specializations)])
+        clinic = rng.choice(clinics)
+        profile.clinics.add(clinic)
+        for day in range(args.seed_finished // args.seed_doctors):
+            start = finished + timedelta(days=day)
+            Consultation.objects.create(
+                doctor=doctor, patient=patient, clinic=clinic,
+                start_time=start, end_time=start + timedelta(hours=1),
+                status="завершена")
+    print(f"seed: {len(clinics)} клиник, {args.seed_doctors} врачей, "
+          f"администратор {args.admin_user}")
+
+
+def run(args):
+    client = Client(args.url, args.timeout)
+    status, data = client.request("POST", "/api/login/", data={
+        "username": args.admin_user, "password": args.admin_password})
+    if status != 200:
+        sys.exit(f"Не удалось войти администратором ({status}): {data}")
+    admin_token = data["access"]
+    status, data = client.request(
+        "GET", "/api/consultations/", token=admin_token,
+        params={"status": "завершена"})
+    paid_pool = [item["id"] for item in data] if status == 200 else []
+    random.Random(0).shuffle(paid_pool)
+
+    recorder = Recorder()
+    journey = Journey(client, recorder, admin_token, paid_pool,
+                      args.run_id or uuid.uuid4().hex[:8])
+    limit = args.journeys if args.journeys else math.inf
+    deadline = time.perf_counter() + args.duration if args.duration else math.inf
+    started = time.perf_counter()
+    if args.rate:
+        arrivals = random.Random(1)
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            index = 0
+            next_arrival = time.perf_counter()
+            while index < limit and next_arrival < deadline:
+                time.sleep(max(next_arrival - time.perf_counter(), 0))
+                pool.submit(journey, index, next_arrival)
+                index += 1
+                next_arrival += arrivals.expovariate(args.rate)
+    else:
+        counter = iter(range(10 ** 12))
+        counter_lock = threading.Lock()
+
+        def user():
+            while time.perf_counter() < deadline:
+                with counter_lock:
+                    index = next(counter)
+                if index >= limit:
+                    return
+                journey(index)
+
+        threads = [threading.Thread(target=user)
+                   for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    summary = recorder.summary(time.perf_counter() - started)
+    summary["meta"] = {
+        "label": args.label,
+        "url": args.url,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "paid_pool": len(paid_pool),
+    }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{summary['requests']} запросов за {summary['wall_time_s']} с: "
+          f"{summary['requests_per_s']} req/s, "
+          f"{summary['journeys_per_s']} сценариев/с, {summary['journeys']}")
+    print(f"{'шаг':<27}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+          f"{'conflict':>10}{'shed':>7}{'error':>7}")
+    for step, stats in summary["steps"].items():
+        print(f"{step:<27}{stats['count']:>7}{stats['p50_ms']:>9.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+              f"{stats['max_ms']:>9.1f}{stats['conflict_rate']:>10.1%}"
+              f"{stats['shed_rate']:>7.1%}{stats['error_rate']:>7.1%}")
+
+
+def compare(summary, baseline, threshold):
+    """Печатает разницу с прошлым прогоном; возвращает список регрессий."""
+
+    def change(new, old):
+        return (new - old) / old * 100 if old else 0.0
+
+    regressions = []
+    print(f"\nсравнение с {baseline['meta'].get('label') or 'baseline'}:")
+    throughput = change(summary["requests_per_s"], baseline["requests_per_s"])
+    print(f"{'req/s':<27}{baseline['requests_per_s']:>9} → "
+          f"{summary['requests_per_s']:<9}{throughput:+7.1f}%")
+    if threshold is not None and -throughput > threshold:
+        regressions.append("req/s")
+    for step, stats in summary["steps"].items():
+        old = baseline["steps"].get(step)
+        if old is None:
+            continue
+        p95 = change(stats["p95_ms"], old["p95_ms"])
+        print(f"{step:<27}p95 {old['p95_ms']:>8.1f} → {stats['p95_ms']:<8.1f}"
+              f"{p95:+7.1f}%  error {old['error_rate']:.1%} → "
+              f"{stats['error_rate']:.1%}")
+        if threshold is not None and p95 > threshold:
+            regressions.append(step)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float,
+                        help="сценариев в секунду (открытая модель)")
+    parser.add_argument("--journeys", type=int, default=100)
+    parser.add_argument("--duration", type=float,
+                        help="секунд; вместе с --journeys — что наступит раньше")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--admin-user", default="loadadmin")
+    parser.add_argument("--admin-password", default="loadadmin-password")
+    parser.add_argument("--run-id", help="префикс имён пациентов")
+    parser.add_argument("--label", help="метка прогона, например commit")
+    parser.add_argument("--json", help="файл для результата")
+    parser.add_argument("--compare", help="JSON прошлого прогона")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT")
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--seed-clinics", type=int, default=5)
+    parser.add_argument("--seed-doctors", type=int, default=30)
+    parser.add_argument("--seed-finished", type=int, default=600)
+    args = parser.parse_args()
+    if args.duration and args.journeys == parser.get_default("journeys"):
+        args.journeys = 0
+
+    if args.seed:
+        seed(args)
+    summary = run(args)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(summary, output, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous:
+            regressions = compare(summary, json.load(previous),
+                                  args.fail_on_regression)
+        if regressions:
+            sys.exit(f"Регрессия больше {args.fail_on_regression}%: "
+                     f"{', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from .models import (Clinic, Consultation, ConsultationAuditEntry,
+                     ConsultationSeries, DoctorProfile, PatientProfile,
+                     Specialization, User)
+from .pagination import EstimatedCountPaginator
+from .sharding import DIRECTORY_DB, locate, shard_aliases
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Иначе админка делает второй COUNT(*) по всей таблице.
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Выбор шарда: список консультаций строится по одной базе."""
+    title = "шард"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def queryset(self, request, queryset):
+        if self.value() in shard_aliases():
+            return queryset.using(self.value())
+        return queryset
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
+    list_display = ("username", "last_name", "first_name", "role",
+                    "is_active")
+    list_filter = ("role", "is_active", "is_staff")
+    search_fields = ("=username", "last_name")
+    ordering = ("username",)
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ("Роль", {"fields": ("role", "middle_name")}),
+    )
+    add_fieldsets = BaseUserAdmin.add_fieldsets + (
+        ("Роль", {"fields": ("role",)}),
+    )
+
+
+@admin.register(Clinic)
+class ClinicAdmin(admin.ModelAdmin):
+    list_display = ("name", "physical_address", "latitude", "longitude", "shard")
+    search_fields = ("name",)
+    ordering = ("name",)
+
+
+@admin.register(Specialization)
+class SpecializationAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    search_fields = ("name",)
+    ordering = ("name",)
+
+
+@admin.register(DoctorProfile)
+class DoctorProfileAdmin(LargeTableAdmin):
+    list_display = ("user", "specialization")
+    list_select_related = ("user", "specialization")
+    list_filter = ("specialization",)
+    raw_id_fields = ("user",)
+    autocomplete_fields = ("specialization", "clinics")
+    search_fields = ("=user__username", "user__last_name")
+
+
+@admin.register(PatientProfile)
+class PatientProfileAdmin(LargeTableAdmin):
+    list_display = ("user", "phone", "email")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    search_fields = ("=user__username", "=phone")
+
+
+@admin.register(Consultation)
+class ConsultationAdmin(LargeTableAdmin):
+    list_display = ("id", "start_time", "status", "doctor", "patient",
+                    "clinic")
+    list_select_related = ("doctor", "patient", "clinic")
+    list_filter = ("status", ShardListFilter)
+    date_hierarchy = "start_time"
+    ordering = ("-start_time",)
+    raw_id_fields = ("doctor", "patient", "series")
+    autocomplete_fields = ("clinic",)
+    search_fields = ("=id", "=doctor__username", "=patient__username")
+    readonly_fields = ("created_at", "updated_at")
+
+    def get_list_select_related(self, request):
+        # В шарде нет таблиц пользователей и клиник для JOIN.
+        if request.GET.get("shard", DIRECTORY_DB) != DIRECTORY_DB:
+            return ()
+        return super().get_list_select_related(request)
+
+    def get_object(self, request, object_id, from_field=None):
+        shard = locate(Consultation, object_id) if from_field is None else None
+        if shard in (None, DIRECTORY_DB):
+            return super().get_object(request, object_id, from_field)
+        return self.get_queryset(request).using(shard).filter(
+            pk=object_id).first()
+
+
+@admin.register(ConsultationSeries)
+class ConsultationSeriesAdmin(LargeTableAdmin):
+    list_display = ("id", "start_time", "rule", "doctor", "patient", "clinic",
+                    "cancelled_at")
+    list_select_related = ("doctor", "patient", "clinic")
+    ordering = ("-id",)
+    raw_id_fields = ("doctor", "patient")
+    autocomplete_fields = ("clinic",)
+    search_fields = ("=id", "=doctor__username", "=patient__username")
+    readonly_fields = ("created_at",)
+
+
+@admin.register(ConsultationAuditEntry)
+class ConsultationAuditEntryAdmin(LargeTableAdmin):
+    list_display = ("recorded_at", "consultation_id", "event",
+                    "previous_status", "status", "actor_id")
+    list_filter = ("event", "status")
+    search_fields = ("=consultation_id", "=doctor_id")
+    ordering = ("-id",)
+
+    # Журнал только дополняется.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+class AdmissionController:
+    """Счётчики одновременных запросов процесса с приоритетами.
+
+    Класс допускается, пока общее число запросов в работе меньше
+    CAPACITY * share (share=None — без ограничения), а у эндпоинта может
+    быть собственный лимит. Не допущенный сразу запрос ждёт освобождения
+    места не дольше queue_timeout своего класса. Ожидающий запрос занимает
+    поток воркера, поэтому в очереди класса не больше max_queue запросов,
+    остальные отклоняются сразу.
+    """
+
+    def __init__(self, capacity, classes, endpoints, default_class):
+        self.capacity = capacity
+        self.classes = classes
+        self.endpoints = endpoints
+        self.default_class = default_class
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.by_class = Counter()
+        self.by_endpoint = Counter()
+        self.waiting = Counter()
+        self.rejected = Counter()
+
+    def classify(self, url_name, method):
+        """Возвращает (класс, лимит эндпоинта) по имени URL и методу."""
+        rule = self.endpoints.get(f"{url_name} {method}")
+        if rule is None:
+            rule = self.endpoints.get(url_name, (self.default_class, None))
+        return rule
+
+    def _admissible(self, endpoint, priority, limit):
+        share = self.classes[priority]["share"]
+        if share is not None and self.in_flight >= self.capacity * share:
+            return False
+        return limit is None or self.by_endpoint[endpoint] < limit
+
+    def _enter(self, endpoint, priority):
+        self.in_flight += 1
+        self.by_class[priority] += 1
+        self.by_endpoint[endpoint] += 1
+
+    def try_acquire(self, endpoint, priority, limit):
+        with self._condition:
+            if not self._admissible(endpoint, priority, limit):
+                return False
+            self._enter(endpoint, priority)
+            return True
+
+    def enqueue(self, endpoint, priority):
+        """Занимает место в очереди класса; False — очередь полна."""
+        with self._condition:
+            if self.waiting[priority] >= self.classes[priority].get(
+                    "max_queue", float("inf")):
+                self.rejected[endpoint] += 1
+                return False
+            self.waiting[priority] += 1
+            return True
+
+    def dequeue(self, priority):
+        with self._condition:
+            self.waiting[priority] -= 1
+
+    def acquire(self, endpoint, priority, limit):
+        """Ждёт места до queue_timeout класса; False — запрос отклонён."""
+        if self.try_acquire(endpoint, priority, limit):
+            return True
+        if not self.enqueue(endpoint, priority):
+            return False
+        deadline = time.monotonic() + self.classes[priority]["queue_timeout"]
+        try:
+            with self._condition:
+                while not self._admissible(endpoint, priority, limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected[endpoint] += 1
+                        return False
+                    self._condition.wait(remaining)
+                self._enter(endpoint, priority)
+                return True
+        finally:
+            self.dequeue(priority)
+
+    def reject(self, endpoint):
+        with self._condition:
+            self.rejected[endpoint] += 1
+
+    def release(self, endpoint, priority):
+        with self._condition:
+            self.in_flight -= 1
+            self.by_class[priority] -= 1
+            self.by_endpoint[endpoint] -= 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "by_class": {name: count for name, count in self.by_class.items() if count},
+                "by_endpoint": {name: count for name, count in self.by_endpoint.items() if count},
+                "waiting": {name: count for name, count in self.waiting.items() if count},
+                "rejected": dict(self.rejected),
+            }
+
+
+def admission_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            config = settings.ADMISSION_CONTROL
+            _controller = AdmissionController(
+                config["CAPACITY"], config["CLASSES"], config["ENDPOINTS"],
+                config["DEFAULT_CLASS"])
+        return _controller
+
+
+@receiver(setting_changed)
+def reset_admission_controller(setting, **kwargs):
+    global _controller
+    if setting == "ADMISSION_CONTROL":
+        _controller = None
@@ -0,0 +1,116 @@
+from datetime import datetime, time, timedelta
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.timezone import make_aware
+
+from .models import Clinic, Consultation, User
+from .sharding import fan_out, is_sharded
+from .signals import consultation_changed
+
+SPANS = {"day": 1, "week": 7}
+FIELDS = ("id", "start_time", "end_time", "status", "patient_id", "clinic_id")
+
+
+def _generation_key(doctor_id):
+    return f"agenda:generation:{doctor_id}"
+
+
+def generation(doctor_id):
+    # Новое поколение начинается с времени, а не с 1: если счётчик
+    # вытеснен из кеша, старые записи агенды не совпадут с новым ключом.
+    return cache.get_or_set(_generation_key(doctor_id), time_ns, None)
+
+
+def bump_generation(doctor_id):
+    try:
+        cache.incr(_generation_key(doctor_id))
+    except ValueError:
+        cache.set(_generation_key(doctor_id), time_ns(), None)
+
+
+def period(day, span):
+    """Начало и конец (не включительно) дня или недели с понедельника."""
+    if span == "week":
+        day -= timedelta(days=day.weekday())
+    start = make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=SPANS[span])
+
+
+def _rows(doctor_id, start, end):
+    queryset = Consultation.objects.filter(
+        doctor_id=doctor_id, start_time__gte=start,
+        start_time__lt=end).order_by("start_time")
+    if not is_sharded():
+        return list(queryset.values(
+            *FIELDS, "patient__last_name", "patient__first_name",
+            "clinic__name"))
+    # Пользователи и клиники есть только в базе-справочнике, поэтому
+    # имена подставляются отдельно — по одному запросу на таблицу.
+    rows = sorted(fan_out(queryset.values(*FIELDS)),
+                  key=lambda row: row["start_time"])
+    patients = {
+        patient["id"]: patient for patient in User.objects.filter(
+            id__in={row["patient_id"] for row in rows}).values(
+            "id", "last_name", "first_name")}
+    clinics = dict(Clinic.objects.filter(
+        id__in={row["clinic_id"] for row in rows}).values_list("id", "name"))
+    for row in rows:
+        patient = patients.get(row["patient_id"], {})
+        row["patient__last_name"] = patient.get("last_name", "")
+        row["patient__first_name"] = patient.get("first_name", "")
+        row["clinic__name"] = clinics.get(row["clinic_id"], "")
+    return rows
+
+
+def build_agenda(doctor_id, start, end):
+    return [{
+        "id": row["id"],
+        "start_time": row["start_time"],
+        "end_time": row["end_time"],
+        "status": row["status"],
+        "patient": {
+            "id": row["patient_id"],
+            "name": f"{row['patient__last_name']} {row['patient__first_name']}".strip(),
+        },
+        "clinic": {"id": row["clinic_id"], "name": row["clinic__name"]},
+    } for row in _rows(doctor_id, start, end)]
+
+
+def doctor_agenda(doctor_id, day, span):
+    """Консультации врача за день или неделю из кеша.
+
+    Ключ кеша содержит поколение агенды врача, которое увеличивается
+    после любой записи в его консультации, поэтому устаревшие записи
+    просто перестают читаться и вытесняются по AGENDA_CACHE_TTL.
+    """
+    start, end = period(day, span)
+    key = f"agenda:{doctor_id}:{generation(doctor_id)}:{span}:{start.date()}"
+    consultations = cache.get(key)
+    if consultations is None:
+        consultations = build_agenda(doctor_id, start, end)
+        cache.set(key, consultations, settings.AGENDA_CACHE_TTL)
+    return {
+        "doctor": doctor_id,
+        "range": span,
+        "date_from": start.date(),
+        "date_to": (end - timedelta(days=1)).date(),
+        "consultations": consultations,
+    }
+
+
+@receiver(consultation_changed)
+def invalidate_agenda(sender, event, rows, using, **kwargs):
+    doctor_ids = {row["doctor_id"] for row in rows}
+    # При смене врача устаревает и расписание прежнего.
+    doctor_ids.update(row["previous_doctor_id"] for row in rows
+                      if row.get("previous_doctor_id"))
+
+    def bump():
+        for doctor_id in doctor_ids:
+            bump_generation(doctor_id)
+
+    transaction.on_commit(bump, using=using, robust=True)
@@ -0,0 +1,175 @@
+import atexit
+import contextvars
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .models import ConsultationAuditEntry
+from .sharding import DIRECTORY_DB
+from .signals import consultation_changed
+
+logger = logging.getLogger(__name__)
+
+_actor = contextvars.ContextVar("audit_actor", default=None)
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def set_actor(user_id):
+    """Кто меняет консультации в текущем запросе; возвращает токен для
+    reset_actor()."""
+    return _actor.set(user_id)
+
+
+def reset_actor(token):
+    _actor.reset(token)
+
+
+class AuditBuffer:
+    """Отложенная запись журнала изменений пачками.
+
+    Изменения попадают в буфер после фиксации транзакции и вставляются
+    bulk_create по batch_size строк фоновым потоком раз в flush_interval
+    секунд (или сразу, когда набралась пачка). Границы потерь:
+    - при аварийном завершении процесса теряется не больше изменений,
+      зафиксированных за последние flush_interval секунд, и не больше
+      max_pending строк; при обычном завершении буфер сбрасывается;
+    - если буфер дорос до max_pending, запись делает сам запрос, так что
+      рост буфера ограничен, а не теряются строки;
+    - если база журнала недоступна, самые старые строки сверх max_pending
+      отбрасываются, число таких строк — в dropped.
+    flush_interval=None — без фонового потока (пачки пишутся в потоке
+    запроса), так работает тестовый режим.
+    """
+
+    def __init__(self, batch_size, flush_interval, max_pending):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def append(self, entries):
+        with self._lock:
+            self._pending.extend(entries)
+            pending = len(self._pending)
+        if pending >= self.max_pending or (
+                self.flush_interval is None and pending >= self.batch_size):
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+        self._start()
+
+    def flush(self):
+        """Записывает всё из буфера; возвращает число записанных строк."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(
+                        min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return written
+                try:
+                    ConsultationAuditEntry.objects.using(
+                        DIRECTORY_DB).bulk_create(batch)
+                except Exception:
+                    self._requeue(batch)
+                    raise
+                written += len(batch)
+
+    def _requeue(self, batch):
+        with self._lock:
+            self._pending.extendleft(reversed(batch))
+            overflow = len(self._pending) - self.max_pending
+            for _ in range(max(overflow, 0)):
+                self._pending.popleft()
+        if overflow > 0:
+            self.dropped += overflow
+            logger.error("Журнал изменений: отброшено %d записей.", overflow)
+
+    def _start(self):
+        if self.flush_interval is None or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Журнал изменений: ошибка записи пачки.")
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+
+def audit_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AuditBuffer(
+                settings.AUDIT_LOG_BATCH_SIZE, settings.AUDIT_LOG_FLUSH_INTERVAL,
+                settings.AUDIT_LOG_MAX_PENDING)
+        return _buffer
+
+
+@receiver(setting_changed)
+def reset_audit_buffer(setting, **kwargs):
+    global _buffer
+    if setting.startswith("AUDIT_LOG_") and _buffer is not None:
+        _buffer.stop()
+        _buffer = None
+
+
+@atexit.register
+def flush_on_exit():
+    if _buffer is not None:
+        try:
+            _buffer.flush()
+        except Exception:
+            logger.exception("Журнал изменений: не удалось сбросить буфер.")
+
+
+@receiver(consultation_changed)
+def record_consultation_changes(sender, event, rows, using, **kwargs):
+    recorded_at = now()
+    actor_id = _actor.get()
+    entries = [ConsultationAuditEntry(
+        consultation_id=row["id"],
+        doctor_id=row["doctor_id"],
+        patient_id=row["patient_id"],
+        clinic_id=row["clinic_id"],
+        event=event,
+        previous_status=row.get("previous_status"),
+        status=row["status"],
+        start_time=row["start_time"],
+        end_time=row["end_time"],
+        actor_id=actor_id,
+        recorded_at=recorded_at,
+    ) for row in rows]
+    # В журнал попадают только зафиксированные изменения.
+    transaction.on_commit(
+        lambda: audit_buffer().append(entries), using=using, robust=True)
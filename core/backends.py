@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import check_login_password, login_executor
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend, проверяющий пароль в ограниченном пуле потоков.
+
+    Одновременно хешируется не больше LOGIN_HASHING_WORKERS паролей на
+    процесс, сколько бы входов ни ждало (см. core.hashers.login_executor);
+    устаревший хеш заменяется при входе. Остальное — как у ModelBackend.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            user = None
+        # Для несуществующего пользователя хеширование тоже выполняется,
+        # чтобы время ответа не выдавало, есть ли такой username.
+        is_correct, new_password = login_executor().submit(
+            check_login_password, password,
+            user.password if user else None).result()
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if new_password:
+            user.password = new_password
+            user.save(update_fields=["password"])
+        return user
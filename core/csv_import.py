@@ -0,0 +1,88 @@
+import codecs
+import csv
+import io
+import json
+import sys
+from contextlib import contextmanager
+
+FORMATS = ("csv", "jsonl", "json")
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(stream, fmt):
+    """Построчно читает строки импорта из текстового потока.
+
+    Форматы: csv, jsonl (по объекту на строку) и json (массив объектов,
+    читается целиком). Вместо строки, которую не удалось разобрать,
+    выдаётся RowError — импорт записывает её в ошибки и идёт дальше.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    yield RowError(f"Некорректный JSON: {exc}.")
+    elif fmt == "json":
+        try:
+            rows = json.load(stream)
+        except ValueError as exc:
+            yield RowError(f"Некорректный JSON: {exc}.")
+            return
+        if not isinstance(rows, list):
+            yield RowError("Ожидался JSON-массив объектов.")
+            return
+        yield from rows
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+
+def text_stream(binary, chunk_size=64 * 1024):
+    """Текстовый поток файла в UTF-8 (с BOM или без).
+
+    Кодировка проверяется по всему файлу до чтения строк: ошибка
+    декодирования посреди импорта оставила бы часть порций применённой.
+    Файл должен поддерживать seek(); ValueError, если это не UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while chunk := binary.read(chunk_size):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise ValueError(
+            f"Файл должен быть в кодировке UTF-8 (байт {exc.start}).") from exc
+    binary.seek(0)
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def file_format(name, fmt=None):
+    """Формат файла: явно заданный или по расширению; ValueError, если
+    он не поддерживается."""
+    fmt = fmt or name.rsplit(".", 1)[-1]
+    if fmt not in FORMATS:
+        raise ValueError("Поддерживаются форматы csv, jsonl и json.")
+    return fmt
+
+
+def upload_rows(upload, fmt=None):
+    """Строки загруженного файла; ValueError, если формат или кодировка
+    не подходят."""
+    return read_rows(text_stream(upload.file), file_format(upload.name, fmt))
+
+
+@contextmanager
+def path_rows(path, fmt=None):
+    """Строки файла по пути или из stdin ('-'); ValueError, если формат
+    или кодировка не подходят."""
+    fmt = file_format(path, fmt)
+    # stdin нельзя перемотать: он читается целиком, чтобы text_stream
+    # проверил кодировку до начала импорта.
+    with (io.BytesIO(sys.stdin.buffer.read()) if path == "-"
+          else open(path, "rb")) as binary:
+        yield read_rows(text_stream(binary), fmt)
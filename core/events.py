@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .signals import consultation_changed
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def to_event(event, row):
+    return {
+        "event": event,
+        "id": row["id"],
+        "doctor": row["doctor_id"],
+        "patient": row["patient_id"],
+        "clinic": row["clinic_id"],
+        "status": row["status"],
+        "previous_status": row.get("previous_status"),
+        "start_time": _isoformat(row["start_time"]),
+        "end_time": _isoformat(row["end_time"]),
+    }
+
+
+def format_event(event):
+    return (f"event: {event['event']}\n"
+            f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+
+
+class Subscription:
+    """Очередь событий одного подключения, живущая в его event loop."""
+
+    def __init__(self, doctor_id=None, clinic_id=None, maxsize=100):
+        self.doctor_id = doctor_id
+        self.clinic_id = clinic_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def matches(self, event):
+        if self.doctor_id is not None and event["doctor"] != self.doctor_id:
+            return False
+        return self.clinic_id is None or event["clinic"] == self.clinic_id
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент: поток закроется, клиент переподключится
+            # и догонит изменения через /api/consultations/sync/.
+            self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """Pub/sub внутри одного процесса.
+
+    Подписчики индексируются по врачу или клинике, поэтому публикация
+    затрагивает только подходящие подключения, а не все открытые.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    @staticmethod
+    def _key(doctor_id, clinic_id):
+        if doctor_id is not None:
+            return ("doctor", doctor_id)
+        if clinic_id is not None:
+            return ("clinic", clinic_id)
+        return ("all",)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        keys = (("doctor", event["doctor"]), ("clinic", event["clinic"]), ("all",))
+        with self._lock:
+            targets = [subscription
+                       for key in keys
+                       for subscription in self._subscribers.get(key, ())]
+        for subscription in targets:
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.deliver, event)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт.
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers)
+                       for subscribers in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, doctor_id=None, clinic_id=None):
+        subscription = Subscription(doctor_id, clinic_id)
+        key = self._key(doctor_id, clinic_id)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(key, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscribers.pop(key, None)
+
+
+class RedisBroker(LocalBroker):
+    """Общий для нескольких воркеров брокер поверх Redis pub/sub.
+
+    Каждый процесс держит одно подключение к Redis и раздаёт полученные
+    события своим локальным подписчикам.
+    """
+
+    def __init__(self, url=None, channel="consultation-events"):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "Для RedisBroker нужен пакет redis.") from exc
+        self._url = url or settings.CONSULTATION_EVENTS_REDIS_URL
+        self._channel = channel
+        self._client = redis.Redis.from_url(self._url)
+        self._listeners = {}
+
+    def publish(self, event):
+        self._client.publish(self._channel, json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, doctor_id=None, clinic_id=None):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        async with super().subscribe(doctor_id, clinic_id) as subscription:
+            yield subscription
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self._url)
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(self._channel)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    self.dispatch(json.loads(message["data"]))
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.CONSULTATION_EVENTS_BACKEND)()
+        return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting.startswith("CONSULTATION_EVENTS_"):
+        _broker = None
+
+
+@receiver(consultation_changed)
+def publish_consultation_events(sender, event, rows, using, **kwargs):
+    events = [to_event(event, row) for row in rows]
+
+    def publish():
+        broker = get_broker()
+        for item in events:
+            broker.publish(item)
+
+    transaction.on_commit(publish, using=using, robust=True)
+
+
+async def event_stream(doctor_id=None, clinic_id=None):
+    heartbeat = settings.CONSULTATION_EVENTS_HEARTBEAT
+    async with get_broker().subscribe(doctor_id, clinic_id) as subscription:
+        yield "retry: 3000\n\n"
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_event(event)
@@ -0,0 +1,122 @@
+import math
+
+from django.db.models import Q
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash точки: соседние точки почти всегда имеют общий префикс."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = ((lon_range, longitude) if even
+                                else (lat_range, latitude))
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Высота и ширина ячейки geohash длины precision в градусах."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def neighbourhood(latitude, longitude, precision):
+    """Ячейка точки и восемь соседних (без повторов у полюсов)."""
+    height, width = cell_size(precision)
+    cells = set()
+    for d_lat in (-height, 0, height):
+        lat = latitude + d_lat
+        if not -90 <= lat <= 90:
+            continue
+        for d_lon in (-width, 0, width):
+            lon = (longitude + d_lon + 180) % 360 - 180
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def covered_radius(latitude, precision):
+    """Радиус (км), в котором все точки гарантированно попадают в
+    neighbourhood(): расстояние до края блока 3×3 ячеек."""
+    height, width = cell_size(precision)
+    widest = min(90.0, abs(latitude) + height)
+    return KM_PER_DEGREE * min(height, width * math.cos(math.radians(widest)))
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(
+        lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _after_prefix(cell):
+    """Наименьший geohash, идущий после всех строк с префиксом cell
+    (None, если таких нет): последний символ увеличивается в алфавите
+    BASE32, «z» переносится в предыдущий разряд."""
+    while cell:
+        position = BASE32.index(cell[-1])
+        if position + 1 < len(BASE32):
+            return cell[:-1] + BASE32[position + 1]
+        cell = cell[:-1]
+    return None
+
+
+def prefix_filter(cells, field="geohash"):
+    # Диапазон вместо startswith: LIKE не использует индекс в SQLite и
+    # в PostgreSQL с не-C локалью, а сравнение строк — использует всегда.
+    # Границы составлены только из цифр и строчных букв BASE32, поэтому
+    # порядок одинаков в любой сортировке БД (en_US.utf8 тоже), в отличие
+    # от пунктуации вроде «~».
+    condition = Q()
+    for cell in cells:
+        bounds = {f"{field}__gte": cell}
+        upper = _after_prefix(cell)
+        if upper is not None:
+            bounds[f"{field}__lt"] = upper
+        condition |= Q(**bounds)
+    return condition
+
+
+def _by_distance(items, latitude, longitude):
+    return sorted(
+        ((item, distance_km(latitude, longitude, item.latitude, item.longitude))
+         for item in items),
+        key=lambda pair: pair[1])
+
+
+def nearest(queryset, latitude, longitude, limit, start_precision=6):
+    """K ближайших объектов queryset с полями latitude/longitude/geohash.
+
+    Поиск начинается с блока 3×3 ячеек geohash длины start_precision
+    (около 1 км) и укрупняет ячейки, пока в гарантированно покрытом
+    радиусе не найдётся limit объектов. Каждый шаг — запрос по индексу
+    geohash; если объектов мало, в конце просматриваются все объекты с
+    координатами. Возвращает список (объект, расстояние в км).
+    """
+    queryset = queryset.exclude(geohash="")
+    for precision in range(start_precision, 0, -1):
+        found = _by_distance(queryset.filter(prefix_filter(
+            neighbourhood(latitude, longitude, precision))),
+            latitude, longitude)
+        radius = covered_radius(latitude, precision)
+        within = [pair for pair in found if pair[1] <= radius]
+        if len(within) >= limit:
+            return within[:limit]
+    return _by_distance(queryset, latitude, longitude)[:limit]
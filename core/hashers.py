@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (Argon2PasswordHasher, make_password,
+                                         verify_password)
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_login_executor = None
+_login_executor_lock = threading.Lock()
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 с параметрами из настроек ARGON2_*.
+
+    При изменении параметров must_update() вернёт True, и пароль будет
+    перехеширован при следующем входе.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+def setup_worker():
+    # При запуске через spawn/forkserver дочерний процесс стартует без
+    # настроенного Django; при fork настройки уже унаследованы.
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def password_pool(workers=None):
+    """Пул процессов для хеширования паролей (PBKDF2 держит GIL)."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=setup_worker)
+
+
+def make_passwords(passwords, pool=None, chunksize=16):
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def login_executor():
+    """Ограниченный пул потоков для проверки паролей при входе.
+
+    hashlib.pbkdf2_hmac и argon2 отпускают GIL, поэтому потоки
+    загружают все ядра, не блокируя event loop.
+    """
+    global _login_executor
+    with _login_executor_lock:
+        if _login_executor is None:
+            _login_executor = ThreadPoolExecutor(
+                max_workers=settings.LOGIN_HASHING_WORKERS,
+                thread_name_prefix="login-hash")
+        return _login_executor
+
+
+@receiver(setting_changed)
+def reset_login_executor(setting, **kwargs):
+    global _login_executor
+    if setting == "LOGIN_HASHING_WORKERS":
+        _login_executor = None
+
+
+def check_login_password(password, encoded):
+    """Проверяет пароль и при необходимости готовит новый хеш.
+
+    Возвращает (is_correct, new_encoded или None). Для несуществующего
+    пользователя (encoded=None) тратит столько же времени на хеширование.
+    """
+    if encoded is None:
+        make_password(password)
+        return False, None
+    is_correct, must_update = verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, make_password(password)
+    return is_correct, None
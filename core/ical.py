@@ -0,0 +1,147 @@
+import hashlib
+import heapq
+from datetime import datetime, time, timedelta, timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils.timezone import localdate, make_aware
+
+from .models import Clinic, Consultation, ConsultationTombstone, User
+from .sharding import is_sharded, shard_aliases
+
+FIELDS = ("id", "start_time", "end_time", "status", "updated_at",
+          "doctor_id", "patient_id", "clinic_id")
+NAME_FIELDS = ("doctor__last_name", "doctor__first_name",
+               "patient__last_name", "patient__first_name", "clinic__name")
+STATUSES = {"ожидает": "TENTATIVE"}
+
+
+def feed_filter(user):
+    """Условие на консультации ленты и начало её окна.
+
+    В ленту попадают консультации пользователя, начиная с
+    CALENDAR_FEED_PAST_DAYS дней назад: фильтр по врачу или пациенту и
+    диапазон start_time обслуживаются одним составным индексом.
+    """
+    since = make_aware(datetime.combine(
+        localdate() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS), time.min))
+    owner = "doctor_id" if user.role == "doctor" else "patient_id"
+    return Q(**{owner: user.id}), since
+
+
+def feed_version(user):
+    """(ETag, Last-Modified) ленты без чтения самих консультаций.
+
+    Агрегаты по индексам: последний updated_at и число консультаций (в
+    каждом шарде) и последнее удаление из надгробий. Начало окна входит
+    в ETag, потому что старые консультации выпадают из ленты.
+    """
+    owner, since = feed_filter(user)
+    last_modified, count = None, 0
+    for alias in shard_aliases():
+        state = Consultation.objects.using(alias).filter(
+            owner, start_time__gte=since).aggregate(
+            last=Max("updated_at"), count=Count("id"))
+        deleted = ConsultationTombstone.objects.using(alias).filter(
+            owner, deleted_at__gte=since).aggregate(last=Max("deleted_at"))["last"]
+        count += state["count"]
+        for moment in (state["last"], deleted):
+            if moment and (last_modified is None or moment > last_modified):
+                last_modified = moment
+    digest = hashlib.sha256(
+        f"{user.id}:{user.calendar_token}:{since.date()}:{count}:{last_modified}".encode())
+    return digest.hexdigest()[:32], last_modified
+
+
+def _rows(user):
+    owner, since = feed_filter(user)
+    queryset = Consultation.objects.filter(
+        owner, start_time__gte=since).order_by("start_time")
+    if not is_sharded():
+        yield from queryset.values(*FIELDS, *NAME_FIELDS).iterator(chunk_size=500)
+        return
+    # Пользователи и клиники есть только в базе-справочнике: имена
+    # подставляются пачками, строки шардов сливаются по start_time.
+    streams = [queryset.using(alias).values(*FIELDS).iterator(chunk_size=500)
+               for alias in shard_aliases()]
+    merged = heapq.merge(*streams, key=lambda row: row["start_time"])
+    while chunk := list(islice(merged, 500)):
+        users = {item["id"]: item for item in User.objects.filter(
+            id__in={row[field] for row in chunk
+                    for field in ("doctor_id", "patient_id")}).values(
+            "id", "last_name", "first_name")}
+        clinics = dict(Clinic.objects.filter(
+            id__in={row["clinic_id"] for row in chunk}).values_list("id", "name"))
+        for row in chunk:
+            for role in ("doctor", "patient"):
+                person = users.get(row[f"{role}_id"], {})
+                row[f"{role}__last_name"] = person.get("last_name", "")
+                row[f"{role}__first_name"] = person.get("first_name", "")
+            row["clinic__name"] = clinics.get(row["clinic_id"], "")
+            yield row
+
+
+def _escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Строки длиннее 75 октетов переносятся по RFC 5545."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        # Не разрезаем многобайтовый символ UTF-8.
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _timestamp(value):
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _name(row, role):
+    return f"{row[f'{role}__last_name']} {row[f'{role}__first_name']}".strip()
+
+
+def _event(row, user):
+    if user.role == "doctor":
+        summary = f"Приём: {_name(row, 'patient')}"
+    else:
+        summary = f"Консультация: {_name(row, 'doctor')}"
+    lines = (
+        "BEGIN:VEVENT",
+        f"UID:consultation-{row['id']}@mis",
+        f"DTSTAMP:{_timestamp(row['updated_at'])}",
+        f"LAST-MODIFIED:{_timestamp(row['updated_at'])}",
+        f"DTSTART:{_timestamp(row['start_time'])}",
+        f"DTEND:{_timestamp(row['end_time'])}",
+        f"SUMMARY:{_escape(summary)}",
+        f"LOCATION:{_escape(row['clinic__name'])}",
+        f"DESCRIPTION:{_escape('Статус: ' + row['status'])}",
+        f"STATUS:{STATUSES.get(row['status'], 'CONFIRMED')}",
+        "END:VEVENT",
+    )
+    return "".join(_fold(line) for line in lines)
+
+
+def render_feed(user):
+    """Лента iCalendar пользователя по частям, по одной на консультацию."""
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//MIS Backend//Consultations//RU",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape('Консультации')}",
+    ))
+    for row in _rows(user):
+        yield _event(row, user)
+    yield "END:VCALENDAR\r\n"
@@ -0,0 +1,121 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def _fingerprint(request):
+    # Строка запроса входит в отпечаток: ?dry_run=1 и настоящий запрос —
+    # разные запросы.
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(
+        f"{request.method} {request.get_full_path()}\n{body}".encode()).hexdigest()
+
+
+def _is_abandoned(record, fingerprint):
+    if record.status_code is not None or record.fingerprint != fingerprint:
+        return False
+    return record.claimed_at <= now() - settings.IDEMPOTENCY_CLAIM_LEASE
+
+
+def _take_over(record):
+    """Перехватывает ключ оборванного запроса, у которого истекла аренда.
+
+    Условный UPDATE отдаёт ключ только одному из параллельных повторов.
+    """
+    claimed_at = now()
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True,
+        claimed_at=record.claimed_at).update(claimed_at=claimed_at)
+    record.claimed_at = claimed_at
+    return bool(taken)
+
+
+def _claim(user, key, fingerprint):
+    """Возвращает (запись, True), если ключ занят этим запросом, иначе
+    (сохранённая запись, False)."""
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None:
+        if record.expires_at > now():
+            return record, _is_abandoned(record, fingerprint) and _take_over(record)
+        # Просроченный ключ ещё не удалён командой prune_idempotency_keys.
+        record.delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=fingerprint,
+                expires_at=now() + settings.IDEMPOTENCY_KEY_TTL), True
+    except IntegrityError:
+        # Параллельный повтор успел занять ключ первым.
+        return IdempotencyKey.objects.get(user=user, key=key), False
+
+
+def _release(record):
+    # Ключ мог перехватить повтор после истечения аренды — его не трогаем.
+    IdempotencyKey.objects.filter(
+        pk=record.pk, claimed_at=record.claimed_at).delete()
+
+
+def idempotent(method):
+    """Повторяет сохранённый ответ для запроса с тем же Idempotency-Key.
+
+    Первый ответ (кроме 5xx) хранится IDEMPOTENCY_KEY_TTL в таблице
+    IdempotencyKey, ключи у каждого пользователя свои. Повтор с тем же
+    ключом возвращает его без вызова представления; тот же ключ с другим
+    запросом — 422, повтор во время выполнения первого запроса — 409.
+    Если первый запрос не завершился за IDEMPOTENCY_CLAIM_LEASE (воркер
+    убит), повтор выполняет его заново.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": f"{HEADER} длиннее 255 символов."}, status=400)
+
+        fingerprint = _fingerprint(request)
+        record, created = _claim(request.user, key, fingerprint)
+        if not created:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {"error": f"{HEADER} уже использован с другим запросом."},
+                    status=422)
+            if record.status_code is None:
+                response = Response(
+                    {"error": "Запрос с этим ключом ещё выполняется."},
+                    status=409)
+                response["Retry-After"] = "1"
+                return response
+            response = Response(record.response, status=record.status_code)
+            response["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = method(self, request, *args, **kwargs)
+        except APIException as exc:
+            # Ошибки валидации тоже сохраняются и повторяются как есть.
+            response = self.handle_exception(exc)
+        except Exception:
+            _release(record)
+            raise
+        if response.status_code >= 500:
+            _release(record)
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code, response=response.data)
+        return response
+
+    return wrapper
@@ -0,0 +1,133 @@
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connections
+from django.utils.timezone import localtime
+
+from .hashers import setup_worker
+from .models import Consultation, User
+from .sharding import shard_aliases
+
+FIELDS = ("id", "doctor_id", "start_time", "end_time", "clinic_id")
+ID, DOCTOR, START, END, CLINIC = range(len(FIELDS))
+
+
+def stream(first, last=None, chunk_size=2000):
+    """Консультации врачей с ID от first до last по (врач, начало).
+
+    Каждый шард отдаёт строки по индексу (doctor, start_time), потоки
+    сливаются без сортировки в памяти.
+    """
+    streams = []
+    for alias in shard_aliases():
+        queryset = Consultation.objects.using(alias).filter(doctor_id__gte=first)
+        if last is not None:
+            queryset = queryset.filter(doctor_id__lte=last)
+        streams.append(queryset.order_by("doctor_id", "start_time", "id").values_list(
+            *FIELDS).iterator(chunk_size=chunk_size))
+    return heapq.merge(*streams, key=itemgetter(DOCTOR, START, ID))
+
+
+def _day_violation(doctor_id, day, clinics):
+    return {"type": "clinics_per_day", "doctor": doctor_id,
+            "date": day.isoformat(),
+            "clinics": {str(clinic): ids for clinic, ids in sorted(clinics.items())}}
+
+
+def sweep(rows):
+    """Нарушения в консультациях одного врача, упорядоченных по началу.
+
+    Проход слева направо держит в куче по времени конца консультации, ещё
+    не закончившиеся к началу текущей: закончившиеся снимаются с вершины,
+    с каждой оставшейся текущая пересекается — отчёт по каждой паре.
+    Клиники копятся только за текущий день, поэтому память не растёт
+    с историей.
+    """
+    active = []
+    day = clinics = doctor_id = None
+    for row in rows:
+        while active and active[0][0] <= row[START]:
+            heapq.heappop(active)
+        for _, _, other in sorted(active, key=lambda item: (item[2][START], item[1])):
+            yield {"type": "overlap", "doctor": row[DOCTOR],
+                   "consultations": [other[ID], row[ID]],
+                   "clinics": [other[CLINIC], row[CLINIC]],
+                   "start_time": row[START].isoformat(),
+                   "end_time": min(row[END], other[END]).isoformat()}
+        heapq.heappush(active, (row[END], row[ID], row))
+        doctor_id = row[DOCTOR]
+        row_day = localtime(row[START]).date()
+        if row_day != day:
+            if clinics and len(clinics) > 1:
+                yield _day_violation(doctor_id, day, clinics)
+            day, clinics = row_day, {}
+        clinics.setdefault(row[CLINIC], []).append(row[ID])
+    if clinics and len(clinics) > 1:
+        yield _day_violation(doctor_id, day, clinics)
+
+
+def audit_doctors(first, last=None, chunk_size=2000):
+    """(число консультаций, нарушения) врачей с ID от first до last."""
+    counter = [0]
+
+    def counted(rows):
+        for row in rows:
+            counter[0] += 1
+            yield row
+
+    violations = []
+    for _, rows in groupby(stream(first, last, chunk_size), key=itemgetter(DOCTOR)):
+        violations.extend(sweep(counted(rows)))
+    return counter[0], violations
+
+
+def doctor_ranges(per_task):
+    """Смежные диапазоны ID врачей примерно по per_task врачей.
+
+    Диапазоны покрывают все ID, поэтому консультации пользователей, у
+    которых сменилась роль, тоже проверяются.
+    """
+    ids = list(User.objects.filter(role="doctor").order_by("id").values_list(
+        "id", flat=True))
+    ranges = []
+    first = 0
+    for last in ids[per_task - 1::per_task]:
+        ranges.append((first, last))
+        first = last + 1
+    ranges.append((first, None))
+    return ranges
+
+
+def audit_schedule(workers=None, per_task=200, chunk_size=2000):
+    """Проверяет расписание всех врачей; возвращает итоги и нарушения.
+
+    Диапазоны врачей проверяются в пуле процессов (workers=0 — в текущем
+    процессе). Соединения закрываются до запуска пула: дочерние процессы
+    открывают свои, а не делят сокеты родителя.
+    """
+    started = time.perf_counter()
+    ranges = doctor_ranges(per_task)
+    firsts, lasts = zip(*ranges)
+    chunk_sizes = [chunk_size] * len(ranges)
+    if workers == 0:
+        results = list(map(audit_doctors, firsts, lasts, chunk_sizes))
+    else:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=setup_worker) as pool:
+            results = list(pool.map(audit_doctors, firsts, lasts, chunk_sizes))
+    violations = [violation for _, found in results for violation in found]
+    elapsed = time.perf_counter() - started
+    consultations = sum(count for count, _ in results)
+    return {
+        "consultations": consultations,
+        "tasks": len(ranges),
+        "overlaps": sum(item["type"] == "overlap" for item in violations),
+        "clinics_per_day": sum(item["type"] == "clinics_per_day" for item in violations),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(consultations / elapsed, 1) if elapsed else None,
+        "violations": violations,
+    }
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.integrity import audit_schedule
+
+
+class Command(BaseCommand):
+    help = ("Проверяет расписание всех врачей: пересечения консультаций и "
+            "работу в нескольких клиниках за один день.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Процессов (по умолчанию по числу ядер, "
+                                 "0 — в текущем процессе).")
+        parser.add_argument("--doctors-per-task", type=int, default=200)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--output",
+                            help="Записать все нарушения в файл JSON Lines.")
+        parser.add_argument("--limit", type=int, default=50,
+                            help="Сколько нарушений показать в отчёте.")
+        parser.add_argument("--check", action="store_true",
+                            help="Ошибка, если найдены нарушения.")
+
+    def handle(self, *args, **options):
+        report = audit_schedule(workers=options["workers"],
+                                per_task=options["doctors_per_task"],
+                                chunk_size=options["chunk_size"])
+        violations = report.pop("violations")
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                for violation in violations:
+                    output.write(json.dumps(violation, ensure_ascii=False) + "\n")
+        report["violations"] = violations[:options["limit"]]
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        if options["check"] and violations:
+            raise CommandError(f"Нарушений в расписании: {len(violations)}.")
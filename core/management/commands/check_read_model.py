@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.read_model import check
+
+
+class Command(BaseCommand):
+    help = ("Сверяет модель чтения списка консультаций с консультациями и "
+            "справочником; с --fix исправляет расхождения.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--fix", action="store_true",
+                            help="Перезаписать расхождения.")
+        parser.add_argument("--sample", type=int, default=20,
+                            help="Сколько ID каждого вида показать.")
+
+    def handle(self, *args, **options):
+        report = check(options["batch_size"], fix=options["fix"])
+        summary = {kind: {"count": len(ids), "ids": ids[:options["sample"]]}
+                   for kind, ids in report.items()}
+        summary["fixed"] = options["fix"]
+        self.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2))
+        if not options["fix"] and any(report.values()):
+            raise CommandError("Модель чтения расходится с данными.")
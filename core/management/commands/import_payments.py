@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.csv_import import FORMATS, path_rows
+from core.payments import PaymentReconciler
+
+
+class Command(BaseCommand):
+    help = ("Отмечает оплаченными завершённые консультации из файла оплат "
+            "и выводит отчёт о несовпадениях.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу или '-' для stdin.")
+        parser.add_argument("--format", choices=FORMATS,
+                            help="Формат файла (по умолчанию по расширению).")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только сверить, статусы не менять.")
+
+    def handle(self, *args, **options):
+        reconciler = PaymentReconciler(chunk_size=options["chunk_size"],
+                                       dry_run=options["dry_run"])
+        try:
+            with path_rows(options["path"], options["format"]) as rows:
+                report = reconciler.run(rows)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.csv_import import FORMATS, path_rows
+from core.user_import import UserImporter
+
+
+class Command(BaseCommand):
+    help = "Массово импортирует врачей и пациентов из CSV/JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу или '-' для stdin.")
+        parser.add_argument("--format", choices=FORMATS,
+                            help="Формат файла (по умолчанию по расширению).")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Процессов для хеширования паролей.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = UserImporter(workers=options["workers"],
+                                chunk_size=options["chunk_size"])
+        try:
+            with path_rows(options["path"], options["format"]) as rows:
+                report = importer.run(rows)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Удаляет сохранённые ответы для просроченных ключей идемпотентности."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            expires_at__lte=now()).delete()
+        self.stdout.write(f"Удалено ключей: {deleted}")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Удаляет записи об отозванных токенах, срок которых истёк."
+
+    def handle(self, *args, **options):
+        deleted, _ = RevokedToken.objects.filter(
+            expires_at__lte=now()).delete()
+        self.stdout.write(f"Удалено записей: {deleted}")
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.models import ConsultationTombstone
+
+
+class Command(BaseCommand):
+    help = "Удаляет надгробия консультаций старше SYNC_TOMBSTONE_RETENTION."
+
+    def handle(self, *args, **options):
+        deleted, _ = ConsultationTombstone.objects.filter(
+            deleted_at__lt=now() - settings.SYNC_TOMBSTONE_RETENTION).delete()
+        self.stdout.write(f"Удалено надгробий: {deleted}")
@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharding import (move_clinic, plan_rebalance, shard_aliases,
+                           shard_for_clinic, shard_loads)
+
+
+class Command(BaseCommand):
+    help = ("Переносит консультации клиник между шардами: возвращает строки, "
+            "оказавшиеся не в своём шарде, и выравнивает нагрузку.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clinic", type=int, action="append", default=[],
+                            help="ID клиники для переноса (можно несколько).")
+        parser.add_argument("--to", dest="target",
+                            help="Шард для --clinic.")
+        parser.add_argument("--tolerance", type=float, default=0.1,
+                            help="Допустимый разрыв нагрузки от средней.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только показать план переносов.")
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if options["clinic"] and options["target"] not in aliases:
+            raise CommandError(f"Укажите --to из {aliases}.")
+
+        loads = shard_loads()
+        directory = {clinic_id: shard_for_clinic(clinic_id)
+                     for clinic_id in set(loads) | set(options["clinic"])}
+        # Строки, записанные в старый шард воркерами с устаревшим кешем
+        # каталога или оставшиеся после прерванного переноса.
+        moves = {clinic_id: directory[clinic_id]
+                 for clinic_id, counts in loads.items()
+                 if set(counts) - {directory[clinic_id]}}
+        if options["clinic"]:
+            moves.update(dict.fromkeys(options["clinic"], options["target"]))
+        else:
+            totals = {clinic_id: sum(counts.values())
+                      for clinic_id, counts in loads.items()}
+            moves.update(plan_rebalance(
+                totals, directory, aliases, options["tolerance"]))
+
+        report = {"moves": [], "dry_run": options["dry_run"]}
+        for clinic_id, target in sorted(moves.items()):
+            move = {"clinic": clinic_id, "from": directory[clinic_id],
+                    "to": target}
+            if not options["dry_run"]:
+                move["moved"] = move_clinic(
+                    clinic_id, target, options["batch_size"])
+            report["moves"].append(move)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
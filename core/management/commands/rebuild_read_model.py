@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.read_model import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Заново строит модель чтения списка консультаций из всех шардов "
+            "(после миграции или при большом расхождении).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild(options["batch_size"])
+        self.stdout.write(f"Строк в модели чтения: {count}")
@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.scheduling import schedule_pending
+
+
+class Command(BaseCommand):
+    help = "Автоматически назначает время ожидающим заявкам за период."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", required=True,
+                            help="Первая дата периода (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="date_to", required=True,
+                            help="Последняя дата периода (YYYY-MM-DD).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только рассчитать, ничего не сохранять.")
+
+    def handle(self, *args, **options):
+        date_from = parse_date(options["date_from"])
+        date_to = parse_date(options["date_to"])
+        if not date_from or not date_to or date_from > date_to:
+            raise CommandError("Укажите корректный период --from/--to.")
+        report = schedule_pending(date_from, date_to,
+                                  dry_run=options["dry_run"])
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
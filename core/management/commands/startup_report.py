@@ -0,0 +1,59 @@
+import json
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import by_package, measure_startup
+
+
+class Command(BaseCommand):
+    help = ("Замеряет холодный старт воркера до первого ответа и показывает, "
+            "какие импорты занимают больше всего времени.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/consultations/specializations/",
+                            help="Первый запрос после запуска.")
+        parser.add_argument("--repeat", type=int, default=3,
+                            help="Число запусков, в отчёт идёт медиана.")
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument("--json", action="store_true")
+        parser.add_argument("--check", action="store_true",
+                            help="Ошибка, если медиана больше STARTUP_TIME_BUDGET.")
+
+    def handle(self, *args, **options):
+        runs = [measure_startup(options["path"])
+                for _ in range(options["repeat"])]
+        # Отдельный запуск с -X importtime: он сам замедляет импорт.
+        imports = measure_startup(options["path"], importtime=True)["imports"]
+        report = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in ("total_ms", "setup_ms", "first_request_ms")}
+        report["budget_ms"] = settings.STARTUP_TIME_BUDGET * 1000
+        report["status"] = runs[0]["status"]
+        report["packages"] = [
+            {"package": package, "self_ms": round(self_us / 1000, 1)}
+            for package, self_us in by_package(imports)[:options["top"]]]
+        report["modules"] = [
+            {"module": module, "cumulative_ms": round(cumulative_us / 1000, 1)}
+            for module, _, cumulative_us in sorted(
+                imports, key=lambda item: item[2], reverse=True)[:options["top"]]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self.stdout.write(
+                f"До первого ответа: {report['total_ms']} мс (бюджет "
+                f"{report['budget_ms']:.0f} мс), из них загрузка приложения "
+                f"{report['setup_ms']} мс, первый запрос "
+                f"{report['first_request_ms']} мс, статус {report['status']}.")
+            self.stdout.write("\nСобственное время импорта по пакетам:")
+            for item in report["packages"]:
+                self.stdout.write(f"{item['self_ms']:>9.1f} мс  {item['package']}")
+            self.stdout.write("\nМодули с наибольшим суммарным временем:")
+            for item in report["modules"]:
+                self.stdout.write(f"{item['cumulative_ms']:>9.1f} мс  {item['module']}")
+        if options["check"] and report["total_ms"] > report["budget_ms"]:
+            raise CommandError(
+                f"Запуск {report['total_ms']} мс дольше бюджета "
+                f"{report['budget_ms']:.0f} мс.")
@@ -0,0 +1,216 @@
+import asyncio
+import cProfile
+import json
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import (async_to_sync, iscoroutinefunction,
+                          markcoroutinefunction, sync_to_async)
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .admission import admission_controller
+
+
+def _is_admin(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.role == "admin"
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return False
+    return result is not None and result[0].role == "admin"
+
+
+class _RequestProfile:
+    """cProfile и журнал SQL всех баз для одного запроса в текущем потоке."""
+
+    def __init__(self, request):
+        self.request = request
+        self.profile_id = "{}-{}-{}".format(
+            time.strftime("%Y%m%dT%H%M%S"), uuid.uuid4().hex[:8],
+            re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_")[:80])
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self._stack = ExitStack()
+
+    def _log_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "params": params,
+                "many": many,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            })
+
+    def __enter__(self):
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self._log_query))
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self._stack.close()
+
+    def save(self, response):
+        directory = settings.REQUEST_PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.profile_id)
+        self.profiler.dump_stats(f"{path}.prof")
+        with open(f"{path}.sql.json", "w", encoding="utf-8") as log:
+            json.dump({
+                "method": self.request.method,
+                "path": self.request.get_full_path(),
+                "status": response.status_code,
+                "duration_ms": round(self.duration * 1000, 3),
+                "query_count": len(self.queries),
+                "query_time_ms": round(
+                    sum(query["duration_ms"] for query in self.queries), 3),
+                "queries": self.queries,
+            }, log, ensure_ascii=False, indent=2, default=str)
+        response["X-Profile-Id"] = self.profile_id
+        return response
+
+
+class RequestProfilingMiddleware:
+    """Профилирование отдельных запросов в продакшене.
+
+    Запрос профилируется с вероятностью REQUEST_PROFILING_SAMPLE_RATE или
+    по заголовку REQUEST_PROFILING_HEADER (X-Profile) от администратора.
+    В REQUEST_PROFILING_DIR пишутся <id>.prof (pstats: snakeviz,
+    flameprof, gprof2dot) и <id>.sql.json с запросами ко всем базам;
+    id возвращается в заголовке X-Profile-Id. Без профилирования
+    middleware только проверяет заголовок и долю выборки.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _requested(self, request):
+        if settings.REQUEST_PROFILING_HEADER in request.META:
+            return "header"
+        rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return "sample"
+        return None
+
+    def _profile(self, request, get_response):
+        with _RequestProfile(request) as profile:
+            response = get_response(request)
+        return profile.save(response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        requested = self._requested(request)
+        if requested is None or requested == "header" and not _is_admin(request):
+            return self.get_response(request)
+        return self._profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        requested = self._requested(request)
+        if requested == "header" and not await sync_to_async(_is_admin)(request):
+            requested = None
+        if requested is None:
+            return await self.get_response(request)
+        # cProfile и журнал SQL работают в одном потоке. Остаток цепочки
+        # выполняется из общего потока синхронного кода: синхронные
+        # представления и ORM (в том числе из async-кода) попадут в него.
+        return await sync_to_async(self._profile)(
+            request, async_to_sync(self.get_response))
+
+
+class AdmissionControlMiddleware:
+    """Ограничение одновременных запросов по эндпоинтам и классам приоритета.
+
+    Класс и лимит эндпоинта берутся из ADMISSION_CONTROL по имени URL
+    (см. core.admission.AdmissionController). Запрос, которому не нашлось
+    места за queue_timeout своего класса, получает 503 с Retry-After, так
+    что просмотр расписания в пик не вытесняет запись и назначение времени.
+    """
+    sync_capable = True
+    async_capable = True
+    poll_interval = 0.005
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _ticket(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        controller = admission_controller()
+        endpoint = match.url_name or match.route
+        priority, limit = controller.classify(endpoint, request.method)
+        return controller, endpoint, priority, limit
+
+    def _reject(self, controller, priority):
+        response = JsonResponse(
+            {"error": "Сервер перегружен, повторите запрос позже."},
+            status=503)
+        response["Retry-After"] = str(
+            controller.classes[priority].get("retry_after", 1))
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        ticket = self._ticket(request)
+        if ticket is None:
+            return self.get_response(request)
+        controller, endpoint, priority, limit = ticket
+        if not controller.acquire(endpoint, priority, limit):
+            return self._reject(controller, priority)
+        try:
+            return self.get_response(request)
+        finally:
+            controller.release(endpoint, priority)
+
+    async def __acall__(self, request):
+        ticket = self._ticket(request)
+        if ticket is None:
+            return await self.get_response(request)
+        controller, endpoint, priority, limit = ticket
+        if not controller.try_acquire(endpoint, priority, limit):
+            if not controller.enqueue(endpoint, priority):
+                return self._reject(controller, priority)
+            # Ожидание в event loop без блокировки потока.
+            deadline = time.monotonic() + controller.classes[priority]["queue_timeout"]
+            try:
+                while not controller.try_acquire(endpoint, priority, limit):
+                    if time.monotonic() >= deadline:
+                        controller.reject(endpoint)
+                        return self._reject(controller, priority)
+                    await asyncio.sleep(self.poll_interval)
+            finally:
+                controller.dequeue(priority)
+        try:
+            return await self.get_response(request)
+        finally:
+            controller.release(endpoint, priority)
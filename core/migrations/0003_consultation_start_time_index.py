@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_consultation_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='consultation',
+            name='start_time',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def forwards(apps, schema_editor):
+    Specialization = apps.get_model('core', 'Specialization')
+    DoctorProfile = apps.get_model('core', 'DoctorProfile')
+    db_alias = schema_editor.connection.alias
+    names = DoctorProfile.objects.using(db_alias).values_list(
+        'specialization_name', flat=True).distinct()
+    for name in names:
+        specialization, _ = Specialization.objects.using(
+            db_alias).get_or_create(name=name)
+        DoctorProfile.objects.using(db_alias).filter(
+            specialization_name=name).update(specialization=specialization)
+
+
+def backwards(apps, schema_editor):
+    DoctorProfile = apps.get_model('core', 'DoctorProfile')
+    db_alias = schema_editor.connection.alias
+    for profile in DoctorProfile.objects.using(db_alias).select_related(
+            'specialization'):
+        profile.specialization_name = profile.specialization.name
+        profile.save(update_fields=['specialization_name'], using=db_alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_consultation_start_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Specialization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='doctorprofile',
+            old_name='specialization',
+            new_name='specialization_name',
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='specialization',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='doctors', to='core.specialization'),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
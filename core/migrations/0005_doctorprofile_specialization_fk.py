@@ -0,0 +1,23 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Отдельно от 0004: в PostgreSQL нельзя менять таблицу в той же
+    # транзакции, где обновлялись строки с отложенными FK-проверками.
+
+    dependencies = [
+        ('core', '0004_specialization'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='doctorprofile',
+            name='specialization_name',
+        ),
+        migrations.AlterField(
+            model_name='doctorprofile',
+            name='specialization',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='doctors', to='core.specialization'),
+        ),
+    ]
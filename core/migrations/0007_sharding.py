@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clinic',
+            name='shard',
+            # Существующие консультации лежат в базе default.
+            field=models.CharField(blank=True, default='default', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='consultation',
+            name='clinic',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='consultations', to='core.clinic'),
+        ),
+        migrations.AlterField(
+            model_name='consultation',
+            name='doctor',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='consultations_as_doctor', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='consultation',
+            name='patient',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='consultations_as_patient', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_clinic_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultationAuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consultation_id', models.BigIntegerField()),
+                ('doctor_id', models.BigIntegerField()),
+                ('patient_id', models.BigIntegerField()),
+                ('clinic_id', models.BigIntegerField()),
+                ('event', models.CharField(max_length=20)),
+                ('previous_status', models.CharField(blank=True, max_length=20, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['consultation_id', 'recorded_at'], name='core_consul_consult_c6537c_idx'), models.Index(fields=['doctor_id', 'recorded_at'], name='core_consul_doctor__6ba400_idx')],
+            },
+        ),
+    ]
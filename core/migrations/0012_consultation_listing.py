@@ -0,0 +1,92 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:55
+
+from itertools import islice
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import connections, migrations, models
+
+from core.sharding import DIRECTORY_DB, shard_aliases
+
+
+# Копия логики core.read_model на исторических моделях: миграция должна
+# работать и после того, как модели и read_model изменятся.
+CONSULTATION_FIELDS = (
+    'id', 'doctor_id', 'patient_id', 'clinic_id', 'status',
+    'start_time', 'end_time', 'created_at', 'updated_at', 'notes')
+BATCH_SIZE = 1000
+
+
+def full_name(user):
+    return f"{user.get('last_name', '')} {user.get('first_name', '')}".strip()
+
+
+def build(apps, rows):
+    User = apps.get_model('core', 'User')
+    Clinic = apps.get_model('core', 'Clinic')
+    ConsultationListing = apps.get_model('core', 'ConsultationListing')
+    users = {item['id']: item for item in User.objects.using(DIRECTORY_DB).filter(
+        id__in={row[field] for row in rows for field in ('doctor_id', 'patient_id')}
+    ).values('id', 'last_name', 'first_name', 'doctor_profile__specialization__name')}
+    clinics = dict(Clinic.objects.using(DIRECTORY_DB).filter(
+        id__in={row['clinic_id'] for row in rows}).values_list('id', 'name'))
+    return [ConsultationListing(
+        **row,
+        doctor_name=full_name(users.get(row['doctor_id'], {})),
+        patient_name=full_name(users.get(row['patient_id'], {})),
+        clinic_name=clinics.get(row['clinic_id'], ''),
+        specialization=users.get(row['doctor_id'], {}).get(
+            'doctor_profile__specialization__name') or '',
+    ) for row in rows]
+
+
+def backfill(apps, schema_editor):
+    # Список и выгрузка читают только ConsultationListing: без заполнения
+    # таблицы существующие консультации пропали бы из API до ручного
+    # rebuild_read_model. Таблица живёт в базе-справочнике; шарды, где
+    # консультаций ещё нет (новая установка), пропускаются.
+    if schema_editor.connection.alias != DIRECTORY_DB:
+        return
+    Consultation = apps.get_model('core', 'Consultation')
+    ConsultationListing = apps.get_model('core', 'ConsultationListing')
+    for alias in shard_aliases():
+        if Consultation._meta.db_table not in connections[alias].introspection.table_names():
+            continue
+        rows = Consultation.objects.using(alias).order_by('id').values(
+            *CONSULTATION_FIELDS).iterator(chunk_size=BATCH_SIZE)
+        while batch := list(islice(rows, BATCH_SIZE)):
+            ConsultationListing.objects.using(DIRECTORY_DB).bulk_create(
+                build(apps, batch), ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_calendar_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultationListing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(max_length=20)),
+                ('start_time', models.DateTimeField(db_index=True)),
+                ('end_time', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('doctor_name', models.CharField(blank=True, max_length=301)),
+                ('patient_name', models.CharField(blank=True, max_length=301)),
+                ('clinic_name', models.CharField(blank=True, max_length=255)),
+                ('specialization', models.CharField(blank=True, max_length=255)),
+                ('clinic', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.clinic')),
+                ('doctor', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'start_time'], name='core_consul_doctor__bb4d19_idx'), models.Index(fields=['patient', 'start_time'], name='core_consul_patient_063569_idx'), models.Index(fields=['clinic', 'start_time'], name='core_consul_clinic__d93a09_idx'), models.Index(fields=['status', 'start_time'], name='core_consul_status_d553ea_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
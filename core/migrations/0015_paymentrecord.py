@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_idempotencykey_claimed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=255, unique=True)),
+                ('consultation_id', models.BigIntegerField()),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -2,6 +2,14 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import transaction
+from django.utils.timezone import now
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import geo
+from .sharding import exists_anywhere, shard_for_new_clinic
+from .signals import SNAPSHOT_FIELDS, send_consultation_changed
 
 
 class User(AbstractUser):
@@ -18,6 +26,9 @@ class User(AbstractUser):
         max_length=150,
         blank=True,
         null=True)  # ✅ Отчество
+    # Секрет в адресе iCal-ленты (календарные приложения не умеют JWT).
+    calendar_token = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.username} ({self.last_name} {self.first_name} {self.middle_name}, {self.role})"
@@ -27,6 +38,40 @@ class Clinic(models.Model):
     name = models.CharField(max_length=255)
     legal_address = models.TextField()
     physical_address = models.TextField()
+    # Алиас базы с консультациями клиники (см. core.sharding).
+    shard = models.CharField(max_length=100, blank=True)
+    # Координаты вводит администратор; geohash считается при сохранении
+    # и служит индексом для поиска ближайших клиник (см. core.geo).
+    latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geohash = models.CharField(
+        max_length=geo.PRECISION, blank=True, db_index=True, editable=False)
+
+    def clean(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValidationError(
+                "Укажите и широту, и долготу клиники или ни одну из них.")
+
+    def save(self, *args, **kwargs):
+        if not self.shard:
+            self.shard = shard_for_new_clinic()
+        self.geohash = ("" if self.latitude is None or self.longitude is None
+                        else geo.encode(self.latitude, self.longitude))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
+class Specialization(models.Model):
+    name = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
         return self.name
@@ -37,7 +82,10 @@ class DoctorProfile(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="doctor_profile")
-    specialization = models.CharField(max_length=255)
+    specialization = models.ForeignKey(
+        Specialization,
+        on_delete=models.PROTECT,
+        related_name="doctors")
     clinics = models.ManyToManyField(Clinic, related_name="doctors")
 
     def __str__(self):
@@ -56,6 +104,66 @@ class PatientProfile(models.Model):
         return f"{self.user.last_name} {self.user.first_name} ({self.phone})"
 
 
+class ConsultationSeries(models.Model):
+    """Серия повторяющихся консультаций пациента у врача (см. core.series).
+
+    rule — правило повторения в синтаксисе RRULE (RFC 5545), start_time —
+    первое повторение; сами консультации ссылаются на серию.
+    """
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="consultation_series_as_doctor")
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="consultation_series_as_patient")
+    clinic = models.ForeignKey(
+        'Clinic',
+        on_delete=models.CASCADE,
+        related_name="consultation_series")
+    rule = models.CharField(max_length=255)
+    start_time = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Серия {self.id}: {self.rule} с {self.start_time}"
+
+
+class ConsultationQuerySet(models.QuerySet):
+
+    def create(self, **kwargs):
+        # Без явного .using() базу выбирает роутер — по clinic_id строки.
+        if self._db is not None:
+            return super().create(**kwargs)
+        consultation = self.model(**kwargs)
+        consultation.save(force_insert=True)
+        return consultation
+
+    def transition(self, status, event="status"):
+        """Массово переводит консультации в статус ``status``.
+
+        В отличие от ``.update()`` возвращает снимки изменённых строк и
+        отправляет по ним ``consultation_changed``.
+        """
+        with transaction.atomic(using=self.db):
+            rows = list(self.select_for_update().values(*SNAPSHOT_FIELDS))
+            if not rows:
+                return []
+            updated_at = now()
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), 1000):
+                self.model.objects.using(self.db).filter(
+                    id__in=ids[start:start + 1000]).update(
+                    status=status, updated_at=updated_at)
+            for row in rows:
+                row["previous_status"] = row["status"]
+                row["status"] = status
+            send_consultation_changed(event, rows, using=self.db)
+        return rows
+
+
 class Consultation(models.Model):
     STATUS_CHOICES = [
         ('подтверждена', 'Подтверждена'),
@@ -65,26 +173,49 @@ class Consultation(models.Model):
         ('оплачена', 'Оплачена'),
     ]
 
+    # В шарде нет пользователей и клиник, поэтому внешние ключи
+    # без ограничений на уровне БД.
     doctor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name="consultations_as_doctor")
+        related_name="consultations_as_doctor",
+        db_constraint=False)
     patient = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name="consultations_as_patient")
+        related_name="consultations_as_patient",
+        db_constraint=False)
     clinic = models.ForeignKey(
         'Clinic',
         on_delete=models.CASCADE,
-        related_name="consultations")
+        related_name="consultations",
+        db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    start_time = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    start_time = models.DateTimeField(db_index=True)
     end_time = models.DateTimeField()
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
         default='ожидает')
     notes = models.TextField(blank=True, null=True)
+    # Серия лежит в базе-справочнике, консультации — в шарде клиники.
+    series = models.ForeignKey(
+        ConsultationSeries,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="consultations",
+        db_constraint=False)
+
+    objects = ConsultationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Расписание и календарь врача или пациента по времени.
+            models.Index(fields=["doctor", "start_time"]),
+            models.Index(fields=["patient", "start_time"]),
+        ]
 
     def clean(self):
         overlapping_consultations = Consultation.objects.filter(
@@ -93,13 +224,14 @@ class Consultation(models.Model):
             end_time__gt=self.start_time
         ).exclude(id=self.id)
 
-        if overlapping_consultations.exists():
+        # Врач может работать в клиниках из разных шардов.
+        if exists_anywhere(overlapping_consultations):
             raise ValidationError(
                 "Доктор уже записан на другую консультацию в это время!")
 
         clinic_conflicts = overlapping_consultations.exclude(
             clinic=self.clinic)
-        if clinic_conflicts.exists():
+        if exists_anywhere(clinic_conflicts):
             raise ValidationError(
                 "Доктор не может работать в двух клиниках одновременно!")
 
@@ -109,3 +241,136 @@ class Consultation(models.Model):
 
     def __str__(self):
         return f"Консультация {self.doctor.username} с {self.patient.username} ({self.status}) в {self.clinic.name}"
+
+
+class ConsultationTombstone(models.Model):
+    consultation_id = models.BigIntegerField()
+    doctor_id = models.BigIntegerField()
+    patient_id = models.BigIntegerField()
+    clinic_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Удалена консультация {self.consultation_id} ({self.deleted_at})"
+
+
+class PaymentRecord(models.Model):
+    """Применённый платёж из файла сверки (core.payments).
+
+    По номеру платежа повторная загрузка того же файла пропускает уже
+    учтённые строки. Хранится в базе-справочнике, consultation_id — без
+    внешнего ключа, как у остальных ссылок на шардированные консультации.
+    """
+    reference = models.CharField(max_length=255, unique=True)
+    consultation_id = models.BigIntegerField()
+    recorded_at = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return f"{self.reference} → консультация {self.consultation_id}"
+
+
+class ConsultationAuditEntry(models.Model):
+    """Запись журнала изменений консультаций; журнал только дополняется.
+
+    Пишется пачками из core.audit, поэтому recorded_at — время изменения,
+    а не вставки строки.
+    """
+    consultation_id = models.BigIntegerField()
+    doctor_id = models.BigIntegerField()
+    patient_id = models.BigIntegerField()
+    clinic_id = models.BigIntegerField()
+    event = models.CharField(max_length=20)
+    previous_status = models.CharField(max_length=20, null=True, blank=True)
+    status = models.CharField(max_length=20)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["consultation_id", "recorded_at"]),
+            models.Index(fields=["doctor_id", "recorded_at"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Журнал изменений нельзя редактировать.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return (f"Консультация {self.consultation_id}: {self.event} "
+                f"{self.previous_status} → {self.status} ({self.recorded_at})")
+
+
+class ConsultationListing(models.Model):
+    """Денормализованная строка списка консультаций (см. core.read_model).
+
+    Лежит в базе-справочнике рядом с пользователями и клиниками: список,
+    поиск и выгрузка читают одну таблицу без соединений и обхода шардов.
+    """
+    id = models.BigIntegerField(primary_key=True)  # ID консультации
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING,
+        related_name="+", db_constraint=False, db_index=False)
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING,
+        related_name="+", db_constraint=False, db_index=False)
+    clinic = models.ForeignKey(
+        'Clinic', on_delete=models.DO_NOTHING,
+        related_name="+", db_constraint=False, db_index=False)
+    status = models.CharField(max_length=20)
+    start_time = models.DateTimeField(db_index=True)
+    end_time = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    notes = models.TextField(blank=True, null=True)
+    doctor_name = models.CharField(max_length=301, blank=True)
+    patient_name = models.CharField(max_length=301, blank=True)
+    clinic_name = models.CharField(max_length=255, blank=True)
+    specialization = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["doctor", "start_time"]),
+            models.Index(fields=["patient", "start_time"]),
+            models.Index(fields=["clinic", "start_time"]),
+            models.Index(fields=["status", "start_time"]),
+        ]
+
+    def __str__(self):
+        return f"Консультация {self.id}: {self.doctor_name} с {self.patient_name} ({self.status})"
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Отозван {self.jti}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # Пока запрос выполняется, ответа ещё нет.
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Когда запрос занял ключ; по нему истекает аренда незавершённого запроса.
+    claimed_at = models.DateTimeField(default=now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'выполняется'})"
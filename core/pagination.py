@@ -0,0 +1,38 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который на больших таблицах не делает COUNT(*).
+
+    В PostgreSQL число строк берётся из оценки планировщика (EXPLAIN);
+    точный COUNT выполняется, только если оценка меньше exact_threshold.
+    На других СУБД ведёт себя как обычный Paginator.
+    """
+    exact_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is None or estimate < self.exact_threshold:
+            return super().count
+        return estimate
+
+    def estimated_count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
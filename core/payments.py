@@ -0,0 +1,122 @@
+import time
+from itertools import islice
+from operator import itemgetter
+
+from .models import Consultation, PaymentRecord
+from .csv_import import RowError
+from .sharding import shard_aliases
+
+PAYABLE = "завершена"
+PAID = "оплачена"
+
+
+def _reference(row):
+    if not isinstance(row, dict):
+        return ""
+    return str(row.get("reference") or "").strip()
+
+
+class PaymentReconciler:
+    """Сверка файла оплат с консультациями.
+
+    Строки (``consultation`` — ID, ``reference`` — номер платежа банка,
+    необязателен) обрабатываются порциями: статусы порции читаются одним
+    запросом на шард, а завершённые консультации переводятся в «оплачена»
+    через transition() — одним UPDATE на порцию, без save() и проверок
+    пересечений. Несовпадения попадают в отчёт и не прерывают импорт.
+
+    Номера применённых платежей сохраняются в PaymentRecord: строки с уже
+    учтённым номером пропускаются (already_imported), поэтому повторная
+    загрузка того же файла ничего не меняет.
+    """
+
+    def __init__(self, chunk_size=1000, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.seen = set()
+        self.seen_references = set()
+
+    def run(self, rows):
+        started = time.perf_counter()
+        report = {"rows": 0, "paid": 0, "already_paid": 0, "already_imported": 0,
+                  "mismatches": [], "dry_run": self.dry_run}
+        numbered = enumerate(rows, start=1)
+        while chunk := list(islice(numbered, self.chunk_size)):
+            report["rows"] += len(chunk)
+            self._reconcile_chunk(chunk, report)
+        report["mismatches"].sort(key=itemgetter("row"))
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _mismatch(self, report, line, row, reason, **extra):
+        report["mismatches"].append({
+            "row": line,
+            "consultation": row.get("consultation") if isinstance(row, dict) else None,
+            "reference": row.get("reference") if isinstance(row, dict) else None,
+            "reason": reason, **extra})
+
+    def _reconcile_chunk(self, chunk, report):
+        imported = set(PaymentRecord.objects.filter(reference__in=[
+            _reference(row) for _, row in chunk if _reference(row)
+        ]).values_list("reference", flat=True))
+        valid = {}
+        for line, row in chunk:
+            if isinstance(row, RowError):
+                self._mismatch(report, line, row, str(row))
+                continue
+            consultation_id = str(row.get("consultation") or "").strip() \
+                if isinstance(row, dict) else ""
+            reference = _reference(row)
+            if not consultation_id.isdigit():
+                self._mismatch(report, line, row, "Не указан ID консультации.")
+            elif int(consultation_id) in self.seen:
+                self._mismatch(report, line, row, "Консультация повторяется в файле.")
+            elif reference in self.seen_references:
+                self._mismatch(report, line, row, "Платёж повторяется в файле.")
+            elif reference in imported:
+                report["already_imported"] += 1
+            else:
+                self.seen.add(int(consultation_id))
+                if reference:
+                    self.seen_references.add(reference)
+                valid[int(consultation_id)] = (line, row)
+        if not valid:
+            return
+
+        statuses = {}
+        payable = {}
+        for alias in shard_aliases():
+            for consultation_id, status in Consultation.objects.using(alias).filter(
+                    id__in=valid).values_list("id", "status"):
+                statuses[consultation_id] = status
+                if status == PAYABLE:
+                    payable.setdefault(alias, []).append(consultation_id)
+
+        for consultation_id, (line, row) in valid.items():
+            status = statuses.get(consultation_id)
+            if status is None:
+                self._mismatch(report, line, row, "Консультация не найдена.")
+            elif status == PAID:
+                report["already_paid"] += 1
+            elif status != PAYABLE:
+                self._mismatch(report, line, row,
+                               "Консультация не завершена.", status=status)
+
+        for alias, ids in payable.items():
+            if self.dry_run:
+                report["paid"] += len(ids)
+                continue
+            # Статус в фильтре защищает от изменений после чтения.
+            paid = {row["id"] for row in Consultation.objects.using(alias).filter(
+                id__in=ids, status=PAYABLE).transition(PAID)}
+            report["paid"] += len(paid)
+            for consultation_id in ids:
+                if consultation_id not in paid:
+                    line, row = valid[consultation_id]
+                    self._mismatch(report, line, row,
+                                   "Статус изменился во время импорта.")
+            PaymentRecord.objects.bulk_create([
+                PaymentRecord(reference=_reference(valid[consultation_id][1]),
+                              consultation_id=consultation_id)
+                for consultation_id in paid if _reference(valid[consultation_id][1])
+            ], ignore_conflicts=True)
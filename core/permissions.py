@@ -42,3 +42,9 @@ class IsPatientOrAdmin(permissions.BasePermission):
         elif request.method in ["DELETE", "PUT", "PATCH"]:
             return (request.user.is_authenticated and request.user.role == "admin")
         return request.user.is_authenticated
+
+
+class IsAdmin(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.role == "admin"
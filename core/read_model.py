@@ -0,0 +1,247 @@
+import csv
+import heapq
+from itertools import islice
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import (Clinic, Consultation, ConsultationListing, DoctorProfile,
+                     Specialization, User)
+from .sharding import DIRECTORY_DB, shard_aliases
+from .signals import consultation_changed
+
+# Поля консультации, которые копируются в ConsultationListing как есть.
+CONSULTATION_FIELDS = (
+    "id", "doctor_id", "patient_id", "clinic_id", "status",
+    "start_time", "end_time", "created_at", "updated_at", "notes")
+NAME_FIELDS = ("doctor_name", "patient_name", "clinic_name", "specialization")
+COMPARED_FIELDS = CONSULTATION_FIELDS + NAME_FIELDS
+UPDATE_FIELDS = [field.name for field in ConsultationListing._meta.concrete_fields
+                 if not field.primary_key]
+EXPORT_FIELDS = ("id", "start_time", "end_time", "status", "doctor_name",
+                 "patient_name", "clinic_name", "specialization")
+BATCH_SIZE = 1000
+
+
+def full_name(last_name, first_name):
+    return f"{last_name} {first_name}".strip()
+
+
+def build(rows):
+    """Строки ConsultationListing по словарям с CONSULTATION_FIELDS.
+
+    Имена для всей пачки читаются двумя запросами к базе-справочнику.
+    """
+    users = {item["id"]: item for item in User.objects.using(DIRECTORY_DB).filter(
+        id__in={row[field] for row in rows for field in ("doctor_id", "patient_id")}
+    ).values("id", "last_name", "first_name", "doctor_profile__specialization__name")}
+    clinics = dict(Clinic.objects.using(DIRECTORY_DB).filter(
+        id__in={row["clinic_id"] for row in rows}).values_list("id", "name"))
+    listings = []
+    for row in rows:
+        doctor = users.get(row["doctor_id"], {})
+        patient = users.get(row["patient_id"], {})
+        listings.append(ConsultationListing(
+            **{field: row[field] for field in CONSULTATION_FIELDS},
+            doctor_name=full_name(doctor.get("last_name", ""), doctor.get("first_name", "")),
+            patient_name=full_name(patient.get("last_name", ""), patient.get("first_name", "")),
+            clinic_name=clinics.get(row["clinic_id"], ""),
+            specialization=doctor.get("doctor_profile__specialization__name") or ""))
+    return listings
+
+
+def upsert(listings):
+    for start in range(0, len(listings), BATCH_SIZE):
+        ConsultationListing.objects.using(DIRECTORY_DB).bulk_create(
+            listings[start:start + BATCH_SIZE], update_conflicts=True,
+            unique_fields=["id"], update_fields=UPDATE_FIELDS)
+
+
+def sync(ids, using):
+    """Перечитывает консультации ``ids`` из базы ``using`` в модель чтения."""
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        rows = list(Consultation.objects.using(using).filter(
+            id__in=ids[start:start + BATCH_SIZE]).values(*CONSULTATION_FIELDS))
+        upsert(build(rows))
+
+
+def remove(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        ConsultationListing.objects.using(DIRECTORY_DB).filter(
+            id__in=ids[start:start + BATCH_SIZE])._raw_delete(DIRECTORY_DB)
+
+
+def expected_listings(batch_size=BATCH_SIZE):
+    """Строки модели чтения, построенные заново из всех шардов, по ID."""
+    streams = [Consultation.objects.using(alias).order_by("id").values(
+        *CONSULTATION_FIELDS).iterator(chunk_size=batch_size)
+        for alias in shard_aliases()]
+    merged = heapq.merge(*streams, key=itemgetter("id"))
+    while chunk := list(islice(merged, batch_size)):
+        yield from build(chunk)
+
+
+def _batches(items, size):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Строит модель чтения с нуля; возвращает число строк.
+
+    Замена выполняется одной транзакцией в базе-справочнике, поэтому
+    читатели до её конца видят прежнее содержимое.
+    """
+    count = 0
+    with transaction.atomic(using=DIRECTORY_DB):
+        ConsultationListing.objects.using(DIRECTORY_DB).all()._raw_delete(DIRECTORY_DB)
+        for batch in _batches(expected_listings(batch_size), batch_size):
+            upsert(batch)
+            count += len(batch)
+    return count
+
+
+def _values(listing):
+    return tuple(getattr(listing, field) for field in COMPARED_FIELDS)
+
+
+def differences(batch_size=BATCH_SIZE):
+    """Расхождения модели чтения с консультациями и справочником.
+
+    Оба потока читаются по возрастанию ID и сравниваются слиянием, без
+    загрузки таблиц в память. Пары: ("missing" | "stale", ожидаемая
+    строка) и ("orphaned", ID лишней строки).
+    """
+    actual = ConsultationListing.objects.using(DIRECTORY_DB).order_by("id").values_list(
+        *COMPARED_FIELDS).iterator(chunk_size=batch_size)
+    current = next(actual, None)
+    for listing in expected_listings(batch_size):
+        while current is not None and current[0] < listing.id:
+            yield "orphaned", current[0]
+            current = next(actual, None)
+        if current is None or current[0] != listing.id:
+            yield "missing", listing
+            continue
+        if current != _values(listing):
+            yield "stale", listing
+        current = next(actual, None)
+    while current is not None:
+        yield "orphaned", current[0]
+        current = next(actual, None)
+
+
+def check(batch_size=BATCH_SIZE, fix=False):
+    """Проверяет модель чтения: {"missing": [ID], "stale": [...], "orphaned": [...]}.
+
+    С fix=True недостающие и устаревшие строки перезаписываются, лишние
+    удаляются. На работающей системе расхождение может оказаться
+    записью, сделанной во время проверки, — её покажет и повторный запуск.
+    """
+    report = {"missing": [], "stale": [], "orphaned": []}
+    pending = []
+    for kind, item in differences(batch_size):
+        if kind == "orphaned":
+            report[kind].append(item)
+            continue
+        report[kind].append(item.id)
+        if fix:
+            pending.append(item)
+            if len(pending) >= batch_size:
+                upsert(pending)
+                pending = []
+    if fix:
+        upsert(pending)
+        remove(report["orphaned"])
+    return report
+
+
+def search(queryset, text):
+    """Каждое слово ``text`` должно встретиться в одном из имён строки."""
+    for term in text.split():
+        condition = Q()
+        for field in NAME_FIELDS:
+            condition |= Q(**{f"{field}__icontains": term})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_csv(queryset, batch_size=BATCH_SIZE):
+    """CSV по строкам модели чтения, по одной строке на фрагмент ответа."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=batch_size):
+        yield writer.writerow(
+            [value.isoformat() if hasattr(value, "isoformat") else value
+             for value in row])
+
+
+@receiver(post_save, sender=Consultation)
+def sync_saved_consultation(sender, instance, raw, **kwargs):
+    if not raw:
+        upsert(build([{field: getattr(instance, field)
+                       for field in CONSULTATION_FIELDS}]))
+
+
+@receiver(consultation_changed)
+def sync_changed_consultations(sender, event, rows, using, **kwargs):
+    # Массовые transition(), bulk_update() и bulk_create() обходят
+    # post_save, поэтому строки перечитываются из базы. Созданные через
+    # save() строки post_save уже записал — перечитываются только новые.
+    ids = [row["id"] for row in rows]
+    if event == "deleted":
+        remove(ids)
+    elif event == "created":
+        known = set(ConsultationListing.objects.using(DIRECTORY_DB).filter(
+            id__in=ids).values_list("id", flat=True))
+        sync([pk for pk in ids if pk not in known], using)
+    else:
+        sync(ids, using)
+
+
+@receiver(post_save, sender=User)
+def sync_user_names(sender, instance, created, update_fields, raw, **kwargs):
+    renamed = update_fields is None or {"first_name", "last_name"} & set(update_fields)
+    if created or raw or not renamed:
+        return
+    name = full_name(instance.last_name, instance.first_name)
+    listings = ConsultationListing.objects.using(DIRECTORY_DB)
+    for role in ("doctor", "patient"):
+        listings.filter(**{f"{role}_id": instance.pk}).exclude(
+            **{f"{role}_name": name}).update(**{f"{role}_name": name})
+
+
+@receiver(post_save, sender=Clinic)
+def sync_clinic_name(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        ConsultationListing.objects.using(DIRECTORY_DB).filter(
+            clinic_id=instance.pk).exclude(clinic_name=instance.name).update(
+            clinic_name=instance.name)
+
+
+@receiver(post_save, sender=DoctorProfile)
+def sync_doctor_specialization(sender, instance, raw, **kwargs):
+    if not raw:
+        name = instance.specialization.name
+        ConsultationListing.objects.using(DIRECTORY_DB).filter(
+            doctor_id=instance.user_id).exclude(specialization=name).update(
+            specialization=name)
+
+
+@receiver(post_save, sender=Specialization)
+def sync_specialization_name(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        ConsultationListing.objects.using(DIRECTORY_DB).filter(
+            doctor_id__in=DoctorProfile.objects.filter(
+                specialization=instance).values("user_id")).exclude(
+            specialization=instance.name).update(specialization=instance.name)
@@ -0,0 +1,43 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .models import Clinic, Consultation, ConsultationTombstone, User
+from .sharding import forget_clinic, reserve_id_range, shard_aliases
+from .signals import send_consultation_changed, snapshot
+
+
+@receiver(post_delete, sender=Consultation)
+def create_tombstone(sender, instance, using, **kwargs):
+    # Клиенты синхронизации узнают об удалении только по надгробию.
+    ConsultationTombstone.objects.using(using).create(
+        consultation_id=instance.id,
+        doctor_id=instance.doctor_id,
+        patient_id=instance.patient_id,
+        clinic_id=instance.clinic_id)
+    send_consultation_changed("deleted", [snapshot(instance)], using=using)
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    if sender.name == "core" and using in shard_aliases():
+        reserve_id_range(using)
+
+
+@receiver(post_save, sender=Clinic)
+@receiver(post_delete, sender=Clinic)
+def forget_clinic_shard(sender, instance, **kwargs):
+    forget_clinic(instance.pk)
+
+
+@receiver(post_delete, sender=Clinic)
+@receiver(post_delete, sender=User)
+def delete_sharded_consultations(sender, instance, using, **kwargs):
+    # Каскадное удаление Django затрагивает только базу удаляемого объекта.
+    if sender is Clinic:
+        condition = Q(clinic_id=instance.pk)
+    else:
+        condition = Q(doctor_id=instance.pk) | Q(patient_id=instance.pk)
+    for alias in shard_aliases():
+        if alias != using:
+            Consultation.objects.using(alias).filter(condition).delete()
@@ -0,0 +1,150 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.timezone import now
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import RevokedToken
+
+_revocation_list = None
+_revocation_list_lock = threading.Lock()
+
+
+class BloomFilter:
+    """Фильтр Блума на bytearray с двойным хешированием blake2b."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        if item in self:
+            return
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+
+class RevocationList:
+    """Проверка отзыва refresh-токенов без запроса к БД на каждый refresh.
+
+    Отозванные JTI хранятся в RevokedToken, а в памяти процесса лежит
+    фильтр Блума. Отрицательный ответ фильтра окончателен; в базу идём
+    только при положительном, чтобы отсеять ложные срабатывания. Фильтр
+    дочитывает новые записи не чаще раза в REVOCATION_FILTER_REFRESH_SECONDS
+    и пересобирается целиком, чтобы выбросить истёкшие токены.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self.positives = 0
+        self.false_positives = 0
+
+    def is_revoked(self, jti):
+        bloom = self._current_filter()
+        if jti not in bloom:
+            return False
+        self.positives += 1
+        if RevokedToken.objects.filter(jti=jti).exists():
+            return True
+        self.false_positives += 1
+        return False
+
+    def revoke(self, jti, expires_at):
+        RevokedToken.objects.get_or_create(
+            jti=jti, defaults={"expires_at": expires_at})
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def _current_filter(self):
+        current = time.monotonic()
+        fresh = current - self._checked_at < settings.REVOCATION_FILTER_REFRESH_SECONDS
+        if self._bloom is not None and fresh:
+            return self._bloom
+        with self._lock:
+            stale = current - self._built_at > settings.REVOCATION_FILTER_REBUILD_SECONDS
+            if self._bloom is None or stale or self._bloom.count > self._bloom.capacity:
+                self._rebuild()
+                self._built_at = current
+            else:
+                self._load_recent()
+            self._checked_at = current
+            return self._bloom
+
+    def _rebuild(self):
+        synced_at = now()
+        tokens = RevokedToken.objects.filter(expires_at__gt=synced_at)
+        capacity = max(settings.REVOCATION_FILTER_CAPACITY,
+                       2 * tokens.count())
+        bloom = BloomFilter(capacity, settings.REVOCATION_FILTER_ERROR_RATE)
+        for jti in tokens.values_list("jti", flat=True).iterator(
+                chunk_size=10000):
+            bloom.add(jti)
+        self._bloom = bloom
+        self._synced_at = synced_at
+
+    def _load_recent(self):
+        # Перекрытие по времени страхует от транзакций, зафиксированных
+        # позже своего revoked_at; повторное добавление в фильтр безвредно.
+        synced_at = now()
+        since = self._synced_at - settings.REVOCATION_FILTER_OVERLAP
+        for jti in RevokedToken.objects.filter(
+                revoked_at__gte=since).values_list("jti", flat=True):
+            self._bloom.add(jti)
+        self._synced_at = synced_at
+
+
+def revocation_list():
+    global _revocation_list
+    with _revocation_list_lock:
+        if _revocation_list is None:
+            _revocation_list = RevocationList()
+        return _revocation_list
+
+
+@receiver(setting_changed)
+def reset_revocation_list(setting, **kwargs):
+    global _revocation_list
+    if setting.startswith("REVOCATION_FILTER_"):
+        _revocation_list = None
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh-токен, который можно отозвать (в том числе после ротации)."""
+
+    def verify(self):
+        super().verify()
+        if revocation_list().is_revoked(self[jwt_settings.JTI_CLAIM]):
+            raise TokenError("Токен отозван.")
+
+    def blacklist(self):
+        expires_at = datetime.fromtimestamp(self["exp"], tz=dt_timezone.utc)
+        revocation_list().revoke(self[jwt_settings.JTI_CLAIM], expires_at)
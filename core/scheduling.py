@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import localtime, make_aware, now
+
+from .models import Consultation
+from .sharding import fan_out, shard_aliases
+from .signals import send_consultation_changed, snapshot
+
+SLOT = timedelta(hours=1)
+
+
+def _local_date(value):
+    return localtime(value).date()
+
+
+def _day_slots(day, busy):
+    slots = []
+    for hour in range(settings.SCHEDULING_WORKDAY_START,
+                      settings.SCHEDULING_WORKDAY_END):
+        start = make_aware(datetime.combine(day, time(hour)))
+        end = start + SLOT
+        if not any(start < busy_end and end > busy_start
+                   for busy_start, busy_end in busy):
+            slots.append(start)
+    return slots
+
+
+class _DoctorDay:
+    __slots__ = ("clinics", "free")
+
+    def __init__(self, day, bookings):
+        self.clinics = {clinic_id for _, _, clinic_id in bookings}
+        self.free = _day_slots(
+            day, [(start, end) for start, end, _ in bookings])
+
+
+def plan_schedule(pending, booked, last_day, earliest=None):
+    """Распределяет заявки по свободным часовым слотам врачей в памяти.
+
+    ``pending`` — кортежи (id, doctor_id, clinic_id, желаемое начало),
+    ``booked`` — уже занятые интервалы (doctor_id, clinic_id, start, end).
+    Заявки обрабатываются в порядке желаемого времени: каждая получает
+    ближайший свободный слот не раньше желаемого, в день, когда врач
+    не работает в другой клинике. Возвращает (assignments, unplaced):
+    {id: начало} и {id: причина}.
+    """
+    bookings = defaultdict(list)
+    for doctor_id, clinic_id, start, end in booked:
+        bookings[(doctor_id, _local_date(start))].append(
+            (start, end, clinic_id))
+
+    days = {}
+    assignments = {}
+    unplaced = {}
+    for consultation_id, doctor_id, clinic_id, desired in sorted(
+            pending, key=lambda row: (row[3], row[0])):
+        if earliest is not None and desired < earliest:
+            desired = earliest
+        first_day = day = _local_date(desired)
+        while day <= last_day:
+            key = (doctor_id, day)
+            state = days.get(key)
+            if state is None:
+                state = days[key] = _DoctorDay(day, bookings.get(key, ()))
+            if not state.clinics - {clinic_id}:
+                index = bisect_left(state.free, desired) if day == first_day else 0
+                if index < len(state.free):
+                    assignments[consultation_id] = state.free.pop(index)
+                    state.clinics.add(clinic_id)
+                    break
+            day += timedelta(days=1)
+        else:
+            unplaced[consultation_id] = (
+                f"Нет свободного времени у врача до {last_day}.")
+    return assignments, unplaced
+
+
+def schedule_pending(date_from, date_to, dry_run=False):
+    """Назначает время всем ожидающим заявкам с желаемой датой в диапазоне.
+
+    Назначения фиксируются через bulk_update одной транзакцией в каждом
+    шарде; занятость врача собирается со всех шардов.
+    """
+    started = now()
+    period = {"start_time__date__gte": date_from,
+              "start_time__date__lte": date_to}
+    with ExitStack() as stack:
+        pending = {}
+        for alias in shard_aliases():
+            stack.enter_context(transaction.atomic(using=alias))
+            shard_pending = Consultation.objects.using(alias).select_for_update().filter(
+                status="ожидает", **period).values_list(
+                "id", "doctor_id", "clinic_id", "start_time", "patient_id")
+            pending.update((row[0], row + (alias,)) for row in shard_pending)
+        booked = fan_out(Consultation.objects.filter(
+            doctor_id__in={row[1] for row in pending.values()}, **period,
+        ).exclude(status="ожидает").values_list(
+            "doctor_id", "clinic_id", "start_time", "end_time"))
+        assignments, unplaced = plan_schedule(
+            (row[:4] for row in pending.values()), booked, date_to,
+            earliest=started)
+
+        if not dry_run and assignments:
+            updated_at = now()
+            consultations = defaultdict(list)
+            rows = defaultdict(list)
+            for consultation_id, start_time in assignments.items():
+                _, doctor_id, clinic_id, _, patient_id, alias = pending[
+                    consultation_id]
+                consultation = Consultation(
+                    id=consultation_id, doctor_id=doctor_id,
+                    patient_id=patient_id, clinic_id=clinic_id,
+                    start_time=start_time, end_time=start_time + SLOT,
+                    status="подтверждена", updated_at=updated_at)
+                consultations[alias].append(consultation)
+                rows[alias].append(dict(snapshot(consultation),
+                                        previous_status="ожидает"))
+            for alias, shard_consultations in consultations.items():
+                Consultation.objects.using(alias).bulk_update(
+                    shard_consultations,
+                    ["start_time", "end_time", "status", "updated_at"],
+                    batch_size=500)
+                send_consultation_changed("rescheduled", rows[alias],
+                                          using=alias)
+
+    return {
+        "pending": len(pending),
+        "scheduled": len(assignments),
+        "unplaced": [{"id": consultation_id, "reason": reason}
+                     for consultation_id, reason in sorted(unplaced.items())],
+        "dry_run": dry_run,
+        "elapsed_seconds": round((now() - started).total_seconds(), 3),
+    }
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Consultation
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
+                                                  TokenRefreshSerializer)
+from .models import (Consultation, ConsultationAuditEntry, ConsultationListing,
+                     ConsultationSeries, DoctorProfile)
+from .revocation import RevocableRefreshToken
+from .series import RuleError, parse_rule
 
 User = get_user_model()
 
@@ -18,6 +22,8 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainSerializer(TokenObtainPairSerializer):
+    token_class = RevocableRefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -25,6 +31,14 @@ class CustomTokenObtainSerializer(TokenObtainPairSerializer):
         return token
 
 
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
 class ConsultationSerializer(serializers.ModelSerializer):
     doctor = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role="doctor"))
@@ -32,4 +46,41 @@ class ConsultationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Consultation
         fields = '__all__'
-        read_only_fields = ["patient", "end_time"]
+        read_only_fields = ["patient", "end_time", "series"]
+
+
+class ConsultationSeriesSerializer(serializers.ModelSerializer):
+    doctor = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(role="doctor"))
+
+    class Meta:
+        model = ConsultationSeries
+        fields = '__all__'
+        read_only_fields = ["patient", "created_at", "cancelled_at"]
+
+    def validate_rule(self, value):
+        try:
+            parse_rule(value)
+        except RuleError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def validate(self, data):
+        # Через профиль, а не user.doctor_profile: у врача его может не быть.
+        if not DoctorProfile.objects.filter(
+                user=data["doctor"], clinics=data["clinic"]).exists():
+            raise serializers.ValidationError(
+                "Этот врач не работает в выбранной клинике.")
+        return data
+
+
+class ConsultationListingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConsultationListing
+        fields = '__all__'
+
+
+class ConsultationAuditEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConsultationAuditEntry
+        fields = '__all__'
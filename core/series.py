@@ -0,0 +1,230 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import count
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import localtime, make_aware, now
+
+from .models import Consultation, ConsultationSeries
+from .sharding import DIRECTORY_DB, fan_out, shard_for_clinic
+from .signals import SNAPSHOT_FIELDS, send_consultation_changed
+
+DURATION = timedelta(hours=1)
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+# Ещё не начатые повторения, которые можно перенести или отменить.
+OPEN_STATUSES = ("ожидает", "подтверждена")
+
+
+class RuleError(ValueError):
+    pass
+
+
+def parse_rule(rule):
+    """Разбирает RRULE (RFC 5545): FREQ=DAILY|WEEKLY, INTERVAL, COUNT,
+    UNTIL (дата) и BYDAY для еженедельных серий."""
+    try:
+        parts = dict(item.split("=", 1) for item in
+                     rule.strip().upper().removeprefix("RRULE:").split(";") if item)
+    except ValueError:
+        raise RuleError("Правило должно иметь вид FREQ=WEEKLY;COUNT=10.")
+    unknown = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY"}
+    if unknown:
+        raise RuleError(f"Неподдерживаемые части правила: {', '.join(sorted(unknown))}.")
+    frequency = parts.get("FREQ")
+    if frequency not in ("DAILY", "WEEKLY"):
+        raise RuleError("FREQ должен быть DAILY или WEEKLY.")
+    try:
+        interval = int(parts.get("INTERVAL", 1))
+        occurrences = int(parts["COUNT"]) if "COUNT" in parts else None
+        until = (datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").date()
+                 if "UNTIL" in parts else None)
+    except ValueError:
+        raise RuleError("INTERVAL и COUNT — числа, UNTIL — дата YYYYMMDD.")
+    if interval < 1 or (occurrences is not None and occurrences < 1):
+        raise RuleError("INTERVAL и COUNT должны быть положительными.")
+    if occurrences is None and until is None:
+        raise RuleError("Укажите COUNT или UNTIL.")
+    weekdays = []
+    if "BYDAY" in parts:
+        if frequency != "WEEKLY":
+            raise RuleError("BYDAY поддерживается только для FREQ=WEEKLY.")
+        try:
+            weekdays = sorted({WEEKDAYS.index(day) for day in parts["BYDAY"].split(",")})
+        except ValueError:
+            raise RuleError(f"BYDAY — дни из {','.join(WEEKDAYS)}.")
+    return {"frequency": frequency, "interval": interval,
+            "count": occurrences, "until": until, "weekdays": weekdays}
+
+
+def _days(first_day, rule):
+    if rule["frequency"] == "DAILY":
+        for index in count():
+            yield first_day + timedelta(days=index * rule["interval"])
+        return
+    weekdays = rule["weekdays"] or [first_day.weekday()]
+    monday = first_day - timedelta(days=first_day.weekday())
+    for index in count():
+        week = monday + timedelta(weeks=index * rule["interval"])
+        for weekday in weekdays:
+            day = week + timedelta(days=weekday)
+            if day >= first_day:
+                yield day
+
+
+def occurrences(start_time, rule):
+    """Начала повторений серии; время суток сохраняется и при переходе
+    на летнее время. Не больше CONSULTATION_SERIES_MAX_OCCURRENCES."""
+    rule = parse_rule(rule) if isinstance(rule, str) else rule
+    limit = settings.CONSULTATION_SERIES_MAX_OCCURRENCES
+    local = localtime(start_time)
+    starts = []
+    for day in _days(local.date(), rule):
+        if rule["until"] and day > rule["until"]:
+            break
+        if len(starts) == rule["count"]:
+            break
+        if len(starts) == limit:
+            raise RuleError(f"В серии не может быть больше {limit} повторений.")
+        starts.append(make_aware(datetime.combine(day, local.time())))
+    return starts
+
+
+def _day_bounds(day):
+    return (make_aware(datetime.combine(day, time.min)),
+            make_aware(datetime.combine(day + timedelta(days=1), time.min)))
+
+
+def find_conflicts(doctor_id, patient_id, clinic_id, slots, exclude_ids=()):
+    """{начало повторения: причина} для занятых слотов (начало, конец).
+
+    Занятость врача и пациента за все дни серии читается одним запросом
+    (по запросу на шард) и раскладывается по дням, поэтому каждый слот
+    сверяется только с консультациями своего дня.
+    """
+    if not slots:
+        return {}
+    first_day = localtime(min(start for start, _ in slots)).date()
+    last_day = localtime(max(end for _, end in slots)).date()
+    since, _ = _day_bounds(first_day)
+    _, until = _day_bounds(last_day)
+    busy = fan_out(Consultation.objects.filter(
+        Q(doctor_id=doctor_id) | Q(patient_id=patient_id),
+        start_time__lt=until, end_time__gt=since,
+    ).exclude(id__in=exclude_ids).values_list(
+        "doctor_id", "clinic_id", "start_time", "end_time"))
+    by_day = defaultdict(list)
+    for row in busy:
+        for day in {localtime(row[2]).date(), localtime(row[3]).date()}:
+            by_day[day].append(row)
+
+    current = now()
+    conflicts = {}
+    for start, end in slots:
+        day = by_day[localtime(start).date()]
+        overlapping = [row for row in day if row[2] < end and row[3] > start]
+        if start <= current:
+            conflicts[start] = "Время уже прошло."
+        elif any(row[0] == doctor_id for row in overlapping):
+            conflicts[start] = "Врач уже занят в это время."
+        elif overlapping:
+            conflicts[start] = "Пациент уже записан на это время."
+        elif any(row[0] == doctor_id and row[1] != clinic_id for row in day):
+            conflicts[start] = "Врач в этот день работает в другой клинике."
+    return conflicts
+
+
+def _report(slots, conflicts):
+    return [{"start_time": start, "end_time": end, "error": conflicts.get(start)}
+            for start, end in slots]
+
+
+def book_series(patient, doctor, clinic, start_time, rule, dry_run=False):
+    """Создаёт серию и свободные повторения одним bulk_create.
+
+    Возвращает (серия или None, отчёт по повторениям). Серия не создаётся,
+    если свободных повторений нет или dry_run=True.
+    """
+    slots = [(start, start + DURATION) for start in occurrences(start_time, rule)]
+    conflicts = find_conflicts(doctor.id, patient.id, clinic.id, slots)
+    report = _report(slots, conflicts)
+    if dry_run or len(conflicts) == len(slots):
+        return None, report
+    alias = shard_for_clinic(clinic.id)
+    with transaction.atomic(using=DIRECTORY_DB), transaction.atomic(using=alias):
+        series = ConsultationSeries.objects.create(
+            doctor=doctor, patient=patient, clinic=clinic,
+            rule=rule, start_time=start_time)
+        Consultation.objects.using(alias).bulk_create([
+            Consultation(doctor=doctor, patient=patient, clinic=clinic,
+                         series=series, start_time=start, end_time=end,
+                         status="ожидает")
+            for start, end in slots if start not in conflicts])
+        rows = list(Consultation.objects.using(alias).filter(
+            series_id=series.id).order_by("start_time").values(*SNAPSHOT_FIELDS))
+        send_consultation_changed("created", rows, using=alias)
+    ids = {row["start_time"]: row["id"] for row in rows}
+    for item in report:
+        item["id"] = ids.get(item["start_time"])
+    return series, report
+
+
+def _wall_clock(value):
+    return localtime(value).replace(tzinfo=None)
+
+
+def _open_occurrences(series, alias):
+    return Consultation.objects.using(alias).filter(
+        series_id=series.id, status__in=OPEN_STATUSES, start_time__gt=now())
+
+
+def reschedule_series(series, start_time):
+    """Сдвигает ещё не начатые повторения так, чтобы ближайшее началось
+    в ``start_time``; остальные сдвигаются на то же время по часам.
+
+    Переносится вся серия или ничего: при конфликте возвращается отчёт
+    без изменений. Возвращает (перенесено ли, отчёт).
+    """
+    alias = shard_for_clinic(series.clinic_id)
+    with transaction.atomic(using=alias):
+        consultations = list(_open_occurrences(series, alias).select_for_update()
+                             .order_by("start_time"))
+        if not consultations:
+            return False, []
+        # Сдвиг по часам, а не по абсолютному времени: повторения по
+        # разные стороны перехода на летнее время остаются в одно время суток.
+        first = consultations[0].start_time
+        shift = _wall_clock(start_time) - _wall_clock(first)
+        slots = []
+        for consultation in consultations:
+            start = make_aware(_wall_clock(consultation.start_time) + shift)
+            slots.append((start, start + DURATION))
+        conflicts = find_conflicts(
+            series.doctor_id, series.patient_id, series.clinic_id, slots,
+            exclude_ids=[consultation.id for consultation in consultations])
+        report = _report(slots, conflicts)
+        if conflicts:
+            return False, report
+        updated_at = now()
+        rows = []
+        for consultation, (start, end) in zip(consultations, slots):
+            previous_status = consultation.status
+            consultation.start_time, consultation.end_time = start, end
+            consultation.status = "подтверждена"
+            consultation.updated_at = updated_at
+            rows.append({**{field: getattr(consultation, field) for field in SNAPSHOT_FIELDS},
+                         "previous_status": previous_status})
+        Consultation.objects.using(alias).bulk_update(
+            consultations, ["start_time", "end_time", "status", "updated_at"])
+        send_consultation_changed("rescheduled", rows, using=alias)
+    return True, report
+
+
+def cancel_series(series):
+    """Удаляет ещё не начатые повторения и закрывает серию."""
+    alias = shard_for_clinic(series.clinic_id)
+    deleted, _ = _open_occurrences(series, alias).delete()
+    series.cancelled_at = now()
+    series.save(update_fields=["cancelled_at"])
+    return deleted
@@ -0,0 +1,322 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from itertools import chain
+from operator import attrgetter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.db.models import Count
+from django.dispatch import receiver
+
+# Консультации и их надгробия лежат в шарде клиники; всё остальное
+# (пользователи, клиники, справочники) — только в базе-справочнике.
+SHARDED_MODELS = {"consultation", "consultationtombstone"}
+DIRECTORY_DB = "default"
+
+_current_shard = contextvars.ContextVar("consultation_shard", default=None)
+_directory = {}
+_directory_lock = threading.Lock()
+
+
+def shard_aliases():
+    return settings.CONSULTATION_SHARDS
+
+
+def is_sharded():
+    return len(settings.CONSULTATION_SHARDS) > 1
+
+
+def shard_for_clinic(clinic_id):
+    """Алиас базы, в которой лежат консультации клиники.
+
+    Каталог (поле Clinic.shard) кешируется в процессе на
+    CONSULTATION_SHARD_DIRECTORY_TTL секунд. Клиники без шарда в каталоге
+    распределяются по остатку от деления ID.
+    """
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0]
+    clinic_id = int(clinic_id)
+    current = time.monotonic()
+    cached = _directory.get(clinic_id)
+    if cached is not None and cached[1] > current:
+        return cached[0]
+    Clinic = apps.get_model("core", "Clinic")
+    alias = Clinic.objects.using(DIRECTORY_DB).filter(
+        pk=clinic_id).values_list("shard", flat=True).first()
+    if alias not in aliases:
+        alias = aliases[clinic_id % len(aliases)]
+    with _directory_lock:
+        _directory[clinic_id] = (
+            alias, current + settings.CONSULTATION_SHARD_DIRECTORY_TTL)
+    return alias
+
+
+def shard_for_new_clinic():
+    """Шард с наименьшим числом клиник."""
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0]
+    Clinic = apps.get_model("core", "Clinic")
+    clinics = dict(Clinic.objects.using(DIRECTORY_DB).values_list(
+        "shard").annotate(count=Count("id")).order_by())
+    return min(aliases, key=lambda alias: clinics.get(alias, 0))
+
+
+def forget_clinic(clinic_id):
+    with _directory_lock:
+        _directory.pop(clinic_id, None)
+
+
+@receiver(setting_changed)
+def reset_shard_directory(setting, **kwargs):
+    if setting.startswith("CONSULTATION_SHARD"):
+        with _directory_lock:
+            _directory.clear()
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias):
+    """Направляет запросы к шардируемым моделям без явного .using() в alias."""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def home_shard(pk):
+    """Шард, в диапазоне ID которого создана строка (см. reserve_id_range)."""
+    index = (int(pk) - 1) // settings.CONSULTATION_SHARD_ID_STRIDE
+    aliases = shard_aliases()
+    return aliases[index] if 0 <= index < len(aliases) else None
+
+
+def locate(model, pk):
+    """Ищет шард со строкой pk; после ребалансировки строка может лежать
+    не в том шарде, где была создана."""
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0]
+    try:
+        home = home_shard(pk)
+    except (TypeError, ValueError):
+        return None
+    for alias in sorted(aliases, key=lambda alias: alias != home):
+        if model._default_manager.using(alias).filter(pk=pk).exists():
+            return alias
+    return None
+
+
+def fan_out(queryset):
+    """Выполняет запрос во всех шардах и склеивает результат.
+
+    Запрос с явным .using() выполняется только в своей базе. Порядок
+    order_by() восстанавливается сортировкой в памяти, поэтому ordering
+    должен ссылаться на поля самой модели.
+    """
+    if queryset._db is not None or not is_sharded():
+        return list(queryset)
+    rows = list(chain.from_iterable(
+        queryset.using(alias) for alias in shard_aliases()))
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    if rows and not isinstance(rows[0], (dict, tuple)):
+        for field in reversed(ordering):
+            name = str(field)
+            rows.sort(key=attrgetter(name.lstrip("-").replace("__", ".")),
+                      reverse=name.startswith("-"))
+    return rows
+
+
+def exists_anywhere(queryset):
+    if queryset._db is not None or not is_sharded():
+        return queryset.exists()
+    return any(queryset.using(alias).exists() for alias in shard_aliases())
+
+
+def reserve_id_range(alias, model=None):
+    """Сдвигает автоинкремент шарда к началу его диапазона ID.
+
+    Шард с индексом i в CONSULTATION_SHARDS выдаёт ID начиная с
+    i * CONSULTATION_SHARD_ID_STRIDE + 1, поэтому ID консультаций уникальны
+    во всех шардах. Поддерживаются PostgreSQL и SQLite.
+    """
+    model = model or apps.get_model("core", "Consultation")
+    index = shard_aliases().index(alias)
+    start = index * settings.CONSULTATION_SHARD_ID_STRIDE
+    if not start:
+        return
+    connection = connections[alias]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            quoted = connection.ops.quote_name(table)
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {quoted})))",
+                [table, start])
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, start])
+            elif row[0] < start:
+                cursor.execute(
+                    "UPDATE sqlite_sequence SET seq = %s WHERE name = %s",
+                    [start, table])
+
+
+class ClinicShardRouter:
+    """Роутер: консультации — в шард клиники, остальное — в справочник.
+
+    Шард выбирается по экземпляру (его базе или clinic_id), затем по
+    use_shard(); иначе используется база-справочник. Миграции
+    применяются ко всем базам, поэтому схема в шардах одинаковая.
+    """
+
+    def _db(self, model, instance):
+        if model._meta.app_label != "core" or model._meta.model_name not in SHARDED_MODELS:
+            return DIRECTORY_DB
+        if isinstance(instance, model):
+            # У новой строки _state.db выставляется при присваивании
+            # связанных объектов и указывает на базу-справочник.
+            if instance._state.db and not instance._state.adding:
+                return instance._state.db
+            if getattr(instance, "clinic_id", None) is not None:
+                return shard_for_clinic(instance.clinic_id)
+        return current_shard() or DIRECTORY_DB
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints.get("instance"))
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints.get("instance"))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def shard_loads():
+    """Число консультаций по клиникам в каждом шарде: {clinic_id: {alias: n}}."""
+    Consultation = apps.get_model("core", "Consultation")
+    loads = {}
+    for alias in shard_aliases():
+        for clinic_id, count in Consultation.objects.using(alias).values_list(
+                "clinic_id").annotate(count=Count("id")).order_by():
+            loads.setdefault(clinic_id, {})[alias] = count
+    return loads
+
+
+def plan_rebalance(loads, directory, aliases, tolerance=0.1):
+    """Переносы клиник, выравнивающие число консультаций по шардам.
+
+    ``loads`` — {clinic_id: число консультаций}, ``directory`` —
+    {clinic_id: текущий шард}. Жадно переносит с самого загруженного шарда
+    на наименее загруженный крупнейшую клинику, перенос которой уменьшает
+    разрыв; останавливается, когда разрыв не больше ``tolerance`` от
+    средней нагрузки. Возвращает {clinic_id: новый шард}.
+    """
+    totals = {alias: 0 for alias in aliases}
+    placement = {}
+    for clinic_id, count in loads.items():
+        alias = directory.get(clinic_id)
+        if alias in totals:
+            totals[alias] += count
+            placement[clinic_id] = alias
+    moves = {}
+    allowed_gap = tolerance * sum(totals.values()) / len(aliases)
+    while True:
+        heaviest = max(aliases, key=totals.get)
+        lightest = min(aliases, key=totals.get)
+        gap = totals[heaviest] - totals[lightest]
+        if gap <= allowed_gap:
+            break
+        candidates = [clinic_id for clinic_id, alias in placement.items()
+                      if alias == heaviest and 0 < loads[clinic_id] < gap]
+        if not candidates:
+            break
+        clinic_id = max(candidates, key=lambda clinic_id: (
+            loads[clinic_id], -clinic_id))
+        placement[clinic_id] = lightest
+        totals[heaviest] -= loads[clinic_id]
+        totals[lightest] += loads[clinic_id]
+        if directory.get(clinic_id) == lightest:
+            moves.pop(clinic_id, None)
+        else:
+            moves[clinic_id] = lightest
+    return moves
+
+
+def _copy_rows(model, rows, using):
+    # bulk_create перезаписал бы auto_now_add-поля, поэтому строки
+    # вставляются как есть, вместе с ID.
+    connection = connections[using]
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(field.column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {quote(model._meta.db_table)} ({columns}) "
+            f"VALUES ({placeholders})",
+            [[field.get_db_prep_save(row[field.attname], connection)
+              for field in fields] for row in rows])
+
+
+def _move_rows(model, queryset, source, target, batch_size):
+    fields = [field.attname for field in model._meta.concrete_fields]
+    moved = 0
+    while True:
+        # Удаление коммитится после вставки: при сбое строка окажется
+        # в обоих шардах, и повторный запуск лишь удалит её из источника.
+        with transaction.atomic(using=source), transaction.atomic(using=target):
+            rows = list(queryset.using(source).select_for_update().order_by(
+                "id").values(*fields)[:batch_size])
+            if not rows:
+                return moved
+            ids = [row["id"] for row in rows]
+            present = set(model._default_manager.using(target).filter(
+                id__in=ids).values_list("id", flat=True))
+            _copy_rows(model, [row for row in rows if row["id"] not in present],
+                       target)
+            model._default_manager.using(source).filter(
+                id__in=ids)._raw_delete(source)
+        moved += len(rows)
+
+
+def move_clinic(clinic_id, target, batch_size=1000):
+    """Переносит консультации и надгробия клиники в шард ``target``.
+
+    Сначала обновляется каталог, затем строки переносятся порциями без
+    сигналов (для клиентов данные не меняются). Воркеры с устаревшим
+    кешем каталога могут ещё CONSULTATION_SHARD_DIRECTORY_TTL секунд
+    писать в старый шард — такие строки переносит повторный запуск.
+    """
+    Clinic = apps.get_model("core", "Clinic")
+    Consultation = apps.get_model("core", "Consultation")
+    ConsultationTombstone = apps.get_model("core", "ConsultationTombstone")
+    Clinic.objects.using(DIRECTORY_DB).filter(pk=clinic_id).update(shard=target)
+    forget_clinic(clinic_id)
+    moved = 0
+    for source in shard_aliases():
+        if source == target:
+            continue
+        moved += _move_rows(
+            Consultation, Consultation.objects.filter(clinic_id=clinic_id),
+            source, target, batch_size)
+        _move_rows(
+            ConsultationTombstone,
+            ConsultationTombstone.objects.filter(clinic_id=clinic_id),
+            source, target, batch_size)
+    return moved
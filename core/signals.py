@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.dispatch import Signal
+
+# Отправляется внутри транзакции после любого изменения консультаций,
+# включая массовые .update(), которые обходят сигналы моделей.
+# Аргументы: event (str), rows (list[dict] со снимком SNAPSHOT_FIELDS),
+# using (алиас базы данных). В строке могут быть previous_status и,
+# если консультацию передали другому врачу, previous_doctor_id.
+consultation_changed = Signal()
+
+SNAPSHOT_FIELDS = (
+    "id", "doctor_id", "patient_id", "clinic_id",
+    "status", "start_time", "end_time")
+
+
+def snapshot(consultation):
+    return {field: getattr(consultation, field) for field in SNAPSHOT_FIELDS}
+
+
+def send_consultation_changed(event, rows, using="default"):
+    if rows:
+        consultation_changed.send(
+            sender=apps.get_model("core", "Consultation"),
+            event=event, rows=rows, using=using)
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.urls import get_resolver
+
+# Выполняется в отдельном интерпретаторе: холодный старт воркера до
+# ответа на первый запрос, как у только что запущенного gunicorn.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from django.conf import settings
+from django.utils.module_loading import import_string
+application = import_string(settings.WSGI_APPLICATION)
+ready = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "startup-probe"]
+environ = {"PATH_INFO": sys.argv[1], "REQUEST_METHOD": "GET",
+           "HTTP_HOST": "startup-probe"}
+setup_testing_defaults(environ)
+status = []
+response = application(environ, lambda code, headers: status.append(code))
+b"".join(response)
+response.close()
+finished = time.perf_counter()
+print(json.dumps({
+    "setup_ms": (ready - started) * 1000,
+    "first_request_ms": (finished - ready) * 1000,
+    "status": int(status[0].split()[0]),
+    "packages": sorted({name.partition(".")[0] for name in sys.modules}),
+}))
+"""
+IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def warm_up():
+    """Загружает URLconf со всеми представлениями и сериализаторами.
+
+    Django импортирует его только при первом запросе; вызов из wsgi.py
+    переносит эту работу на запуск воркера, а с gunicorn --preload — в
+    мастер-процесс до fork, где она выполняется один раз на все воркеры.
+    """
+    get_resolver().url_patterns
+
+
+def measure_startup(path="/api/consultations/specializations/",
+                    importtime=False, env=None):
+    """Запускает новый интерпретатор и замеряет время до первого ответа.
+
+    Приложение загружается так же, как сервер: по WSGI_APPLICATION.
+    total_ms — от запуска процесса до ответа (включая старт Python),
+    setup_ms — загрузка приложения, first_request_ms — первый запрос.
+    С importtime=True в imports — разбор ``python -X importtime``.
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", PROBE, path]
+    environment = {**os.environ, "DJANGO_SETTINGS_MODULE":
+                   os.environ.get("DJANGO_SETTINGS_MODULE", "mis_backend.settings"),
+                   **(env or {})}
+    started = time.perf_counter()
+    process = subprocess.run(
+        command, capture_output=True, text=True, env=environment,
+        cwd=settings.BASE_DIR, check=True)
+    total = time.perf_counter() - started
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["total_ms"] = total * 1000
+    if importtime:
+        result["imports"] = parse_importtime(process.stderr)
+    return result
+
+
+def parse_importtime(output):
+    """Строки ``-X importtime``: (модуль, собственное и суммарное время, мкс)."""
+    imports = []
+    for line in output.splitlines():
+        match = IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, _, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def by_package(imports):
+    """Собственное время импорта, сложенное по пакетам верхнего уровня."""
+    totals = defaultdict(int)
+    for module, self_us, _ in imports:
+        totals[module.partition(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
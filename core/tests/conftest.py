@@ -1,5 +1,13 @@
 import pytest
-from core.models import User, DoctorProfile, PatientProfile, Clinic
+from rest_framework.test import APIClient
+from core.models import (User, DoctorProfile, PatientProfile, Clinic,
+                         Specialization)
+
+
+@pytest.fixture(autouse=True)
+def synchronous_audit_log(settings):
+    # Фоновый поток журнала писал бы в базу мимо транзакции теста.
+    settings.AUDIT_LOG_FLUSH_INTERVAL = None
 
 
 @pytest.fixture
@@ -9,7 +17,8 @@ def doctor_user(db):
         password="testpass",
         role="doctor")
     doctor_profile = DoctorProfile.objects.create(
-        user=user, specialization="Кардиолог")
+        user=user, specialization=Specialization.objects.get_or_create(
+            name="Кардиолог")[0])
     clinic = Clinic.objects.create(
         name="Test Clinic",
         legal_address="Адрес 1",
@@ -38,3 +47,16 @@ def clinic(db):
         name="Test Clinic",
         legal_address="Адрес 1",
         physical_address="Адрес 2")
+
+
+@pytest.fixture
+def admin_api_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def admin_api_client(admin_api_user):
+    client = APIClient()
+    client.force_authenticate(user=admin_api_user)
+    return client
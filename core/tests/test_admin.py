@@ -0,0 +1,93 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from core.models import Consultation, Clinic, DoctorProfile, Specialization
+from core.pagination import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def clinic(db):
+    return Clinic.objects.create(
+        name="Test Clinic",
+        legal_address="123 Legal St",
+        physical_address="456 Physical St")
+
+
+def create_consultations(count, clinic, offset=0):
+    start = now() + timedelta(days=1)
+    for i in range(offset, offset + count):
+        doctor = User.objects.create(username=f"doctor{i}", role="doctor")
+        patient = User.objects.create(username=f"patient{i}", role="patient")
+        Consultation.objects.create(
+            doctor=doctor, patient=patient, clinic=clinic,
+            start_time=start, end_time=start + timedelta(hours=1))
+
+
+def changelist_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.django_db
+def test_consultation_changelist_query_count_is_constant(admin_user, clinic):
+    client = Client()
+    client.force_login(admin_user)
+    url = "/admin/core/consultation/"
+
+    create_consultations(2, clinic)
+    few = changelist_queries(client, url)
+    create_consultations(10, clinic, offset=2)
+    many = changelist_queries(client, url)
+
+    assert many == few
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url", [
+    "/admin/core/user/",
+    "/admin/core/clinic/",
+    "/admin/core/doctorprofile/",
+    "/admin/core/patientprofile/",
+])
+def test_admin_changelists_render(admin_user, clinic, url):
+    doctor = User.objects.create_user(
+        username="doctor", password="x", role="doctor")
+    specialization = Specialization.objects.create(name="Терапевт")
+    DoctorProfile.objects.create(user=doctor, specialization=specialization)
+    client = Client()
+    client.force_login(admin_user)
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_estimated_paginator_falls_back_to_exact_count(clinic):
+    create_consultations(3, clinic)
+    paginator = EstimatedCountPaginator(
+        Consultation.objects.order_by("id"), 2)
+    assert paginator.estimated_count() is None
+    assert paginator.count == 3
+
+
+@pytest.mark.django_db
+def test_estimated_paginator_uses_estimate_for_large_tables(monkeypatch):
+    monkeypatch.setattr(EstimatedCountPaginator, "estimated_count",
+                        lambda self: 2_000_000)
+    paginator = EstimatedCountPaginator(
+        Consultation.objects.order_by("id"), 50)
+    with CaptureQueriesContext(connection) as queries:
+        assert paginator.count == 2_000_000
+    assert len(queries) == 0
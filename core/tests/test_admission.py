@@ -0,0 +1,95 @@
+import threading
+import pytest
+from django.contrib.auth import get_user_model
+from core.admission import AdmissionController, admission_controller
+
+User = get_user_model()
+
+CLASSES = {
+    "critical": {"share": None, "queue_timeout": 0},
+    "default": {"share": 1.0, "queue_timeout": 0},
+    "browse": {"share": 0.5, "queue_timeout": 0, "retry_after": 7},
+}
+ENDPOINTS = {
+    "consultations-list POST": ("critical", None),
+    "consultations-list GET": ("browse", 1),
+    "consultations-available-dates": ("browse", None),
+}
+
+
+@pytest.fixture
+def small_capacity(settings):
+    settings.ADMISSION_CONTROL = {
+        "CAPACITY": 2, "DEFAULT_CLASS": "default",
+        "CLASSES": CLASSES, "ENDPOINTS": ENDPOINTS}
+    return admission_controller()
+
+
+def test_low_priority_is_shed_before_critical():
+    controller = AdmissionController(2, CLASSES, ENDPOINTS, "default")
+
+    assert controller.classify("consultations-list", "GET") == ("browse", 1)
+    assert controller.classify("consultations-sync", "GET") == ("default", None)
+    assert controller.try_acquire("x", "default", None)
+    assert not controller.acquire("consultations-available-dates", "browse", None)
+    assert controller.try_acquire("y", "default", None)
+    assert not controller.try_acquire("z", "default", None)
+    assert controller.try_acquire("consultations-list", "critical", None)
+    assert controller.snapshot()["in_flight"] == 3
+    assert controller.snapshot()["rejected"] == {
+        "consultations-available-dates": 1}
+
+
+def test_endpoint_limit_and_queueing():
+    classes = dict(CLASSES, browse={"share": None, "queue_timeout": 5})
+    controller = AdmissionController(10, classes, ENDPOINTS, "default")
+    assert controller.try_acquire("consultations-list", "browse", 1)
+    assert not controller.try_acquire("consultations-list", "browse", 1)
+
+    timer = threading.Timer(
+        0.05, controller.release, ["consultations-list", "browse"])
+    timer.start()
+    # Ждёт в очереди, пока первый запрос не завершится.
+    assert controller.acquire("consultations-list", "browse", 1)
+    timer.join()
+    assert controller.snapshot()["by_endpoint"] == {"consultations-list": 1}
+
+
+def test_full_queue_rejects_without_waiting():
+    classes = dict(CLASSES, browse={"share": 0.5, "queue_timeout": 5,
+                                    "max_queue": 0})
+    controller = AdmissionController(2, classes, ENDPOINTS, "default")
+    assert controller.try_acquire("x", "default", None)
+
+    assert not controller.acquire("consultations-available-dates", "browse", None)
+    assert controller.snapshot()["waiting"] == {}
+
+
+@pytest.mark.django_db
+def test_overloaded_browse_gets_503_while_writes_pass(
+        small_capacity, admin_api_client):
+    assert small_capacity.try_acquire("other", "default", None)
+
+    response = admin_api_client.get("/api/consultations/available_dates/")
+
+    assert response.status_code == 503
+    assert response["Retry-After"] == "7"
+    response = admin_api_client.post("/api/consultations/", {}, format="json")
+    assert response.status_code != 503
+
+    small_capacity.release("other", "default")
+    response = admin_api_client.get("/api/consultations/available_dates/")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_admission_status_exposes_counts(small_capacity, admin_api_client):
+    small_capacity.reject("consultations-available-dates")
+
+    response = admin_api_client.get("/api/admission/")
+
+    assert response.status_code == 200
+    assert response.data["capacity"] == 2
+    assert response.data["in_flight"] == 1
+    assert response.data["by_endpoint"] == {"admission_status": 1}
+    assert response.data["rejected"] == {"consultations-available-dates": 1}
@@ -0,0 +1,147 @@
+import pytest
+from datetime import date, datetime, time, timedelta
+from django.core.cache import cache
+from django.utils.timezone import make_aware
+from rest_framework.test import APIClient
+from core.models import Consultation, User
+
+# Понедельник в будущем, чтобы консультации можно было переносить.
+MONDAY = date.today() + timedelta(days=14 - date.today().weekday())
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def doctor_client(doctor_user):
+    client = APIClient()
+    client.force_authenticate(user=doctor_user)
+    return client
+
+
+def at(day, hour):
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def book(doctor_user, patient_user, day, hour, **kwargs):
+    return Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user,
+        clinic=doctor_user.doctor_profile.clinics.get(),
+        start_time=at(day, hour), end_time=at(day, hour + 1), **kwargs)
+
+
+@pytest.mark.django_db
+def test_doctor_sees_own_day_and_week(doctor_user, patient_user, doctor_client):
+    patient_user.last_name, patient_user.first_name = "Иванов", "Иван"
+    patient_user.save()
+    late = book(doctor_user, patient_user, MONDAY, 15)
+    early = book(doctor_user, patient_user, MONDAY, 9)
+    wednesday = book(doctor_user, patient_user, MONDAY + timedelta(days=2), 9)
+    book(doctor_user, patient_user, MONDAY + timedelta(days=7), 9)
+
+    day = doctor_client.get(f"/api/consultations/agenda/?date={MONDAY}")
+    week = doctor_client.get(
+        f"/api/consultations/agenda/?date={MONDAY + timedelta(days=3)}&range=week")
+
+    assert day.status_code == 200
+    assert [item["id"] for item in day.data["consultations"]] == [early.id, late.id]
+    assert day.data["consultations"][0]["patient"]["name"] == "Иванов Иван"
+    assert day.data["consultations"][0]["clinic"]["name"] == "Test Clinic"
+    assert week.data["date_from"] == MONDAY
+    assert week.data["date_to"] == MONDAY + timedelta(days=6)
+    assert [item["id"] for item in week.data["consultations"]] == [
+        early.id, late.id, wednesday.id]
+
+
+@pytest.mark.django_db
+def test_agenda_is_built_in_one_query_and_cached(
+        doctor_user, patient_user, doctor_client, django_assert_num_queries):
+    book(doctor_user, patient_user, MONDAY, 9)
+    book(doctor_user, patient_user, MONDAY, 11)
+    url = f"/api/consultations/agenda/?date={MONDAY}"
+
+    with django_assert_num_queries(1):
+        first = doctor_client.get(url)
+    with django_assert_num_queries(0):
+        second = doctor_client.get(url)
+
+    assert second.data == first.data
+
+
+@pytest.mark.django_db
+def test_writes_invalidate_cached_agenda(
+        doctor_user, patient_user, admin_user, doctor_client,
+        django_capture_on_commit_callbacks):
+    consultation = book(doctor_user, patient_user, MONDAY, 9)
+    url = f"/api/consultations/agenda/?date={MONDAY}&range=week"
+    assert doctor_client.get(url).data["consultations"][0]["status"] == "ожидает"
+    admin = APIClient()
+    admin.force_authenticate(user=admin_user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin.patch(f"/api/consultations/{consultation.id}/set_schedule/",
+                    {"start_time": at(MONDAY, 13).isoformat()}, format="json")
+    item = doctor_client.get(url).data["consultations"][0]
+    assert item["status"] == "подтверждена"
+    assert item["start_time"] == at(MONDAY, 13)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Consultation.objects.filter(id=consultation.id).transition("начата")
+    item = doctor_client.get(url).data["consultations"][0]
+    assert item["status"] == "начата"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        consultation.delete()
+    assert doctor_client.get(url).data["consultations"] == []
+
+
+@pytest.mark.django_db
+def test_generic_update_invalidates_cached_agenda(
+        doctor_user, patient_user, admin_user, doctor_client,
+        django_capture_on_commit_callbacks):
+    consultation = book(doctor_user, patient_user, MONDAY, 9)
+    url = f"/api/consultations/agenda/?date={MONDAY}"
+    assert doctor_client.get(url).data["consultations"][0]["status"] == "ожидает"
+    admin = APIClient()
+    admin.force_authenticate(user=admin_user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin.patch(f"/api/consultations/{consultation.id}/",
+                               {"status": "подтверждена"}, format="json")
+    assert response.status_code == 200
+    assert doctor_client.get(url).data["consultations"][0]["status"] == "подтверждена"
+
+    other = User.objects.create_user(
+        username="doctor2", password="testpass", role="doctor")
+    with django_capture_on_commit_callbacks(execute=True):
+        admin.patch(f"/api/consultations/{consultation.id}/",
+                    {"doctor": other.id}, format="json")
+    assert doctor_client.get(url).data["consultations"] == []
+
+
+@pytest.mark.django_db
+def test_agenda_access_and_validation(doctor_user, patient_user, admin_user):
+    book(doctor_user, patient_user, MONDAY, 9)
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+    assert client.get("/api/consultations/agenda/").status_code == 403
+
+    client.force_authenticate(user=admin_user)
+    assert client.get("/api/consultations/agenda/").status_code == 400
+    response = client.get(
+        f"/api/consultations/agenda/?doctor={doctor_user.id}&date={MONDAY}")
+    assert len(response.data["consultations"]) == 1
+    assert client.get(
+        f"/api/consultations/agenda/?doctor={doctor_user.id}&range=month"
+    ).status_code == 400
+    assert client.get(
+        f"/api/consultations/agenda/?doctor={doctor_user.id}&date=2026-02-31"
+    ).status_code == 400
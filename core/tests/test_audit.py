@@ -0,0 +1,170 @@
+import time as clock
+import pytest
+from datetime import datetime, time, timedelta
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, make_aware, now
+from rest_framework.test import APIClient
+from core.audit import AuditBuffer, audit_buffer
+from core.models import Consultation, ConsultationAuditEntry
+
+
+def at(days, hour):
+    day = localdate() + timedelta(days=days)
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def book(doctor_user, patient_user, days, hour, **kwargs):
+    return Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user,
+        clinic=doctor_user.doctor_profile.clinics.get(),
+        start_time=at(days, hour), end_time=at(days, hour + 1), **kwargs)
+
+
+def entry(consultation_id=1):
+    return ConsultationAuditEntry(
+        consultation_id=consultation_id, doctor_id=1, patient_id=2,
+        clinic_id=3, event="status", status="начата", recorded_at=now())
+
+
+@pytest.mark.django_db
+def test_transitions_are_logged_after_flush(
+        doctor_user, patient_user, admin_api_user, admin_api_client,
+        django_capture_on_commit_callbacks):
+    patient_client = APIClient()
+    patient_client.force_authenticate(user=patient_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        created = patient_client.post("/api/consultations/", {
+            "doctor": doctor_user.id,
+            "clinic": doctor_user.doctor_profile.clinics.get().id,
+            "start_time": at(3, 10).isoformat()}, format="json")
+        consultation_id = created.data["id"]
+        admin_api_client.patch(
+            f"/api/consultations/{consultation_id}/set_schedule/",
+            {"start_time": at(3, 12).isoformat()}, format="json")
+        Consultation.objects.filter(id=consultation_id).transition("начата")
+        admin_api_client.delete(f"/api/consultations/{consultation_id}/")
+
+    # Запись отложенная: до сброса буфера таблица пуста.
+    assert not ConsultationAuditEntry.objects.exists()
+    response = admin_api_client.get(f"/api/audit/?consultation={consultation_id}")
+
+    entries = response.data["entries"][::-1]
+    assert [(item["event"], item["previous_status"], item["status"])
+            for item in entries] == [
+        ("created", None, "ожидает"),
+        ("rescheduled", "ожидает", "подтверждена"),
+        ("status", "подтверждена", "начата"),
+        ("deleted", None, "начата"),
+    ]
+    assert [item["actor_id"] for item in entries] == [
+        patient_user.id, admin_api_user.id, None, admin_api_user.id]
+    assert entries[1]["start_time"] == at(3, 12).isoformat().replace("+00:00", "Z")
+
+
+@pytest.mark.django_db
+def test_generic_update_is_logged(
+        doctor_user, patient_user, admin_api_user, admin_api_client,
+        django_capture_on_commit_callbacks):
+    consultation = book(doctor_user, patient_user, 3, 10)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_api_client.patch(
+            f"/api/consultations/{consultation.id}/",
+            {"status": "завершена"}, format="json")
+
+    assert response.status_code == 200
+    audit_buffer().flush()
+    assert list(ConsultationAuditEntry.objects.values_list(
+        "event", "previous_status", "status", "actor_id")) == [
+        ("status", "ожидает", "завершена", admin_api_user.id)]
+
+
+@pytest.mark.django_db
+def test_bulk_transitions_are_inserted_in_batches(
+        doctor_user, patient_user, settings, django_capture_on_commit_callbacks):
+    settings.AUDIT_LOG_BATCH_SIZE = 2
+    for hour in range(9, 14):
+        book(doctor_user, patient_user, 3, hour, status="подтверждена")
+
+    with CaptureQueriesContext(connection) as queries, \
+            django_capture_on_commit_callbacks(execute=True):
+        rows = Consultation.objects.all().transition("начата")
+
+    inserts = [query for query in queries
+               if query["sql"].startswith('INSERT INTO "core_consultationauditentry"')]
+    assert len(inserts) == 3
+    assert len(audit_buffer()) == 0
+    assert set(ConsultationAuditEntry.objects.values_list(
+        "consultation_id", flat=True)) == {row["id"] for row in rows}
+
+
+@pytest.mark.django_db
+def test_rolled_back_changes_are_not_logged(
+        doctor_user, patient_user, django_capture_on_commit_callbacks):
+    consultation = book(doctor_user, patient_user, 3, 10)
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        Consultation.objects.filter(id=consultation.id).transition("начата")
+
+    assert callbacks
+    assert len(audit_buffer()) == 0
+
+
+@pytest.mark.django_db
+def test_buffer_loss_is_bounded_when_database_fails(monkeypatch):
+    buffer = AuditBuffer(batch_size=10, flush_interval=None, max_pending=3)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("база недоступна")
+
+    monkeypatch.setattr(QuerySet, "bulk_create", fail)
+    with pytest.raises(RuntimeError):
+        buffer.append([entry(pk) for pk in range(1, 6)])
+    assert len(buffer) == 3
+    assert buffer.dropped == 2
+
+    monkeypatch.undo()
+    assert buffer.flush() == 3
+    assert sorted(ConsultationAuditEntry.objects.values_list(
+        "consultation_id", flat=True)) == [3, 4, 5]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_writer_flushes_on_interval():
+    buffer = AuditBuffer(batch_size=100, flush_interval=0.01, max_pending=1000)
+    try:
+        buffer.append([entry(), entry()])
+        deadline = clock.monotonic() + 5
+        while len(buffer) and clock.monotonic() < deadline:
+            clock.sleep(0.01)
+    finally:
+        buffer.stop()
+
+    assert ConsultationAuditEntry.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_audit_api_filters_and_pages(admin_api_client, patient_user):
+    ConsultationAuditEntry.objects.bulk_create(
+        [entry(1), entry(2), entry(1), entry(1)])
+
+    first = admin_api_client.get("/api/audit/?consultation=1&limit=2")
+    second = admin_api_client.get(
+        f"/api/audit/?consultation=1&limit=2&before={first.data['next_before']}")
+
+    ids = [item["id"] for item in first.data["entries"] + second.data["entries"]]
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == 3
+    assert second.data["next_before"] is None
+    assert admin_api_client.get("/api/audit/?doctor=x").status_code == 400
+    entry_obj = ConsultationAuditEntry.objects.first()
+    entry_obj.status = "оплачена"
+    with pytest.raises(ValidationError):
+        entry_obj.save()
+
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+    assert client.get("/api/audit/").status_code == 403
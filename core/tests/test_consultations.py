@@ -1,6 +1,6 @@
 import pytest
 from django.contrib.auth import get_user_model
-from core.models import Consultation, Clinic, DoctorProfile
+from core.models import Consultation, Clinic, DoctorProfile, Specialization
 from datetime import timedelta
 from django.utils.timezone import now
 from rest_framework.test import APIClient
@@ -30,7 +30,8 @@ def doctor_user(db, clinic):
         password="doctorpass",
         role="doctor")
     doctor_profile = DoctorProfile.objects.create(
-        user=doctor, specialization="Терапевт")
+        user=doctor, specialization=Specialization.objects.get_or_create(
+            name="Терапевт")[0])
     doctor_profile.clinics.add(clinic)
     return doctor
 
@@ -207,12 +208,14 @@ def test_get_specializations(admin_user, doctor_user):
     client.force_authenticate(user=admin_user)
     DoctorProfile.objects.get_or_create(
         user=doctor_user, defaults={
-            "specialization": "Терапевт"})
+            "specialization": Specialization.objects.get_or_create(
+                name="Терапевт")[0]})
     another_doctor = User.objects.create_user(
         username="doctor2", password="doctorpass", role="doctor")
     DoctorProfile.objects.get_or_create(
         user=another_doctor, defaults={
-            "specialization": "Хирург"})
+            "specialization": Specialization.objects.get_or_create(
+                name="Хирург")[0]})
     response = client.get("/api/consultations/specializations/")
     assert response.status_code == 200
     assert "Терапевт" in response.data["specializations"]
@@ -224,7 +227,9 @@ def test_get_clinics_by_specialization(admin_user, doctor_user, clinic):
     client = APIClient()
     client.force_authenticate(user=admin_user)
     doctor_profile, _ = DoctorProfile.objects.get_or_create(
-        user=doctor_user, defaults={"specialization": "Терапевт"})
+        user=doctor_user, defaults={
+            "specialization": Specialization.objects.get_or_create(
+                name="Терапевт")[0]})
     doctor_profile.clinics.add(clinic)
     response = client.get(
         "/api/consultations/clinics_by_specialization/?specialization=Терапевт")
@@ -238,7 +243,9 @@ def test_get_doctors_by_clinic(admin_user, doctor_user, clinic):
     client = APIClient()
     client.force_authenticate(user=admin_user)
     doctor_profile, _ = DoctorProfile.objects.get_or_create(
-        user=doctor_user, defaults={"specialization": "Терапевт"})
+        user=doctor_user, defaults={
+            "specialization": Specialization.objects.get_or_create(
+                name="Терапевт")[0]})
     doctor_profile.clinics.add(clinic)
     response = client.get(
         f"/api/consultations/doctors_by_clinic/?specialization=Терапевт&clinic={clinic.id}")
@@ -253,7 +260,9 @@ def test_get_available_dates(admin_user, doctor_user, clinic):
     client = APIClient()
     client.force_authenticate(user=admin_user)
     doctor_profile, _ = DoctorProfile.objects.get_or_create(
-        user=doctor_user, defaults={"specialization": "Терапевт"})
+        user=doctor_user, defaults={
+            "specialization": Specialization.objects.get_or_create(
+                name="Терапевт")[0]})
     doctor_profile.clinics.add(clinic)
     response = client.get(
         f"/api/consultations/available_dates/?doctor={doctor_user.id}")
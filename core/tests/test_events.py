@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+import pytest
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from core.events import LocalBroker, get_broker
+from core.models import Consultation, Clinic
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def doctor_user(db):
+    return User.objects.create_user(
+        username="doctor1", password="doctorpass", role="doctor")
+
+
+@pytest.fixture
+def patient_user(db):
+    return User.objects.create_user(
+        username="patient1", password="patientpass", role="patient")
+
+
+@pytest.fixture
+def clinic(db):
+    return Clinic.objects.create(
+        name="Test Clinic",
+        legal_address="123 Legal St",
+        physical_address="456 Physical St")
+
+
+def make_event(doctor=1, clinic=1):
+    return {"event": "created", "id": 1, "doctor": doctor, "patient": 2,
+            "clinic": clinic, "status": "ожидает", "previous_status": None,
+            "start_time": None, "end_time": None}
+
+
+def test_local_broker_filters_by_doctor_and_clinic():
+    broker = LocalBroker()
+
+    async def scenario():
+        async with broker.subscribe(doctor_id=1) as by_doctor, \
+                broker.subscribe(clinic_id=7) as by_clinic:
+            broker.publish(make_event(doctor=1, clinic=3))
+            broker.publish(make_event(doctor=2, clinic=7))
+            first = await asyncio.wait_for(by_doctor.get(), 1)
+            second = await asyncio.wait_for(by_clinic.get(), 1)
+            assert by_doctor.queue.empty() and by_clinic.queue.empty()
+            return first, second
+
+    first, second = async_to_sync(scenario)()
+    assert first["doctor"] == 1
+    assert second["clinic"] == 7
+    assert broker.subscriber_count() == 0
+
+
+def test_local_broker_accepts_events_from_other_threads():
+    broker = LocalBroker()
+
+    async def scenario():
+        async with broker.subscribe() as subscription:
+            thread = threading.Thread(
+                target=broker.publish, args=(make_event(),))
+            thread.start()
+            thread.join()
+            return await asyncio.wait_for(subscription.get(), 1)
+
+    assert async_to_sync(scenario)()["event"] == "created"
+
+
+@pytest.mark.django_db
+def test_consultation_changes_are_published_on_commit(
+        admin_user, doctor_user, patient_user, clinic,
+        django_capture_on_commit_callbacks):
+    consultation = Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user, clinic=clinic,
+        start_time=now() + timedelta(days=1),
+        end_time=now() + timedelta(days=1, hours=1))
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    published = []
+    broker = get_broker()
+    original_publish = broker.publish
+    broker.publish = published.append
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(
+                f"/api/consultations/{consultation.id}/set_schedule/",
+                {"start_time": (now() + timedelta(days=2)).isoformat()})
+    finally:
+        broker.publish = original_publish
+
+    assert [event["event"] for event in published] == ["rescheduled"]
+    assert published[0]["doctor"] == doctor_user.id
+    assert published[0]["previous_status"] == "ожидает"
+    assert published[0]["status"] == "подтверждена"
+
+
+@pytest.mark.django_db
+def test_event_stream_requires_token():
+    response = async_to_sync(AsyncClient().get)("/api/consultations/events/")
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_event_stream_delivers_matching_events(doctor_user):
+    token = str(AccessToken.for_user(doctor_user))
+
+    async def scenario():
+        response = await AsyncClient().get(
+            "/api/consultations/events/",
+            {"doctor": doctor_user.id, "token": token})
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/event-stream"
+        stream = aiter(response.streaming_content)
+        assert await anext(stream) == b"retry: 3000\n\n"
+        get_broker().publish(make_event(doctor=doctor_user.id + 1))
+        get_broker().publish(make_event(doctor=doctor_user.id))
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        await stream.aclose()
+        return chunk.decode()
+
+    chunk = async_to_sync(scenario)()
+    event_line, data_line = chunk.strip().split("\n")
+    assert event_line == "event: created"
+    assert json.loads(data_line[len("data: "):])["doctor"] == doctor_user.id
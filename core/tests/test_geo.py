@@ -0,0 +1,110 @@
+import random
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core import geo
+from core.models import Clinic, DoctorProfile, Specialization, User
+
+MOSCOW = (55.7558, 37.6173)
+
+
+def make_clinic(name, latitude=None, longitude=None):
+    return Clinic.objects.create(
+        name=name, legal_address="A", physical_address="B",
+        latitude=latitude, longitude=longitude)
+
+
+def staff(clinics, specialization, username):
+    user = User.objects.create_user(
+        username=username, password="doctorpass", role="doctor")
+    profile = DoctorProfile.objects.create(
+        user=user,
+        specialization=Specialization.objects.get_or_create(
+            name=specialization)[0])
+    profile.clinics.set(clinics)
+
+
+def test_geohash_matches_reference_and_neighbourhood():
+    assert geo.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    cells = geo.neighbourhood(*MOSCOW, 5)
+    assert len(cells) == 9
+    assert geo.encode(*MOSCOW, 5) in cells
+    assert geo.neighbourhood(90, 0, 3) == sorted(set(geo.neighbourhood(90, 0, 3)))
+
+
+def test_prefix_range_uses_only_geohash_characters():
+    assert geo._after_prefix("ucfv") == "ucfw"
+    assert geo._after_prefix("uczz") == "ud"
+    assert geo._after_prefix("zz") is None
+    assert geo.prefix_filter(["u9"]) == geo.Q(geohash__gte="u9", geohash__lt="ub")
+    assert geo.prefix_filter(["z"]) == geo.Q(geohash__gte="z")
+
+
+@pytest.mark.django_db
+def test_nearest_matches_full_scan():
+    rng = random.Random(7)
+    for index in range(80):
+        make_clinic(f"Clinic {index}",
+                    MOSCOW[0] + rng.uniform(-0.5, 0.5),
+                    MOSCOW[1] + rng.uniform(-0.8, 0.8))
+    make_clinic("Без координат")
+    point = (MOSCOW[0] + 0.01, MOSCOW[1] - 0.02)
+
+    expected = sorted(
+        Clinic.objects.exclude(latitude=None),
+        key=lambda clinic: geo.distance_km(
+            *point, clinic.latitude, clinic.longitude))[:5]
+    found = geo.nearest(Clinic.objects.all(), *point, 5)
+
+    assert [clinic.id for clinic, _ in found] == [clinic.id for clinic in expected]
+    assert [distance for _, distance in found] == sorted(
+        distance for _, distance in found)
+
+
+@pytest.mark.django_db
+def test_dense_area_is_answered_by_one_indexed_query():
+    for index in range(3):
+        make_clinic(f"Clinic {index}", MOSCOW[0] + index * 0.001, MOSCOW[1])
+    make_clinic("Far", 59.94, 30.31)
+
+    with CaptureQueriesContext(connection) as queries:
+        found = geo.nearest(Clinic.objects.all(), *MOSCOW, 2)
+
+    assert [clinic.name for clinic, _ in found] == ["Clinic 0", "Clinic 1"]
+    assert len(queries) == 1
+    assert '"geohash" >=' in queries[0]["sql"]
+
+
+@pytest.mark.django_db
+def test_geohash_follows_coordinates():
+    clinic = make_clinic("Clinic", *MOSCOW)
+    assert clinic.geohash == geo.encode(*MOSCOW)
+
+    clinic.latitude, clinic.longitude = 59.94, 30.31
+    clinic.save(update_fields=["latitude", "longitude"])
+    clinic.refresh_from_db()
+    assert clinic.geohash == geo.encode(59.94, 30.31)
+
+
+@pytest.mark.django_db
+def test_nearest_clinics_with_specialization():
+    near = make_clinic("Рядом", MOSCOW[0] + 0.01, MOSCOW[1])
+    far = make_clinic("Далеко", 59.94, 30.31)
+    other = make_clinic("Другая специальность", *MOSCOW)
+    staff([near, far], "Кардиолог", "cardio1")
+    staff([far], "Кардиолог", "cardio2")
+    staff([other], "Хирург", "surgeon")
+    client = APIClient()
+    client.force_authenticate(
+        user=User.objects.create(username="patient", role="patient"))
+    url = "/api/consultations/clinics_by_specialization/?specialization=Кардиолог"
+
+    response = client.get(f"{url}&lat={MOSCOW[0]}&lon={MOSCOW[1]}&limit=5")
+
+    assert response.status_code == 200
+    assert [clinic["id"] for clinic in response.data["clinics"]] == [near.id, far.id]
+    assert response.data["clinics"][0]["distance_km"] == pytest.approx(1.11, abs=0.01)
+    assert client.get(f"{url}&lat=abc&lon=1").status_code == 400
+    assert client.get(f"{url}&lat=91&lon=1").status_code == 400
+    assert client.get(f"{url}&lat=1&lon=1&limit=0").status_code == 400
@@ -0,0 +1,146 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, make_aware
+from rest_framework.test import APIClient
+from core.ical import _fold
+from core.models import Consultation, User
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+def at(days, hour):
+    day = localdate() + timedelta(days=days)
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def book(doctor_user, patient_user, days, hour, **kwargs):
+    return Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user,
+        clinic=doctor_user.doctor_profile.clinics.get(),
+        start_time=at(days, hour), end_time=at(days, hour + 1), **kwargs)
+
+
+def feed_path(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = client.post("/api/calendar/").data["url"]
+    return url[url.index("/api/"):]
+
+
+def body(response):
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_feed_lists_user_consultations_without_jwt(doctor_user, patient_user):
+    doctor_user.last_name, doctor_user.first_name = "Иванов", "Пётр"
+    doctor_user.save()
+    book(doctor_user, patient_user, 2, 10)
+    book(doctor_user, patient_user, 3, 10, status="подтверждена")
+    book(doctor_user, patient_user, -60, 10)
+
+    response = Client().get(feed_path(patient_user))
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/calendar; charset=utf-8"
+    assert response["ETag"] and response["Last-Modified"]
+    text = body(response)
+    assert text.startswith("BEGIN:VCALENDAR\r\n")
+    assert text.endswith("END:VCALENDAR\r\n")
+    # Консультация двухмесячной давности вне окна ленты.
+    assert text.count("BEGIN:VEVENT") == 2
+    assert "SUMMARY:Консультация: Иванов Пётр\r\n" in text
+    assert "LOCATION:Test Clinic\r\n" in text
+    assert text.index("STATUS:TENTATIVE") < text.index("STATUS:CONFIRMED")
+    assert f"DTSTART:{at(2, 10).strftime('%Y%m%dT%H%M%SZ')}" in text
+
+
+def test_long_lines_are_folded_on_character_boundaries():
+    line = "DESCRIPTION:" + "ж" * 60
+    folded = _fold(line)
+
+    parts = folded[:-2].split("\r\n")
+    assert all(len(part.encode()) <= 75 for part in parts)
+    assert all(part.startswith(" ") for part in parts[1:])
+    assert "".join(part[1:] if index else part
+                   for index, part in enumerate(parts)) == line
+
+
+@pytest.mark.django_db
+def test_unchanged_feed_is_not_modified_without_reading_rows(
+        doctor_user, patient_user):
+    book(doctor_user, patient_user, 2, 10)
+    path = feed_path(doctor_user)
+    first = Client().get(path)
+    body(first)
+
+    for headers in ({"HTTP_IF_NONE_MATCH": first["ETag"]},
+                    {"HTTP_IF_MODIFIED_SINCE": first["Last-Modified"]}):
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(path, **headers)
+        assert response.status_code == 304
+        # Только агрегаты: сами консультации не читаются.
+        reads = [query["sql"] for query in queries
+                 if 'FROM "core_consultation"' in query["sql"]]
+        assert reads and all("MAX(" in sql for sql in reads)
+
+
+@pytest.mark.django_db
+def test_changes_produce_new_etag(doctor_user, patient_user, admin_user,
+                                  django_capture_on_commit_callbacks):
+    path = feed_path(patient_user)
+    consultation = book(doctor_user, patient_user, 2, 10)
+    admin_client = APIClient()
+    admin_client.force_authenticate(user=admin_user)
+
+    def etag():
+        return Client().get(path)["ETag"]
+
+    seen = [etag()]
+    admin_client.patch(
+        f"/api/consultations/{consultation.id}/set_schedule/",
+        {"start_time": at(2, 12).isoformat()}, format="json")
+    seen.append(etag())
+    Consultation.objects.filter(id=consultation.id).transition("начата")
+    seen.append(etag())
+    with django_capture_on_commit_callbacks(execute=True):
+        admin_client.delete(f"/api/consultations/{consultation.id}/")
+    seen.append(etag())
+
+    assert len(set(seen)) == 4
+    assert "BEGIN:VEVENT" not in body(Client().get(path))
+
+
+@pytest.mark.django_db
+def test_unknown_and_rotated_tokens_are_rejected(patient_user):
+    old_path = feed_path(patient_user)
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+
+    new_url = client.post("/api/calendar/").data["url"]
+
+    assert Client().get(old_path).status_code == 404
+    assert Client().get(new_url[new_url.index("/api/"):]).status_code == 200
+    assert Client().get("/api/calendar/unknown.ics").status_code == 404
+    assert APIClient().get("/api/calendar/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_reading_feed_url_does_not_create_or_rotate_token(patient_user):
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+
+    assert client.get("/api/calendar/").data == {"url": None}
+    patient_user.refresh_from_db()
+    assert not patient_user.calendar_token
+
+    url = client.post("/api/calendar/").data["url"]
+    assert client.get("/api/calendar/").data["url"] == url
+    assert client.get("/api/calendar/").data["url"] == url
@@ -0,0 +1,160 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.utils.timezone import localdate, make_aware, now
+from rest_framework.test import APIClient
+from core.models import Consultation, ConsultationSeries, IdempotencyKey, User
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def patient_client(patient_user):
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+    return client
+
+
+def at(days, hour):
+    day = localdate() + timedelta(days=days)
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def booking(doctor_user, hour=10):
+    return {"doctor": doctor_user.id,
+            "clinic": doctor_user.doctor_profile.clinics.get().id,
+            "start_time": at(3, hour).isoformat()}
+
+
+@pytest.mark.django_db
+def test_retried_create_replays_first_response(doctor_user, patient_client):
+    first = patient_client.post("/api/consultations/", booking(doctor_user),
+                                format="json", HTTP_IDEMPOTENCY_KEY="abc")
+    retry = patient_client.post("/api/consultations/", booking(doctor_user),
+                                format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.data == first.data
+    assert retry["Idempotent-Replayed"] == "true"
+    assert Consultation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_key_reused_with_other_request_is_rejected(doctor_user, patient_client):
+    patient_client.post("/api/consultations/", booking(doctor_user),
+                        format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+    response = patient_client.post(
+        "/api/consultations/", booking(doctor_user, hour=12),
+        format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+    assert response.status_code == 422
+    assert Consultation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_validation_errors_are_replayed(doctor_user, patient_client):
+    request = dict(booking(doctor_user), start_time=at(-3, 10).isoformat())
+    first = patient_client.post("/api/consultations/", request, format="json",
+                                HTTP_IDEMPOTENCY_KEY="past")
+    retry = patient_client.post("/api/consultations/", request, format="json",
+                                HTTP_IDEMPOTENCY_KEY="past")
+
+    assert first.status_code == 400
+    assert retry.status_code == 400
+    assert retry.data == first.data
+
+
+@pytest.mark.django_db
+def test_request_in_progress_returns_conflict(doctor_user, patient_client):
+    patient_client.post("/api/consultations/", booking(doctor_user),
+                        format="json", HTTP_IDEMPOTENCY_KEY="abc")
+    # Первый запрос ещё не записал ответ.
+    IdempotencyKey.objects.update(status_code=None, response=None)
+
+    response = patient_client.post("/api/consultations/", booking(doctor_user),
+                                   format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+    assert response.status_code == 409
+    assert response["Retry-After"] == "1"
+
+
+@pytest.mark.django_db
+def test_retried_set_schedule_skips_business_logic(
+        doctor_user, patient_user, admin_user, django_assert_num_queries):
+    consultation = Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user,
+        clinic=doctor_user.doctor_profile.clinics.get(),
+        start_time=at(3, 10), end_time=at(3, 11))
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    url = f"/api/consultations/{consultation.id}/set_schedule/"
+    data = {"start_time": at(4, 9).isoformat()}
+
+    first = client.patch(url, data, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+    with django_assert_num_queries(1):
+        retry = client.patch(url, data, format="json",
+                             HTTP_IDEMPOTENCY_KEY="k1")
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.data == first.data
+
+
+@pytest.mark.django_db
+def test_expired_keys_are_reused_and_pruned(doctor_user, patient_user,
+                                            patient_client):
+    IdempotencyKey.objects.create(
+        user=patient_user, key="old", fingerprint="", status_code=201,
+        response={}, expires_at=now() - timedelta(seconds=1))
+
+    response = patient_client.post("/api/consultations/", booking(doctor_user),
+                                   format="json", HTTP_IDEMPOTENCY_KEY="old")
+
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response
+    IdempotencyKey.objects.filter(key="old").update(
+        expires_at=now() - timedelta(seconds=1))
+    call_command("prune_idempotency_keys")
+    assert not IdempotencyKey.objects.exists()
+
+
+@pytest.mark.django_db
+def test_dry_run_is_not_replayed_for_real_request(doctor_user, patient_client):
+    data = {"doctor": doctor_user.id,
+            "clinic": doctor_user.doctor_profile.clinics.get().id,
+            "start_time": at(3, 10).isoformat(),
+            "rule": "FREQ=DAILY;COUNT=2"}
+    preview = patient_client.post("/api/consultation-series/?dry_run=1", data,
+                                  format="json", HTTP_IDEMPOTENCY_KEY="series")
+    assert preview.status_code == 200
+
+    response = patient_client.post("/api/consultation-series/", data,
+                                   format="json", HTTP_IDEMPOTENCY_KEY="series")
+
+    assert response.status_code == 422
+    assert not ConsultationSeries.objects.exists()
+
+
+@pytest.mark.django_db
+def test_stale_claim_is_taken_over_by_retry(doctor_user, patient_client):
+    patient_client.post("/api/consultations/", booking(doctor_user),
+                        format="json", HTTP_IDEMPOTENCY_KEY="abc")
+    # Воркер первого запроса умер, не записав ответ и ничего не создав.
+    Consultation.objects.all().delete()
+    IdempotencyKey.objects.update(
+        status_code=None, response=None,
+        claimed_at=now() - settings.IDEMPOTENCY_CLAIM_LEASE - timedelta(seconds=1))
+
+    response = patient_client.post("/api/consultations/", booking(doctor_user),
+                                   format="json", HTTP_IDEMPOTENCY_KEY="abc")
+
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response
+    assert Consultation.objects.count() == 1
+    assert IdempotencyKey.objects.get().status_code == 201
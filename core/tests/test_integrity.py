@@ -0,0 +1,108 @@
+import io
+import json
+import pytest
+from datetime import datetime, time, timedelta
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.timezone import localdate, make_aware
+from core.integrity import audit_doctors, audit_schedule, doctor_ranges, sweep
+from core.models import Clinic, Consultation, DoctorProfile, User
+
+
+def at(days, hour, minute=0):
+    day = localdate() + timedelta(days=days)
+    return make_aware(datetime.combine(day, time(hour, minute)))
+
+
+@pytest.fixture
+def schedule(doctor_user, patient_user):
+    clinic = doctor_user.doctor_profile.clinics.get()
+    other = Clinic.objects.create(name="Other", legal_address="A",
+                                  physical_address="B")
+    second = User.objects.create_user(
+        username="doctor2", password="testpass", role="doctor")
+    DoctorProfile.objects.create(
+        user=second, specialization=doctor_user.doctor_profile.specialization)
+
+    def row(doctor, clinic, start, end):
+        return Consultation(doctor=doctor, patient=patient_user, clinic=clinic,
+                            start_time=start, end_time=end)
+
+    # bulk_create обходит Consultation.clean — как исторические данные.
+    return Consultation.objects.bulk_create([
+        row(doctor_user, clinic, at(2, 9), at(2, 12)),
+        row(doctor_user, clinic, at(2, 10), at(2, 11)),
+        row(doctor_user, clinic, at(2, 11), at(2, 11, 30)),
+        row(doctor_user, other, at(2, 13), at(2, 14)),
+        row(doctor_user, clinic, at(3, 9), at(3, 10)),
+        row(doctor_user, clinic, at(3, 10), at(3, 11)),
+        row(second, other, at(2, 9), at(2, 10)),
+        row(second, other, at(2, 10), at(2, 11)),
+    ])
+
+
+def test_sweep_reports_overlap_until_earlier_end():
+    rows = [(1, 7, at(1, 9), at(1, 12), 1),
+            (2, 7, at(1, 10), at(1, 11), 1),
+            (3, 7, at(1, 11, 30), at(1, 13), 1),
+            (4, 7, at(1, 13), at(1, 14), 1)]
+
+    found = list(sweep(rows))
+
+    assert [item["consultations"] for item in found] == [[1, 2], [1, 3]]
+    assert found[1]["end_time"] == at(1, 12).isoformat()
+
+
+def test_sweep_reports_every_overlapping_pair():
+    rows = [(1, 7, at(1, 9), at(1, 12), 1),
+            (2, 7, at(1, 10), at(1, 11), 1),
+            (3, 7, at(1, 10, 30), at(1, 11, 30), 1),
+            (4, 7, at(1, 11), at(1, 11, 15), 1)]
+
+    found = list(sweep(rows))
+
+    assert [item["consultations"] for item in found] == [
+        [1, 2], [1, 3], [2, 3], [1, 4], [3, 4]]
+    assert found[2]["end_time"] == at(1, 11).isoformat()
+
+
+@pytest.mark.django_db
+def test_audit_finds_overlaps_and_clinics_per_day(schedule, doctor_user):
+    ids = [consultation.id for consultation in schedule]
+
+    report = audit_schedule(workers=0, per_task=1)
+
+    assert (report["consultations"], report["overlaps"],
+            report["clinics_per_day"]) == (8, 2, 1)
+    assert report["tasks"] == 3
+    assert [(item["type"], item.get("consultations")) for item in report["violations"]] == [
+        ("overlap", [ids[0], ids[1]]),
+        ("overlap", [ids[0], ids[2]]),
+        ("clinics_per_day", None),
+    ]
+    assert report["violations"][2]["clinics"] == {
+        str(schedule[0].clinic_id): ids[:3], str(schedule[3].clinic_id): [ids[3]]}
+    assert report["violations"][2]["date"] == at(2, 9).date().isoformat()
+
+
+@pytest.mark.django_db
+def test_doctor_ranges_cover_every_doctor(schedule, doctor_user):
+    ranges = doctor_ranges(1)
+
+    assert ranges[0] == (0, doctor_user.id)
+    assert ranges[-1][1] is None
+    assert sum(audit_doctors(first, last)[0] for first, last in ranges) == 8
+
+
+@pytest.mark.django_db
+def test_audit_schedule_command(schedule, tmp_path):
+    path = tmp_path / "violations.jsonl"
+    out = io.StringIO()
+
+    with pytest.raises(CommandError):
+        call_command("audit_schedule", "--workers", "0", "--limit", "1",
+                     "--output", str(path), "--check", stdout=out)
+
+    report = json.loads(out.getvalue())
+    assert len(report["violations"]) == 1
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
@@ -0,0 +1,112 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.auth.hashers import make_password
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+ARGON2_FIRST = [
+    "core.hashers.TunedArgon2PasswordHasher",
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+]
+
+
+@pytest.fixture
+def cheap_argon2(settings):
+    settings.ARGON2_TIME_COST = 1
+    settings.ARGON2_MEMORY_COST = 1024
+    settings.ARGON2_PARALLELISM = 1
+
+
+def login(username, password):
+    return APIClient().post("/api/login/", {
+        "username": username, "password": password}, format="json")
+
+
+@pytest.mark.django_db
+def test_login_returns_tokens_with_role():
+    user = User.objects.create_user(
+        username="doctor", password="secret", role="doctor")
+
+    response = login("doctor", "secret")
+
+    assert response.status_code == 200
+    access = AccessToken(response.data["access"])
+    assert access["role"] == "doctor"
+    assert str(access["user_id"]) == str(user.id)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("username, password", [
+    ("doctor", "wrong"),
+    ("nobody", "secret"),
+])
+def test_login_rejects_bad_credentials(username, password):
+    User.objects.create_user(username="doctor", password="secret")
+
+    response = login(username, password)
+
+    assert response.status_code == 401
+    assert response.data["detail"].code == "no_active_account"
+
+
+@pytest.mark.django_db
+def test_login_rejects_inactive_user():
+    User.objects.create_user(
+        username="doctor", password="secret", is_active=False)
+    assert login("doctor", "secret").status_code == 401
+
+
+@pytest.mark.django_db
+def test_login_requires_fields():
+    response = login("", "")
+    assert response.status_code == 400
+    assert set(response.data) == {"username", "password"}
+
+
+@pytest.mark.django_db
+def test_login_rehashes_legacy_password(settings, cheap_argon2):
+    settings.PASSWORD_HASHERS = ARGON2_FIRST
+    user = User.objects.create(
+        username="doctor",
+        password=make_password("secret", hasher="md5"))
+
+    assert login("doctor", "secret").status_code == 200
+
+    user.refresh_from_db()
+    assert user.password.startswith("argon2$")
+    assert "t=1" in user.password
+
+
+@pytest.mark.django_db
+def test_login_rehashes_when_argon2_parameters_change(settings, cheap_argon2):
+    settings.PASSWORD_HASHERS = ARGON2_FIRST
+    user = User.objects.create_user(username="doctor", password="secret")
+    settings.ARGON2_TIME_COST = 2
+
+    assert login("doctor", "secret").status_code == 200
+
+    user.refresh_from_db()
+    assert "t=2" in user.password
+    assert user.check_password("secret")
+
+
+@pytest.mark.django_db
+def test_login_goes_through_authentication_backends(settings):
+    User.objects.create_user(username="doctor", password="secret")
+    failures = []
+
+    def record(sender, credentials, **kwargs):
+        failures.append(credentials["username"])
+
+    user_login_failed.connect(record)
+    try:
+        assert login("doctor", "wrong").status_code == 401
+    finally:
+        user_login_failed.disconnect(record)
+    assert failures == ["doctor"]
+
+    settings.AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+    assert login("doctor", "secret").status_code == 200
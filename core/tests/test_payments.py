@@ -0,0 +1,158 @@
+import io
+import json
+import pytest
+from datetime import datetime, time, timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, make_aware
+from rest_framework.test import APIClient
+from core.models import Consultation, ConsultationListing, PaymentRecord
+from core.payments import PaymentReconciler
+
+
+@pytest.fixture
+def consultations(doctor_user, patient_user):
+    def book(hour, status):
+        start = make_aware(datetime.combine(
+            localdate() - timedelta(days=1), time(hour)))
+        return Consultation.objects.create(
+            doctor=doctor_user, patient=patient_user,
+            clinic=doctor_user.doctor_profile.clinics.get(),
+            start_time=start, end_time=start + timedelta(hours=1),
+            status=status)
+    return {
+        "done": [book(9, "завершена"), book(10, "завершена"), book(11, "завершена")],
+        "paid": book(12, "оплачена"),
+        "started": book(13, "начата"),
+    }
+
+
+def payment_rows(consultations):
+    done = consultations["done"]
+    return [
+        {"consultation": str(done[0].id), "reference": "P-1"},
+        {"consultation": done[1].id, "reference": "P-2"},
+        {"consultation": done[2].id},
+        {"consultation": consultations["paid"].id, "reference": "P-4"},
+        {"consultation": consultations["started"].id, "reference": "P-5"},
+        {"consultation": 999999, "reference": "P-6"},
+        {"consultation": done[0].id, "reference": "P-7"},
+        {"reference": "P-8"},
+    ]
+
+
+@pytest.mark.django_db
+def test_reconciler_pays_completed_and_reports_mismatches(consultations):
+    done_ids = [consultation.id for consultation in consultations["done"]]
+
+    with CaptureQueriesContext(connection) as queries:
+        report = PaymentReconciler().run(payment_rows(consultations))
+
+    assert (report["rows"], report["paid"], report["already_paid"]) == (8, 3, 1)
+    assert [(item["row"], item["reference"], item["reason"])
+            for item in report["mismatches"]] == [
+        (5, "P-5", "Консультация не завершена."),
+        (6, "P-6", "Консультация не найдена."),
+        (7, "P-7", "Консультация повторяется в файле."),
+        (8, "P-8", "Не указан ID консультации."),
+    ]
+    assert report["mismatches"][0]["status"] == "начата"
+    paid_ids = {*done_ids, consultations["paid"].id}
+    assert set(Consultation.objects.filter(status="оплачена").values_list(
+        "id", flat=True)) == paid_ids
+    assert set(ConsultationListing.objects.filter(
+        status="оплачена").values_list("id", flat=True)) == paid_ids
+    updates = [query for query in queries
+               if query["sql"].startswith('UPDATE "core_consultation"')]
+    assert len(updates) == 1
+
+
+@pytest.mark.django_db
+def test_repeated_upload_skips_recorded_payments(consultations):
+    rows = payment_rows(consultations)
+    PaymentReconciler().run(rows)
+
+    report = PaymentReconciler().run(rows)
+
+    assert (report["paid"], report["already_imported"]) == (0, 2)
+    assert sorted(PaymentRecord.objects.values_list("reference", flat=True)) == [
+        "P-1", "P-2"]
+    started = consultations["started"]
+    Consultation.objects.filter(id=started.id).update(status="завершена")
+    report = PaymentReconciler().run([
+        {"consultation": started.id, "reference": "P-9"},
+        {"consultation": consultations["paid"].id, "reference": "P-9"}])
+    assert report["paid"] == 1
+    assert [item["reason"] for item in report["mismatches"]] == [
+        "Платёж повторяется в файле."]
+
+
+@pytest.mark.django_db
+def test_import_endpoint_accepts_csv_and_dry_run(consultations, admin_api_client, patient_user):
+    done = consultations["done"]
+    content = ("consultation,reference\n"
+               f"{done[0].id},P-1\n{consultations['started'].id},P-2\n").encode()
+
+    response = admin_api_client.post(
+        "/api/payments/import/?dry_run=1",
+        {"file": SimpleUploadedFile("payments.csv", content)}, format="multipart")
+    assert (response.data["paid"], response.data["dry_run"]) == (1, True)
+    assert Consultation.objects.get(id=done[0].id).status == "завершена"
+
+    response = admin_api_client.post(
+        "/api/payments/import/",
+        {"file": SimpleUploadedFile("payments.csv", content)}, format="multipart")
+    assert response.data["paid"] == 1
+    assert len(response.data["mismatches"]) == 1
+    assert Consultation.objects.get(id=done[0].id).status == "оплачена"
+
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+    assert client.post("/api/payments/import/", [], format="json").status_code == 403
+
+
+@pytest.mark.django_db
+def test_malformed_upload_is_reported_not_half_applied(consultations, admin_api_client):
+    done = consultations["done"]
+    lines = [json.dumps({"consultation": done[0].id}), "{оборвано",
+             json.dumps({"consultation": done[1].id})]
+
+    response = admin_api_client.post(
+        "/api/payments/import/",
+        {"file": SimpleUploadedFile("payments.jsonl", "\n".join(lines).encode())},
+        format="multipart")
+
+    assert response.status_code == 200
+    assert response.data["paid"] == 2
+    assert [(item["row"], item["consultation"]) for item in response.data["mismatches"]] == [
+        (2, None)]
+    assert "JSON" in response.data["mismatches"][0]["reason"]
+
+    content = (f"consultation,reference\n{done[2].id},P-1\n").encode() + "П-2\n".encode("cp1251")
+    response = admin_api_client.post(
+        "/api/payments/import/",
+        {"file": SimpleUploadedFile("payments.csv", content)}, format="multipart")
+    assert response.status_code == 400
+    assert "UTF-8" in response.data["error"]
+    assert Consultation.objects.get(id=done[2].id).status == "завершена"
+
+
+@pytest.mark.django_db
+def test_import_payments_command(tmp_path, consultations):
+    path = tmp_path / "payments.jsonl"
+    path.write_text("\n".join(
+        json.dumps({"consultation": consultation.id})
+        for consultation in consultations["done"]), encoding="utf-8")
+    out = io.StringIO()
+
+    call_command("import_payments", str(path), stdout=out)
+
+    report = json.loads(out.getvalue())
+    assert (report["rows"], report["paid"], report["mismatches"]) == (3, 3, [])
+
+    path.write_bytes("оплата".encode("cp1251"))
+    with pytest.raises(CommandError):
+        call_command("import_payments", str(path), stdout=io.StringIO())
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import pstats
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.test import APIClient
+from core.middleware import RequestProfilingMiddleware
+
+User = get_user_model()
+
+
+@pytest.fixture
+def profiles(settings, tmp_path):
+    settings.REQUEST_PROFILING_DIR = str(tmp_path)
+    settings.REQUEST_PROFILING_SAMPLE_RATE = 0.0
+    return tmp_path
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+def bearer_client(username, password):
+    tokens = APIClient().post("/api/login/", {
+        "username": username, "password": password}, format="json").data
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+    return client
+
+
+def read_profile(profiles, response):
+    profile_id = response["X-Profile-Id"]
+    stats = pstats.Stats(str(profiles / f"{profile_id}.prof"))
+    with open(profiles / f"{profile_id}.sql.json", encoding="utf-8") as log:
+        return stats, json.load(log)
+
+
+@pytest.mark.django_db
+def test_requests_are_not_profiled_by_default(profiles, admin_user):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+
+    response = client.get("/api/consultations/specializations/")
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response
+    assert list(profiles.iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_admin_header_profiles_request(profiles, admin_user):
+    client = bearer_client("admin", "adminpass")
+
+    response = client.get("/api/consultations/specializations/",
+                          HTTP_X_PROFILE="1")
+
+    stats, log = read_profile(profiles, response)
+    assert stats.total_calls > 0
+    assert log["path"] == "/api/consultations/specializations/"
+    assert log["status"] == 200
+    assert any("core_specialization" in query["sql"]
+               for query in log["queries"])
+    assert log["query_count"] == len(log["queries"])
+
+
+@pytest.mark.django_db
+def test_header_from_non_admin_is_ignored(profiles):
+    User.objects.create_user(username="patient", password="pw",
+                             role="patient")
+    client = bearer_client("patient", "pw")
+
+    response = client.get("/api/protected/", HTTP_X_PROFILE="1")
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response
+    assert list(profiles.iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_sampled_requests_are_profiled(profiles, settings):
+    settings.REQUEST_PROFILING_SAMPLE_RATE = 1.0
+
+    response = APIClient().get("/api/consultations/specializations/")
+
+    assert response.status_code == 401
+    _, log = read_profile(profiles, response)
+    assert log["status"] == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_requests_log_orm_queries(profiles, settings):
+    settings.REQUEST_PROFILING_SAMPLE_RATE = 1.0
+
+    async def view(request):
+        count = await sync_to_async(User.objects.count)()
+        return HttpResponse(str(count))
+
+    middleware = RequestProfilingMiddleware(view)
+    response = asyncio.run(middleware(RequestFactory().get("/agenda/")))
+
+    _, log = read_profile(profiles, response)
+    assert any("core_user" in query["sql"] for query in log["queries"])
@@ -0,0 +1,189 @@
+import io
+import json
+import pytest
+from datetime import datetime, time, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from django.db.migrations.loader import MigrationLoader
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils.timezone import localdate, make_aware
+from rest_framework.test import APIClient
+from core.models import (Clinic, Consultation, ConsultationListing,
+                         Specialization, User)
+
+
+@pytest.fixture
+def named_users(doctor_user, patient_user):
+    doctor_user.last_name, doctor_user.first_name = "Иванов", "Пётр"
+    doctor_user.save()
+    patient_user.last_name, patient_user.first_name = "Петрова", "Анна"
+    patient_user.save()
+    return doctor_user, patient_user
+
+
+def at(days, hour):
+    day = localdate() + timedelta(days=days)
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def book(doctor_user, patient_user, days, hour, **kwargs):
+    return Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user,
+        clinic=doctor_user.doctor_profile.clinics.get(),
+        start_time=at(days, hour), end_time=at(days, hour + 1), **kwargs)
+
+
+@pytest.mark.django_db
+def test_list_reads_names_from_single_table(
+        named_users, admin_api_client, django_assert_num_queries):
+    doctor_user, patient_user = named_users
+    consultation = book(doctor_user, patient_user, 2, 10)
+
+    with django_assert_num_queries(1):
+        response = admin_api_client.get("/api/consultations/")
+
+    assert response.data == [{
+        "id": consultation.id,
+        "doctor": doctor_user.id,
+        "patient": patient_user.id,
+        "clinic": consultation.clinic_id,
+        "status": "ожидает",
+        "start_time": at(2, 10).isoformat().replace("+00:00", "Z"),
+        "end_time": at(2, 11).isoformat().replace("+00:00", "Z"),
+        "created_at": response.data[0]["created_at"],
+        "updated_at": response.data[0]["updated_at"],
+        "notes": None,
+        "doctor_name": "Иванов Пётр",
+        "patient_name": "Петрова Анна",
+        "clinic_name": "Test Clinic",
+        "specialization": "Кардиолог",
+    }]
+
+
+@pytest.mark.django_db
+def test_bulk_and_single_writes_reach_read_model(
+        named_users, admin_api_client, django_capture_on_commit_callbacks):
+    doctor_user, patient_user = named_users
+    started = book(doctor_user, patient_user, -1, 9, status="подтверждена")
+    later = book(doctor_user, patient_user, 3, 9)
+
+    admin_api_client.patch("/api/consultations/update_status/")
+    admin_api_client.patch(f"/api/consultations/{later.id}/set_schedule/",
+                           {"start_time": at(3, 12).isoformat()}, format="json")
+
+    listings = {row.id: row for row in ConsultationListing.objects.all()}
+    assert listings[started.id].status == "завершена"
+    assert listings[started.id].updated_at == Consultation.objects.get(
+        id=started.id).updated_at
+    assert (listings[later.id].status, listings[later.id].start_time) == (
+        "подтверждена", at(3, 12))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin_api_client.delete(f"/api/consultations/{later.id}/")
+    assert list(ConsultationListing.objects.values_list("id", flat=True)) == [
+        started.id]
+
+
+@pytest.mark.django_db
+def test_profile_changes_are_propagated(named_users):
+    doctor_user, patient_user = named_users
+    consultation = book(doctor_user, patient_user, 2, 10)
+
+    patient_user.last_name = "Сидорова"
+    patient_user.save()
+    clinic = Clinic.objects.get(id=consultation.clinic_id)
+    clinic.name = "Клиника на Ленина"
+    clinic.save()
+    specialization = Specialization.objects.get(name="Кардиолог")
+    specialization.name = "Кардиология"
+    specialization.save()
+    assert ConsultationListing.objects.get(
+        id=consultation.id).specialization == "Кардиология"
+    profile = doctor_user.doctor_profile
+    profile.specialization = Specialization.objects.create(name="Терапевт")
+    profile.save()
+
+    listing = ConsultationListing.objects.get(id=consultation.id)
+    assert listing.patient_name == "Сидорова Анна"
+    assert listing.clinic_name == "Клиника на Ленина"
+    assert listing.specialization == "Терапевт"
+
+
+@pytest.mark.django_db
+def test_search_and_export(named_users, admin_api_client, patient_user):
+    doctor_user, _ = named_users
+    other = User.objects.create_user(
+        username="patient2", password="testpass", role="patient",
+        last_name="Смирнов", first_name="Олег")
+    first = book(doctor_user, patient_user, 2, 10)
+    book(doctor_user, other, 2, 12)
+
+    response = admin_api_client.get("/api/consultations/?search=Петрова Иванов")
+    assert [row["id"] for row in response.data] == [first.id]
+
+    response = admin_api_client.get("/api/consultations/export/?search=Петрова")
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert response["Content-Type"] == "text/csv; charset=utf-8"
+    assert lines[0] == ("id,start_time,end_time,status,doctor_name,"
+                        "patient_name,clinic_name,specialization")
+    assert lines[1:] == [
+        f"{first.id},{at(2, 10).isoformat()},{at(2, 11).isoformat()},"
+        "ожидает,Иванов Пётр,Петрова Анна,Test Clinic,Кардиолог"]
+
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+    assert client.get("/api/consultations/export/").status_code == 403
+
+
+@pytest.mark.django_db
+def test_checker_reports_and_fixes_drift(named_users):
+    doctor_user, patient_user = named_users
+    kept = book(doctor_user, patient_user, 2, 10)
+    lost = book(doctor_user, patient_user, 2, 12)
+    ConsultationListing.objects.filter(id=lost.id).delete()
+    ConsultationListing.objects.filter(id=kept.id).update(doctor_name="Устарело")
+    orphan = ConsultationListing.objects.get(id=kept.id)
+    orphan.id = lost.id + 100
+    orphan.save()
+
+    with pytest.raises(CommandError):
+        call_command("check_read_model", stdout=io.StringIO())
+    out = io.StringIO()
+    call_command("check_read_model", "--fix", stdout=out)
+
+    report = json.loads(out.getvalue())
+    assert {kind: report[kind]["ids"] for kind in ("missing", "stale", "orphaned")} == {
+        "missing": [lost.id], "stale": [kept.id], "orphaned": [lost.id + 100]}
+    call_command("check_read_model", stdout=io.StringIO())
+    assert ConsultationListing.objects.get(id=kept.id).doctor_name == "Иванов Пётр"
+
+
+@pytest.mark.django_db
+def test_rebuild_replaces_read_model(named_users):
+    doctor_user, patient_user = named_users
+    consultation = book(doctor_user, patient_user, 2, 10)
+    ConsultationListing.objects.all().delete()
+
+    out = io.StringIO()
+    call_command("rebuild_read_model", "--batch-size", "1", stdout=out)
+
+    assert "1" in out.getvalue()
+    assert ConsultationListing.objects.get().patient_name == "Петрова Анна"
+    assert ConsultationListing.objects.get().id == consultation.id
+
+
+@pytest.mark.django_db
+def test_migration_backfills_existing_consultations(named_users):
+    doctor_user, patient_user = named_users
+    consultation = book(doctor_user, patient_user, 2, 10)
+    ConsultationListing.objects.all().delete()
+    migration = import_module("core.migrations.0012_consultation_listing")
+
+    state = MigrationLoader(connection).project_state(("core", "0012_consultation_listing"))
+
+    migration.backfill(state.apps, SimpleNamespace(connection=connection))
+
+    assert list(ConsultationListing.objects.values_list("id", "patient_name")) == [
+        (consultation.id, "Петрова Анна")]
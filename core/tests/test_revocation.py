@@ -0,0 +1,106 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from core.models import RevokedToken
+from core.revocation import (BloomFilter, RevocableRefreshToken,
+                             RevocationList, revocation_list)
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def instant_refresh(settings):
+    settings.REVOCATION_FILTER_REFRESH_SECONDS = 0
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create(username="patient", role="patient")
+
+
+def refresh(token):
+    return APIClient().post("/api/token/refresh/", {"refresh": str(token)},
+                            format="json")
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.django_db
+def test_revoked_refresh_token_is_rejected(user):
+    token = RevocableRefreshToken.for_user(user)
+    assert refresh(token).status_code == 200
+
+    response = APIClient().post("/api/token/revoke/",
+                                {"refresh": str(token)}, format="json")
+    assert response.status_code == 204
+
+    assert refresh(token).status_code == 401
+    assert RevokedToken.objects.filter(jti=token["jti"]).exists()
+
+
+@pytest.mark.django_db
+def test_other_workers_see_revocation_after_refresh(user):
+    token = RevocableRefreshToken.for_user(user)
+    other_worker = RevocationList()
+    assert other_worker.is_revoked(token["jti"]) is False
+
+    token.blacklist()
+
+    assert other_worker.is_revoked(token["jti"]) is True
+
+
+@pytest.mark.django_db
+def test_false_positive_falls_back_to_database(user):
+    token = RevocableRefreshToken.for_user(user)
+    revocations = revocation_list()
+    revocations.is_revoked(token["jti"])
+    # Все биты выставлены: фильтр отвечает «возможно отозван» на всё.
+    revocations._bloom.bits = bytearray(b"\xff" * len(revocations._bloom.bits))
+
+    assert refresh(token).status_code == 200
+    assert revocations.false_positives >= 1
+
+
+@pytest.mark.django_db
+def test_negative_filter_answer_skips_database(user, django_assert_num_queries):
+    token = RevocableRefreshToken.for_user(user)
+    revocations = RevocationList()
+    revocations.is_revoked("warm-up")
+
+    with django_assert_num_queries(1):
+        # Единственный запрос — дочитывание новых отзывов, не проверка JTI.
+        assert revocations.is_revoked(token["jti"]) is False
+
+
+@pytest.mark.django_db
+def test_login_refresh_token_can_be_revoked():
+    User.objects.create_user(username="doctor", password="secret")
+    client = APIClient()
+    tokens = client.post("/api/login/", {
+        "username": "doctor", "password": "secret"}, format="json").data
+
+    client.post("/api/token/revoke/", {"refresh": tokens["refresh"]},
+                format="json")
+
+    assert refresh(tokens["refresh"]).status_code == 401
+
+
+@pytest.mark.django_db
+def test_prune_revoked_tokens():
+    RevokedToken.objects.create(jti="old", expires_at=now() - timedelta(days=1))
+    RevokedToken.objects.create(jti="new", expires_at=now() + timedelta(days=1))
+
+    call_command("prune_revoked_tokens")
+
+    assert list(RevokedToken.objects.values_list("jti", flat=True)) == ["new"]
@@ -0,0 +1,125 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils.timezone import localdate, make_aware
+from rest_framework.test import APIClient
+from core.models import Consultation, Clinic
+from core.scheduling import plan_schedule
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def doctor_user(db):
+    return User.objects.create_user(
+        username="doctor1", password="doctorpass", role="doctor")
+
+
+@pytest.fixture
+def patient_user(db):
+    return User.objects.create_user(
+        username="patient1", password="patientpass", role="patient")
+
+
+@pytest.fixture
+def clinic(db):
+    return Clinic.objects.create(
+        name="Test Clinic",
+        legal_address="123 Legal St",
+        physical_address="456 Physical St")
+
+
+def at(day, hour):
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def test_plan_assigns_nearest_free_slots():
+    day = localdate() + timedelta(days=3)
+    booked = [(1, 10, at(day, 10), at(day, 11))]
+    pending = [(1, 1, 10, at(day, 10)), (2, 1, 10, at(day, 10))]
+
+    assignments, unplaced = plan_schedule(pending, booked, day)
+
+    assert assignments == {1: at(day, 11), 2: at(day, 12)}
+    assert unplaced == {}
+
+
+def test_plan_respects_one_clinic_per_day():
+    day = localdate() + timedelta(days=3)
+    booked = [(1, 10, at(day, 9), at(day, 10))]
+    pending = [(1, 1, 20, at(day, 12))]
+
+    assignments, _ = plan_schedule(pending, booked, day + timedelta(days=1))
+
+    assert assignments == {1: at(day + timedelta(days=1), 9)}
+
+
+def test_plan_reports_unplaced_requests():
+    day = localdate() + timedelta(days=3)
+    pending = [(i, 1, 10, at(day, 9)) for i in range(10)]
+
+    assignments, unplaced = plan_schedule(pending, [], day)
+
+    assert len(assignments) == 8
+    assert sorted(unplaced) == [8, 9]
+
+
+@pytest.mark.django_db
+def test_admin_auto_schedules_pending(
+        admin_user, doctor_user, patient_user, clinic):
+    day = localdate() + timedelta(days=3)
+    consultations = [
+        Consultation.objects.create(
+            doctor=doctor_user, patient=patient_user, clinic=clinic,
+            start_time=at(day, hour), end_time=at(day, hour + 1),
+            status="ожидает")
+        for hour in (10, 14)]
+    # Обе заявки хотят одно и то же время.
+    Consultation.objects.filter(id=consultations[1].id).update(
+        start_time=at(day, 10), end_time=at(day, 11))
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+
+    response = client.patch("/api/consultations/auto_schedule/", {
+        "date_from": str(day), "date_to": str(day)}, format="json")
+
+    assert response.status_code == 200
+    assert response.data["scheduled"] == 2
+    starts = []
+    for consultation in consultations:
+        consultation.refresh_from_db()
+        assert consultation.status == "подтверждена"
+        assert consultation.end_time - consultation.start_time == timedelta(hours=1)
+        starts.append(consultation.start_time)
+    assert sorted(starts) == [at(day, 10), at(day, 11)]
+
+
+@pytest.mark.django_db
+def test_only_admin_can_auto_schedule(doctor_user):
+    client = APIClient()
+    client.force_authenticate(user=doctor_user)
+    day = str(localdate() + timedelta(days=3))
+    response = client.patch("/api/consultations/auto_schedule/", {
+        "date_from": day, "date_to": day}, format="json")
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_schedule_pending_command_dry_run(doctor_user, patient_user, clinic):
+    day = localdate() + timedelta(days=3)
+    consultation = Consultation.objects.create(
+        doctor=doctor_user, patient=patient_user, clinic=clinic,
+        start_time=at(day, 10), end_time=at(day, 11), status="ожидает")
+
+    call_command("schedule_pending", "--from", str(day), "--to", str(day),
+                 "--dry-run")
+
+    consultation.refresh_from_db()
+    assert consultation.status == "ожидает"
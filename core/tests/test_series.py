@@ -0,0 +1,200 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, localtime, make_aware
+from rest_framework.test import APIClient
+from core.models import (Clinic, Consultation, ConsultationListing,
+                         ConsultationSeries, ConsultationTombstone, User)
+from core.series import RuleError, occurrences, parse_rule
+
+
+@pytest.fixture
+def patient_client(patient_user):
+    client = APIClient()
+    client.force_authenticate(user=patient_user)
+    return client
+
+
+def monday(weeks, hour):
+    day = localdate() + timedelta(days=7 - localdate().weekday(), weeks=weeks)
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def book(doctor, patient, clinic, start):
+    return Consultation.objects.create(
+        doctor=doctor, patient=patient, clinic=clinic,
+        start_time=start, end_time=start + timedelta(hours=1))
+
+
+def create_series(client, doctor_user, rule="FREQ=WEEKLY;COUNT=6", query=""):
+    return client.post(f"/api/consultation-series/{query}", {
+        "doctor": doctor_user.id,
+        "clinic": doctor_user.doctor_profile.clinics.order_by("id").first().id,
+        "start_time": monday(0, 10).isoformat(),
+        "rule": rule}, format="json")
+
+
+def test_rules_expand_in_local_wall_clock_time(settings):
+    start = monday(0, 10)
+
+    twice_weekly = occurrences(start, "RRULE:FREQ=WEEKLY;BYDAY=MO,TH;COUNT=4")
+    fortnightly = occurrences(start, "FREQ=WEEKLY;INTERVAL=2;UNTIL="
+                              f"{(start + timedelta(weeks=5)).strftime('%Y%m%d')}")
+
+    assert [value - start for value in twice_weekly] == [
+        timedelta(0), timedelta(days=3), timedelta(weeks=1),
+        timedelta(weeks=1, days=3)]
+    assert [value - start for value in fortnightly] == [
+        timedelta(0), timedelta(weeks=2), timedelta(weeks=4)]
+    assert all(localtime(value).hour == 10 for value in twice_weekly)
+    for rule in ("FREQ=WEEKLY", "FREQ=MONTHLY;COUNT=2", "FREQ=DAILY;BYDAY=MO;COUNT=2",
+                 "FREQ=WEEKLY;COUNT=x", "COUNT"):
+        with pytest.raises(RuleError):
+            parse_rule(rule)
+    settings.CONSULTATION_SERIES_MAX_OCCURRENCES = 3
+    with pytest.raises(RuleError):
+        occurrences(start, "FREQ=DAILY;COUNT=4")
+
+
+@pytest.mark.django_db
+def test_series_books_free_occurrences_in_one_insert(
+        doctor_user, patient_user, patient_client):
+    clinic = doctor_user.doctor_profile.clinics.get()
+    other_clinic = Clinic.objects.create(
+        name="Other", legal_address="A", physical_address="B")
+    doctor_user.doctor_profile.clinics.add(other_clinic)
+    other_patient = User.objects.create_user(
+        username="patient2", password="testpass", role="patient")
+    book(doctor_user, other_patient, clinic, monday(1, 10))
+    book(doctor_user, other_patient, other_clinic, monday(2, 15))
+    book(User.objects.create_user(username="doctor2", password="x", role="doctor"),
+         patient_user, other_clinic, monday(3, 10))
+
+    with CaptureQueriesContext(connection) as queries:
+        response = create_series(patient_client, doctor_user)
+
+    assert response.status_code == 201
+    assert [item["error"] for item in response.data["occurrences"]] == [
+        None,
+        "Врач уже занят в это время.",
+        "Врач в этот день работает в другой клинике.",
+        "Пациент уже записан на это время.",
+        None,
+        None,
+    ]
+    series = ConsultationSeries.objects.get()
+    created = list(Consultation.objects.filter(series=series).order_by("start_time"))
+    assert [item.start_time for item in created] == [
+        monday(0, 10), monday(4, 10), monday(5, 10)]
+    assert [item["id"] for item in response.data["occurrences"] if item["id"]] == [
+        item.id for item in created]
+    assert set(ConsultationListing.objects.filter(
+        id__in=[item.id for item in created]).values_list("status", flat=True)) == {"ожидает"}
+    sql = [query["sql"] for query in queries]
+    assert sum(statement.startswith('INSERT INTO "core_consultation"') for statement in sql) == 1
+    assert sum(statement.startswith('SELECT "core_consultation"."doctor_id"')
+               for statement in sql) == 1
+
+
+@pytest.mark.django_db
+def test_dry_run_and_fully_busy_series_create_nothing(
+        doctor_user, patient_user, patient_client):
+    response = create_series(patient_client, doctor_user, query="?dry_run=1")
+    assert response.status_code == 200
+    assert response.data["series"] is None
+    assert len(response.data["occurrences"]) == 6
+
+    book(doctor_user, patient_user, doctor_user.doctor_profile.clinics.get(),
+         monday(0, 10))
+    response = create_series(patient_client, doctor_user, rule="FREQ=DAILY;COUNT=1")
+    assert response.status_code == 400
+    assert not ConsultationSeries.objects.exists()
+    assert create_series(patient_client, doctor_user, rule="FREQ=YEARLY").status_code == 400
+
+
+@pytest.mark.django_db
+def test_admin_reschedules_whole_series_or_nothing(
+        doctor_user, patient_user, patient_client, admin_api_client):
+    series_id = create_series(
+        patient_client, doctor_user, rule="FREQ=WEEKLY;COUNT=3").data["series"]["id"]
+    blocker = User.objects.create_user(
+        username="patient2", password="testpass", role="patient")
+    book(doctor_user, blocker, doctor_user.doctor_profile.clinics.get(),
+         monday(2, 12))
+
+    response = admin_api_client.patch(
+        f"/api/consultation-series/{series_id}/reschedule/",
+        {"start_time": monday(0, 12).isoformat()}, format="json")
+    assert response.status_code == 400
+    assert [item["error"] is None for item in response.data["occurrences"]] == [
+        True, True, False]
+    assert set(Consultation.objects.filter(series_id=series_id).values_list(
+        "status", flat=True)) == {"ожидает"}
+
+    response = admin_api_client.patch(
+        f"/api/consultation-series/{series_id}/reschedule/",
+        {"start_time": monday(0, 14).isoformat()}, format="json")
+    assert response.status_code == 200
+    moved = Consultation.objects.filter(series_id=series_id).order_by("start_time")
+    assert [(item.start_time, item.status) for item in moved] == [
+        (monday(week, 14), "подтверждена") for week in range(3)]
+    assert list(ConsultationListing.objects.filter(
+        id__in=[item.id for item in moved]).order_by("start_time").values_list(
+        "start_time", flat=True)) == [monday(week, 14) for week in range(3)]
+    assert patient_client.patch(
+        f"/api/consultation-series/{series_id}/reschedule/",
+        {"start_time": monday(0, 16).isoformat()}, format="json").status_code == 403
+
+
+@pytest.mark.django_db
+def test_naive_times_and_doctors_without_profile(
+        doctor_user, patient_user, patient_client, admin_api_client):
+    series_id = create_series(
+        patient_client, doctor_user, rule="FREQ=WEEKLY;COUNT=2").data["series"]["id"]
+
+    naive = localtime(monday(0, 15)).replace(tzinfo=None).isoformat()
+    response = admin_api_client.patch(
+        f"/api/consultation-series/{series_id}/reschedule/",
+        {"start_time": naive}, format="json")
+    assert response.status_code == 200
+    assert list(Consultation.objects.filter(series_id=series_id).order_by(
+        "start_time").values_list("start_time", flat=True)) == [
+        monday(0, 15), monday(1, 15)]
+    assert admin_api_client.patch(
+        f"/api/consultation-series/{series_id}/reschedule/",
+        {"start_time": "2026-13-40T10:00:00"}, format="json").status_code == 400
+
+    no_profile = User.objects.create_user(
+        username="doctor2", password="testpass", role="doctor")
+    response = patient_client.post("/api/consultation-series/", {
+        "doctor": no_profile.id,
+        "clinic": doctor_user.doctor_profile.clinics.get().id,
+        "start_time": monday(0, 10).isoformat(),
+        "rule": "FREQ=DAILY;COUNT=1"}, format="json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_cancel_removes_open_occurrences(
+        doctor_user, patient_user, patient_client, django_capture_on_commit_callbacks):
+    series_id = create_series(patient_client, doctor_user).data["series"]["id"]
+    doctor_client = APIClient()
+    doctor_client.force_authenticate(user=doctor_user)
+    stranger = APIClient()
+    stranger.force_authenticate(user=User.objects.create_user(
+        username="patient2", password="testpass", role="patient"))
+
+    assert doctor_client.post(
+        f"/api/consultation-series/{series_id}/cancel/").status_code == 403
+    assert stranger.post(
+        f"/api/consultation-series/{series_id}/cancel/").status_code == 404
+    with django_capture_on_commit_callbacks(execute=True):
+        response = patient_client.post(f"/api/consultation-series/{series_id}/cancel/")
+
+    assert response.data == {"cancelled": 6}
+    assert not Consultation.objects.filter(series_id=series_id).exists()
+    assert ConsultationTombstone.objects.count() == 6
+    assert not ConsultationListing.objects.exists()
+    assert ConsultationSeries.objects.get().cancelled_at is not None
+    assert patient_client.get("/api/consultation-series/").data[0]["id"] == series_id
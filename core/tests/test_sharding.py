@@ -0,0 +1,248 @@
+import io
+import json
+import pytest
+from datetime import datetime, time, timedelta
+from django.conf import settings as django_settings
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connections
+from django.test import override_settings
+from django.utils.timezone import localdate, make_aware
+from rest_framework.test import APIClient
+from core.models import (Clinic, Consultation, ConsultationListing,
+                         ConsultationTombstone, DoctorProfile, PatientProfile,
+                         Specialization, User)
+from core.sharding import locate, plan_rebalance
+
+SHARD = "shard_1"
+
+
+@pytest.fixture(scope="module")
+def shard_database(django_db_setup, django_db_blocker, tmp_path_factory):
+    # Второй шард — отдельный файл SQLite рядом с тестовой базой default.
+    path = tmp_path_factory.mktemp("shards") / "shard_1.sqlite3"
+    databases = {
+        "default": dict(connections.settings["default"]),
+        SHARD: {"ENGINE": "django.db.backends.sqlite3", "NAME": str(path)},
+    }
+    connections.settings[SHARD] = connections.configure_settings(
+        databases)[SHARD]
+    with django_db_blocker.unblock(), override_settings(
+            CONSULTATION_SHARDS=["default", SHARD]):
+        call_command("migrate", database=SHARD, verbosity=0)
+    yield SHARD
+    connections[SHARD].close()
+    del connections[SHARD]
+    del connections.settings[SHARD]
+
+
+@pytest.fixture
+def shards(db, settings, shard_database):
+    settings.CONSULTATION_SHARDS = ["default", SHARD]
+    return settings.CONSULTATION_SHARDS
+
+
+@pytest.fixture
+def clinics(shards):
+    return [Clinic.objects.create(name=f"Clinic {alias}", legal_address="A",
+                                  physical_address="B", shard=alias)
+            for alias in shards]
+
+
+@pytest.fixture
+def doctor(clinics):
+    user = User.objects.create_user(
+        username="doctor", password="doctorpass", role="doctor")
+    profile = DoctorProfile.objects.create(
+        user=user, specialization=Specialization.objects.create(name="ЛОР"))
+    profile.clinics.set(clinics)
+    return user
+
+
+@pytest.fixture
+def patient(db):
+    user = User.objects.create_user(
+        username="patient", password="patientpass", role="patient")
+    PatientProfile.objects.create(user=user, phone="1", email="p@example.com")
+    return user
+
+
+def at(days, hour):
+    day = localdate() + timedelta(days=days)
+    return make_aware(datetime.combine(day, time(hour)))
+
+
+def book(doctor, patient, clinic, days, hour, **kwargs):
+    return Consultation.objects.create(
+        doctor=doctor, patient=patient, clinic=clinic,
+        start_time=at(days, hour), end_time=at(days, hour + 1), **kwargs)
+
+
+def test_plan_rebalance_moves_largest_fitting_clinic():
+    loads = {1: 100, 2: 60, 3: 30, 4: 10}
+    directory = dict.fromkeys(loads, "default")
+
+    moves = plan_rebalance(loads, directory, ["default", SHARD])
+
+    assert moves == {1: SHARD}
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_consultation_is_written_to_clinic_shard(doctor, patient, clinics):
+    consultation = book(doctor, patient, clinics[1], 3, 10)
+
+    assert consultation._state.db == SHARD
+    assert consultation.id > django_settings.CONSULTATION_SHARD_ID_STRIDE
+    assert not Consultation.objects.using("default").exists()
+    assert locate(Consultation, consultation.id) == SHARD
+    assert "doctor" in str(Consultation.objects.using(SHARD).get())
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_doctor_overlap_is_checked_across_shards(doctor, patient, clinics):
+    book(doctor, patient, clinics[0], 3, 10)
+
+    with pytest.raises(ValidationError):
+        book(doctor, patient, clinics[1], 3, 10)
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_api_routes_requests_by_clinic_shard(
+        doctor, patient, clinics, admin_api_client):
+    book(doctor, patient, clinics[0], 3, 12)
+    patient_client = APIClient()
+    patient_client.force_authenticate(user=patient)
+
+    response = patient_client.post("/api/consultations/", {
+        "doctor": doctor.id, "clinic": clinics[1].id,
+        "start_time": at(2, 10).isoformat()}, format="json")
+
+    assert response.status_code == 201
+    created = Consultation.objects.using(SHARD).get()
+
+    response = admin_api_client.get("/api/consultations/?ordering=start_time")
+    assert [row["clinic"] for row in response.data] == [
+        clinic.id for clinic in clinics[::-1]]
+    response = admin_api_client.get(f"/api/consultations/?clinic={clinics[1].id}")
+    assert [row["id"] for row in response.data] == [created.id]
+
+    response = admin_api_client.patch(
+        f"/api/consultations/{created.id}/set_schedule/",
+        {"start_time": at(4, 9).isoformat()}, format="json")
+    assert response.status_code == 200
+    created.refresh_from_db()
+    assert created.status == "подтверждена"
+
+    response = admin_api_client.delete(f"/api/consultations/{created.id}/")
+    assert response.status_code == 204
+    assert ConsultationTombstone.objects.using(SHARD).get().consultation_id == created.id
+    response = admin_api_client.get(
+        "/api/consultations/sync/",
+        {"since": (at(0, 0) - timedelta(days=1)).isoformat()})
+    assert response.data["deleted"] == [created.id]
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_rebalance_moves_clinic_between_shards(
+        doctor, patient, clinics, admin_api_client):
+    consultations = [book(doctor, patient, clinics[0], 3, hour)
+                     for hour in (9, 10)]
+    out = io.StringIO()
+
+    call_command("rebalance_shards", "--clinic", str(clinics[0].id),
+                 "--to", SHARD, "--batch-size", "1", stdout=out)
+
+    assert json.loads(out.getvalue())["moves"] == [
+        {"clinic": clinics[0].id, "from": "default", "to": SHARD, "moved": 2}]
+    assert not Consultation.objects.using("default").exists()
+    moved = Consultation.objects.using(SHARD).order_by("id")
+    assert [(row.id, row.created_at) for row in moved] == [
+        (row.id, row.created_at) for row in consultations]
+    clinics[0].refresh_from_db()
+    assert clinics[0].shard == SHARD
+    response = admin_api_client.get(f"/api/consultations/{consultations[0].id}/")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_rebalance_returns_misplaced_rows(doctor, patient, clinics):
+    misplaced = Consultation(
+        doctor=doctor, patient=patient, clinic=clinics[0],
+        start_time=at(3, 9), end_time=at(3, 10))
+    misplaced.save(using=SHARD)
+
+    call_command("rebalance_shards", "--tolerance", "10", stdout=io.StringIO())
+
+    assert Consultation.objects.using("default").get().id == misplaced.id
+    assert not Consultation.objects.using(SHARD).exists()
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_agenda_merges_shards_with_names(doctor, patient, clinics):
+    patient.last_name = "Петров"
+    patient.save()
+    monday = 14 - localdate().weekday()
+    first = book(doctor, patient, clinics[1], monday, 14)
+    second = book(doctor, patient, clinics[0], monday + 1, 9)
+    client = APIClient()
+    client.force_authenticate(user=doctor)
+
+    response = client.get(
+        f"/api/consultations/agenda/?date={localdate() + timedelta(days=monday)}"
+        "&range=week")
+
+    consultations = response.data["consultations"]
+    assert [item["id"] for item in consultations] == [first.id, second.id]
+    assert consultations[0]["clinic"]["name"] == f"Clinic {SHARD}"
+    assert consultations[0]["patient"]["name"] == "Петров"
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_calendar_feed_merges_shards(doctor, patient, clinics):
+    first = book(doctor, patient, clinics[1], 2, 9)
+    second = book(doctor, patient, clinics[0], 2, 14)
+    client = APIClient()
+    client.force_authenticate(user=patient)
+    url = client.post("/api/calendar/").data["url"]
+
+    response = client.get(url[url.index("/api/"):])
+
+    text = b"".join(response.streaming_content).decode()
+    assert [line for line in text.split("\r\n") if line.startswith("UID:")] == [
+        f"UID:consultation-{first.id}@mis", f"UID:consultation-{second.id}@mis"]
+    assert f"LOCATION:Clinic {SHARD}" in text
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_read_model_spans_shards(doctor, patient, clinics):
+    local = book(doctor, patient, clinics[0], 3, 10)
+    remote = book(doctor, patient, clinics[1], 4, 10)
+    Consultation.objects.using(SHARD).filter(id=remote.id).transition("начата")
+
+    assert set(ConsultationListing.objects.values_list(
+        "id", "clinic_name", "status")) == {
+        (local.id, "Clinic default", "ожидает"),
+        (remote.id, f"Clinic {SHARD}", "начата")}
+    out = io.StringIO()
+    call_command("check_read_model", stdout=out)
+    assert json.loads(out.getvalue())["stale"]["count"] == 0
+
+
+@pytest.mark.django_db(databases=["default", SHARD])
+def test_series_is_booked_in_clinic_shard(doctor, patient, clinics):
+    book(doctor, patient, clinics[0], 9, 10)
+    client = APIClient()
+    client.force_authenticate(user=patient)
+
+    response = client.post("/api/consultation-series/", {
+        "doctor": doctor.id, "clinic": clinics[1].id,
+        "start_time": at(2, 10).isoformat(), "rule": "FREQ=WEEKLY;COUNT=2"},
+        format="json")
+
+    assert response.status_code == 201
+    # Через неделю врач уже работает в клинике из другого шарда.
+    assert [item["error"] is None for item in response.data["occurrences"]] == [
+        True, False]
+    assert Consultation.objects.using(SHARD).filter(
+        series_id=response.data["series"]["id"]).count() == 1
+    assert ConsultationListing.objects.filter(clinic=clinics[1]).count() == 1
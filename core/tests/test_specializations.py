@@ -0,0 +1,60 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from rest_framework.test import APIClient
+from core.models import DoctorProfile, Specialization
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_registered_doctor_gets_placeholder_specialization():
+    client = APIClient()
+    response = client.post("/api/register/", {
+        "username": "newdoctor",
+        "email": "doctor@example.com",
+        "password": "testpass",
+        "role": "doctor"
+    }, format="json")
+
+    assert response.status_code == 201
+    profile = DoctorProfile.objects.get(user__username="newdoctor")
+    assert profile.specialization.name == "Не указано"
+
+
+@pytest.mark.django_db
+def test_specializations_come_from_catalog():
+    for index, name in enumerate(["Хирург", "Кардиолог", "Кардиолог"]):
+        DoctorProfile.objects.create(
+            user=User.objects.create(username=f"doctor{index}", role="doctor"),
+            specialization=Specialization.objects.get_or_create(name=name)[0])
+    Specialization.objects.create(name="Невролог")
+    client = APIClient()
+    client.force_authenticate(
+        user=User.objects.create(username="patient", role="patient"))
+
+    response = client.get("/api/consultations/specializations/")
+
+    assert response.data["specializations"] == ["Кардиолог", "Хирург"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_moves_specialization_strings_to_catalog():
+    executor = MigrationExecutor(connection)
+    executor.migrate([("core", "0003_consultation_start_time_index")])
+    apps = executor.loader.project_state(
+        [("core", "0003_consultation_start_time_index")]).apps
+    OldUser = apps.get_model("core", "User")
+    OldDoctorProfile = apps.get_model("core", "DoctorProfile")
+    for index, name in enumerate(["Терапевт", "Терапевт", "Хирург"]):
+        user = OldUser.objects.create(username=f"doctor{index}", role="doctor")
+        OldDoctorProfile.objects.create(user=user, specialization=name)
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+
+    assert sorted(Specialization.objects.values_list("name", flat=True)) == [
+        "Терапевт", "Хирург"]
+    assert DoctorProfile.objects.filter(
+        specialization__name="Терапевт").count() == 2
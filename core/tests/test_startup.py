@@ -0,0 +1,30 @@
+from django.conf import settings
+from core.startup import by_package, measure_startup, parse_importtime
+
+
+def test_cold_start_fits_budget():
+    result = measure_startup()
+
+    assert result["status"] == 401
+    assert result["total_ms"] < settings.STARTUP_TIME_BUDGET * 1000
+    # URLconf загружен при запуске (core.startup.warm_up), а не запросом.
+    assert result["first_request_ms"] < result["setup_ms"]
+
+
+def test_api_docs_are_not_loaded_when_disabled():
+    result = measure_startup(env={"API_DOCS_ENABLED": "false"})
+
+    assert result["status"] == 401
+    assert "drf_spectacular" not in result["packages"]
+    assert "rest_framework" in result["packages"]
+
+
+def test_importtime_is_grouped_by_package():
+    imports = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     rest_framework.compat\n"
+        "import time:        30 |        150 |   rest_framework\n"
+        "import time:       400 |        400 | django.db\n")
+
+    assert imports[0] == ("rest_framework.compat", 120, 120)
+    assert by_package(imports) == [("django", 400), ("rest_framework", 150)]
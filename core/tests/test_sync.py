@@ -0,0 +1,161 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils.timezone import localtime, now
+from rest_framework.test import APIClient
+from core.models import Consultation, ConsultationTombstone, Clinic
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def doctor_user(db):
+    return User.objects.create_user(
+        username="doctor1", password="doctorpass", role="doctor")
+
+
+@pytest.fixture
+def patient_user(db):
+    return User.objects.create_user(
+        username="patient1", password="patientpass", role="patient")
+
+
+@pytest.fixture
+def clinic(db):
+    return Clinic.objects.create(
+        name="Test Clinic",
+        legal_address="123 Legal St",
+        physical_address="456 Physical St")
+
+
+def make_consultation(doctor, patient, clinic, start, status="ожидает"):
+    return Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        clinic=clinic,
+        start_time=start,
+        end_time=start + timedelta(hours=1),
+        status=status)
+
+
+@pytest.mark.django_db
+def test_sync_without_cursor_returns_snapshot(
+        admin_user, doctor_user, patient_user, clinic):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    make_consultation(doctor_user, patient_user, clinic,
+                      now() + timedelta(days=1))
+
+    response = client.get("/api/consultations/sync/")
+
+    assert response.status_code == 200
+    assert response.data["reset"] is True
+    assert len(response.data["changed"]) == 1
+    assert response.data["deleted"] == []
+
+
+@pytest.mark.django_db
+def test_sync_returns_only_changes_since_cursor(
+        admin_user, doctor_user, patient_user, clinic):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    old = make_consultation(doctor_user, patient_user, clinic,
+                            now() + timedelta(days=1))
+    changed = make_consultation(doctor_user, patient_user, clinic,
+                                now() + timedelta(days=2))
+    since = now() - timedelta(minutes=1)
+    Consultation.objects.filter(id=old.id).update(
+        updated_at=since - timedelta(minutes=1))
+
+    response = client.get("/api/consultations/sync/",
+                          {"since": since.isoformat()})
+
+    assert response.status_code == 200
+    assert response.data["reset"] is False
+    assert [row["id"] for row in response.data["changed"]] == [changed.id]
+
+
+@pytest.mark.django_db
+def test_sync_accepts_naive_cursor_in_local_time(
+        admin_user, doctor_user, patient_user, clinic):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    old = make_consultation(doctor_user, patient_user, clinic,
+                            now() + timedelta(days=1))
+    since = now() - timedelta(minutes=1)
+    Consultation.objects.filter(id=old.id).update(
+        updated_at=since - timedelta(minutes=1))
+
+    response = client.get("/api/consultations/sync/", {
+        "since": localtime(since).replace(tzinfo=None).isoformat()})
+
+    assert response.status_code == 200
+    assert response.data["reset"] is False
+    assert response.data["changed"] == []
+    assert client.get("/api/consultations/sync/", {
+        "since": "2026-13-40T10:00:00"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_sync_reports_deleted_consultations(
+        admin_user, doctor_user, patient_user, clinic):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    consultation = make_consultation(doctor_user, patient_user, clinic,
+                                     now() + timedelta(days=1))
+    since = now() - timedelta(minutes=1)
+
+    response = client.delete(f"/api/consultations/{consultation.id}/")
+    assert response.status_code == 204
+
+    response = client.get("/api/consultations/sync/",
+                          {"since": since.isoformat(),
+                           "doctor": doctor_user.id})
+    assert response.data["changed"] == []
+    assert response.data["deleted"] == [consultation.id]
+
+
+@pytest.mark.django_db
+def test_update_status_bumps_updated_at(
+        admin_user, doctor_user, patient_user, clinic):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    consultation = make_consultation(doctor_user, patient_user, clinic,
+                                     now() - timedelta(hours=2),
+                                     status="подтверждена")
+    stale = now() - timedelta(days=1)
+    Consultation.objects.filter(id=consultation.id).update(updated_at=stale)
+
+    client.patch("/api/consultations/update_status/")
+
+    consultation.refresh_from_db()
+    assert consultation.status == "завершена"
+    assert consultation.updated_at > stale
+
+
+@pytest.mark.django_db
+def test_sync_rejects_invalid_cursor(admin_user):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    response = client.get("/api/consultations/sync/", {"since": "вчера"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_prune_sync_tombstones(doctor_user, patient_user, clinic):
+    consultation = make_consultation(doctor_user, patient_user, clinic,
+                                     now() + timedelta(days=1))
+    consultation.delete()
+    ConsultationTombstone.objects.update(
+        deleted_at=now() - timedelta(days=365))
+
+    call_command("prune_sync_tombstones")
+
+    assert ConsultationTombstone.objects.count() == 0
@@ -0,0 +1,140 @@
+import io
+import json
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from core.models import Clinic, DoctorProfile, PatientProfile
+from core.csv_import import read_rows
+from core.user_import import UserImporter
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def fast_hasher(settings):
+    settings.PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.MD5PasswordHasher"]
+    settings.USER_IMPORT_WORKERS = 0
+
+
+@pytest.fixture
+def admin_user(db):
+    return User.objects.create_superuser(
+        username="admin", password="adminpass", role="admin")
+
+
+@pytest.fixture
+def clinics(db):
+    return [Clinic.objects.create(name=f"Clinic {i}", legal_address="A",
+                                  physical_address="B")
+            for i in range(2)]
+
+
+def csv_file(clinics):
+    return io.StringIO(
+        "username,password,role,last_name,specialization,clinics,phone\n"
+        f"doc1,secret1,doctor,Иванов,Кардиолог,{clinics[0].id};{clinics[1].id},\n"
+        "pat1,secret2,patient,Петров,,,+79990000000\n"
+        "pat1,secret3,patient,Дубль,,,\n"
+        "bad,secret4,nurse,,,,\n"
+        "doc2,secret5,doctor,Сидоров,Кардиолог,999,\n")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("workers", [0, 2])
+def test_import_creates_users_profiles_and_clinic_links(clinics, workers):
+    importer = UserImporter(workers=workers, chunk_size=2)
+
+    report = importer.run(read_rows(csv_file(clinics), "csv"))
+
+    assert report["rows"] == 5
+    assert report["created"] == 2
+    assert [error["row"] for error in report["errors"]] == [3, 4, 5]
+    doctor = User.objects.get(username="doc1")
+    assert doctor.check_password("secret1")
+    profile = DoctorProfile.objects.get(user=doctor)
+    assert profile.specialization.name == "Кардиолог"
+    assert set(profile.clinics.values_list("id", flat=True)) == {
+        clinic.id for clinic in clinics}
+    patient = PatientProfile.objects.get(user__username="pat1")
+    assert patient.phone == "+79990000000"
+
+
+@pytest.mark.django_db
+def test_import_skips_existing_usernames(clinics):
+    User.objects.create(username="pat1")
+    rows = [{"username": "pat1", "password": "x"},
+            {"username": "pat2", "password": "x"}]
+
+    report = UserImporter(workers=0).run(rows)
+
+    assert report["created"] == 1
+    assert report["errors"][0]["username"] == "pat1"
+
+
+@pytest.mark.django_db
+def test_bad_rows_are_reported_without_failing_the_chunk(clinics):
+    stream = io.StringIO("\n".join([
+        json.dumps({"username": 5, "password": 123, "phone": 79990000000}),
+        "{не json",
+        json.dumps({"username": "u" * 151, "password": "x"}),
+        json.dumps({"username": "mail", "password": "x", "email": "not-an-email"}),
+        json.dumps({"username": "bad name!", "password": "x"}),
+        json.dumps({"username": ["list"], "password": "x"}),
+        json.dumps({"username": "ok", "password": "x"}),
+    ]))
+
+    report = UserImporter(workers=0).run(read_rows(stream, "jsonl"))
+
+    assert report["rows"] == 7
+    assert report["created"] == 2
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4, 5, 6]
+    assert "JSON" in report["errors"][0]["error"]
+    assert report["errors"][2]["error"].startswith("email")
+    assert PatientProfile.objects.get(user__username="5").phone == "79990000000"
+    assert User.objects.get(username="5").check_password("123")
+    assert UserImporter(workers=0).run(
+        read_rows(io.StringIO("{"), "json"))["errors"][0]["row"] == 1
+
+
+@pytest.mark.django_db
+def test_import_endpoint_accepts_upload(admin_user, clinics):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    lines = [json.dumps({"username": f"user{i}", "password": "pw",
+                         "role": "patient"}) for i in range(3)]
+    upload = SimpleUploadedFile(
+        "users.jsonl", "\n".join(lines).encode(), "application/jsonl")
+
+    response = client.post("/api/users/import/", {"file": upload},
+                           format="multipart")
+
+    assert response.status_code == 200
+    assert response.data["created"] == 3
+    assert PatientProfile.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_endpoint_is_admin_only(clinics):
+    client = APIClient()
+    client.force_authenticate(
+        user=User.objects.create(username="patient", role="patient"))
+    response = client.post("/api/users/import/", [], format="json")
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_import_users_command(tmp_path, clinics):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps([
+        {"username": "doc", "password": "pw", "role": "doctor",
+         "clinics": [clinics[0].id]}]))
+    out = io.StringIO()
+
+    call_command("import_users", str(path), "--workers", "0", stdout=out)
+
+    assert json.loads(out.getvalue())["created"] == 1
+    assert DoctorProfile.objects.get(
+        user__username="doc").specialization.name == "Не указано"
@@ -2,7 +2,12 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (RegisterView,
-                    CustomTokenObtainView, ConsultationViewSet, ProtectedView)
+                    CustomTokenObtainView, ConsultationViewSet, ProtectedView,
+                    TokenRevokeView, UserImportView, AdmissionStatusView,
+                    ConsultationSeriesViewSet,
+                    AuditLogView, CalendarFeedTokenView, calendar_feed,
+                    PaymentImportView,
+                    consultation_events)
 
 
 router = DefaultRouter()
@@ -10,11 +15,26 @@ router.register(
     r'consultations',
     ConsultationViewSet,
     basename='consultations')
+router.register(
+    r'consultation-series',
+    ConsultationSeriesViewSet,
+    basename='consultation-series')
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomTokenObtainView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
     path('protected/', ProtectedView.as_view(), name='protected'),
+    path('users/import/', UserImportView.as_view(), name='user_import'),
+    path('payments/import/', PaymentImportView.as_view(),
+         name='payment_import'),
+    path('admission/', AdmissionStatusView.as_view(), name='admission_status'),
+    path('audit/', AuditLogView.as_view(), name='audit_log'),
+    path('calendar/', CalendarFeedTokenView.as_view(),
+         name='calendar_feed_token'),
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar_feed'),
+    path('consultations/events/', consultation_events,
+         name='consultation_events'),
     path('', include(router.urls)),
 ]
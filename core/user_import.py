@@ -0,0 +1,220 @@
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+
+from .csv_import import RowError
+from .hashers import make_passwords, password_pool
+from .models import (Clinic, DoctorProfile, PatientProfile, Specialization,
+                     User)
+
+ROLES = {role for role, _ in User.ROLE_CHOICES}
+USER_FIELDS = ("email", "first_name", "last_name", "middle_name")
+
+
+def _text(row, field, default=""):
+    value = row.get(field)
+    if value is None or value == "":
+        return default
+    if isinstance(value, (dict, list, bool)):
+        raise RowError(f"{field} должен быть строкой.")
+    return str(value).strip()
+
+
+def _validate(model, field, value):
+    # Ограничения полей модели (длина, формат username и email) —
+    # иначе одна строка уронила бы вставку всей порции.
+    try:
+        model._meta.get_field(field).run_validators(value)
+    except ValidationError as exc:
+        raise RowError(f"{field}: {' '.join(exc.messages)}")
+
+
+def _parse_clinics(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = [item for item in value.replace(",", ";").split(";")
+                 if item.strip()]
+    try:
+        return sorted({int(item) for item in value})
+    except (TypeError, ValueError):
+        raise RowError("clinics должен быть списком ID клиник.")
+
+
+class UserImporter:
+    """Массовое создание пользователей с профилями.
+
+    Пароли хешируются в пуле процессов, а пользователи, профили и связи
+    врачей с клиниками вставляются через bulk_create порциями, каждая
+    в своей транзакции. Ошибки отдельных строк не прерывают импорт.
+    """
+
+    def __init__(self, workers=None, chunk_size=1000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.seen_usernames = set()
+        self.known_clinics = set()
+        self.specializations = {}
+
+    def run(self, rows):
+        started = time.perf_counter()
+        report = {"rows": 0, "created": 0, "errors": []}
+        numbered = enumerate(rows, start=1)
+        pool = password_pool(self.workers) if self.workers != 0 else nullcontext()
+        with pool as executor:
+            while True:
+                chunk = list(islice(numbered, self.chunk_size))
+                if not chunk:
+                    break
+                report["rows"] += len(chunk)
+                report["created"] += self._import_chunk(
+                    chunk, executor, report["errors"])
+        elapsed = time.perf_counter() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["rows"] / elapsed, 1) \
+            if elapsed else None
+        return report
+
+    def _import_chunk(self, chunk, executor, errors):
+        valid = []
+        for line, row in chunk:
+            if isinstance(row, RowError):
+                errors.append({"row": line, "username": None, "error": str(row)})
+                continue
+            if not isinstance(row, dict):
+                errors.append({"row": line, "username": None,
+                               "error": "Строка должна быть объектом."})
+                continue
+            try:
+                valid.append((line, self._clean(row)))
+            except RowError as exc:
+                errors.append({"row": line, "username": row.get("username"),
+                               "error": str(exc)})
+
+        existing = set(User.objects.filter(
+            username__in=[row["username"] for _, row in valid]
+        ).values_list("username", flat=True))
+        self._load_clinics(
+            {clinic for _, row in valid for clinic in row["clinics"]})
+        accepted = []
+        for line, row in valid:
+            error = None
+            if row["username"] in existing:
+                error = "Пользователь с таким username уже существует."
+            else:
+                missing = set(row["clinics"]) - self.known_clinics
+                if missing:
+                    error = f"Клиники не найдены: {sorted(missing)}."
+            if error:
+                errors.append({"row": line, "username": row["username"],
+                               "error": error})
+            else:
+                accepted.append((line, row))
+        if not accepted:
+            return 0
+
+        hashes = make_passwords(
+            [row["password"] for _, row in accepted], executor)
+        try:
+            with transaction.atomic():
+                self._insert(accepted, hashes)
+        except DatabaseError as exc:
+            # Специальности, созданные в откатившейся транзакции, не сохранились.
+            self.specializations.clear()
+            errors.extend({"row": line, "username": row["username"],
+                           "error": f"Порция не сохранена: {exc}"}
+                          for line, row in accepted)
+            return 0
+        return len(accepted)
+
+    def _clean(self, row):
+        username = _text(row, "username")
+        if not username:
+            raise RowError("Не указан username.")
+        if username in self.seen_usernames:
+            raise RowError("username повторяется в файле.")
+        password = row.get("password")
+        if not isinstance(password, str):
+            password = _text(row, "password")
+        if not password:
+            raise RowError("Не указан пароль.")
+        role = _text(row, "role", "patient")
+        if role not in ROLES:
+            raise RowError(f"Неизвестная роль: {role}.")
+        cleaned = {field: _text(row, field) for field in USER_FIELDS}
+        cleaned.update(
+            username=username,
+            password=password,
+            role=role,
+            specialization=_text(row, "specialization", "Не указано"),
+            clinics=_parse_clinics(row.get("clinics")) if role == "doctor" else [],
+            phone=_text(row, "phone", "Не указан"))
+        for field in ("username", *USER_FIELDS):
+            _validate(User, field, cleaned[field])
+        _validate(Specialization, "name", cleaned["specialization"])
+        _validate(PatientProfile, "phone", cleaned["phone"])
+        self.seen_usernames.add(username)
+        return cleaned
+
+    def _load_clinics(self, clinic_ids):
+        unknown = clinic_ids - self.known_clinics
+        if unknown:
+            self.known_clinics.update(Clinic.objects.filter(
+                id__in=unknown).values_list("id", flat=True))
+
+    def _specialization_ids(self, names):
+        missing = set(names) - set(self.specializations)
+        if missing:
+            Specialization.objects.bulk_create(
+                [Specialization(name=name) for name in missing],
+                ignore_conflicts=True)
+            self.specializations.update(Specialization.objects.filter(
+                name__in=missing).values_list("name", "id"))
+        return self.specializations
+
+    def _insert(self, accepted, hashes):
+        users = [
+            User(username=row["username"], password=password,
+                 role=row["role"], email=row["email"],
+                 first_name=row["first_name"], last_name=row["last_name"],
+                 middle_name=row["middle_name"] or None)
+            for (_, row), password in zip(accepted, hashes)]
+        User.objects.bulk_create(users)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list("username", "id"))
+            for user in users:
+                user.id = ids[user.username]
+
+        rows = [row for _, row in accepted]
+        specializations = self._specialization_ids(
+            row["specialization"] for row in rows if row["role"] == "doctor")
+        doctors = []
+        patients = []
+        for user, row in zip(users, rows):
+            if row["role"] == "doctor":
+                doctors.append((DoctorProfile(
+                    user=user,
+                    specialization_id=specializations[row["specialization"]]
+                ), row["clinics"]))
+            elif row["role"] == "patient":
+                patients.append(PatientProfile(
+                    user=user, phone=row["phone"],
+                    email=row["email"] or user.email))
+        DoctorProfile.objects.bulk_create([profile for profile, _ in doctors])
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(DoctorProfile.objects.filter(
+                user__in=[profile.user_id for profile, _ in doctors]
+            ).values_list("user_id", "id"))
+            for profile, _ in doctors:
+                profile.id = ids[profile.user_id]
+        PatientProfile.objects.bulk_create(patients)
+        through = DoctorProfile.clinics.through
+        through.objects.bulk_create([
+            through(doctorprofile_id=profile.id, clinic_id=clinic_id)
+            for profile, clinics in doctors
+            for clinic_id in clinics])
@@ -1,21 +1,55 @@
-from rest_framework import generics, viewsets
+import secrets
+from collections import Counter
+from rest_framework import generics, mixins, viewsets
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import (UserSerializer,
-                          CustomTokenObtainSerializer, ConsultationSerializer)
-from .models import Consultation, PatientProfile
+                          CustomTokenObtainSerializer, ConsultationSerializer,
+                          ConsultationAuditEntrySerializer,
+                          ConsultationListingSerializer,
+                          ConsultationSeriesSerializer,
+                          TokenRevokeSerializer)
+from .models import (Consultation, ConsultationAuditEntry, ConsultationListing,
+                     ConsultationSeries, ConsultationTombstone, PatientProfile)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .permissions import IsPatientOrAdmin
+from .permissions import IsAdmin, IsPatientOrAdmin
+from .signals import send_consultation_changed, snapshot
 from rest_framework.decorators import action
 from datetime import timedelta
-from django.utils.timezone import now
-from .models import DoctorProfile, Clinic, User
+from django.utils.timezone import is_naive, localdate, make_aware, now
+from .models import DoctorProfile, Clinic, Specialization, User
 from rest_framework.exceptions import ValidationError
-from django.utils.dateparse import parse_datetime
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from .events import event_stream
+from .scheduling import schedule_pending
+from .csv_import import upload_rows
+from .user_import import UserImporter
+from .payments import PaymentReconciler
+from .series import RuleError, book_series, cancel_series, reschedule_series
+from .admission import admission_controller
+from . import geo
+from .agenda import SPANS, doctor_agenda
+from .audit import audit_buffer, reset_actor, set_actor
+from .ical import feed_version, render_feed
+from . import read_model
+from .idempotency import idempotent
+from .revocation import RevocableRefreshToken
+from .sharding import (exists_anywhere, fan_out, is_sharded, locate,
+                       shard_aliases, shard_for_clinic)
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.parsers import JSONParser, MultiPartParser
 
 
 class RegisterView(generics.CreateAPIView):
@@ -26,8 +60,10 @@ class RegisterView(generics.CreateAPIView):
     def perform_create(self, serializer):
         user = serializer.save()
         if user.role == "doctor":
+            specialization, _ = Specialization.objects.get_or_create(
+                name="Не указано")
             DoctorProfile.objects.create(
-                user=user, specialization="Не указано")
+                user=user, specialization=specialization)
 
         elif user.role == "patient":
             PatientProfile.objects.create(
@@ -35,9 +71,169 @@ class RegisterView(generics.CreateAPIView):
 
 
 class CustomTokenObtainView(TokenObtainPairView):
+    """Выдача JWT через DRF: троттлинг, обработчик ошибок и схема API
+    работают как у остальных представлений.
+
+    Учётные данные проверяет authenticate(); бэкенд по умолчанию
+    (core.backends.PooledModelBackend) хеширует пароль в ограниченном
+    пуле потоков и заменяет устаревший хеш.
+    """
     serializer_class = CustomTokenObtainSerializer
 
 
+class TokenRevokeView(APIView):
+    """Отзывает refresh-токен (выход из системы)."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        serializer = TokenRevokeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            refresh = RevocableRefreshToken(serializer.validated_data["refresh"])
+        except TokenError as exc:
+            raise InvalidToken(exc.args[0])
+        refresh.blacklist()
+        return Response(status=204)
+
+
+def _import_rows(request):
+    """Строки импорта: файл ``file`` (csv/jsonl/json) или JSON-массив в
+    теле запроса. ValueError — с текстом ответа 400."""
+    upload = request.FILES.get("file")
+    if upload is not None:
+        return upload_rows(upload, request.data.get("format"))
+    if isinstance(request.data, list):
+        return request.data
+    raise ValueError("Передайте файл file или JSON-массив.")
+
+
+class UserImportView(APIView):
+    """Массовый импорт пользователей: файл ``file`` (csv/jsonl/json)
+    или JSON-массив в теле запроса."""
+    permission_classes = [IsAuthenticated, IsAdmin]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request):
+        try:
+            rows = _import_rows(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        importer = UserImporter(workers=settings.USER_IMPORT_WORKERS)
+        return Response(importer.run(rows))
+
+
+class PaymentImportView(APIView):
+    """Сверка оплат: файл ``file`` (csv/jsonl/json) или JSON-массив строк
+    с ``consultation`` и ``reference``; ?dry_run=1 — без изменений."""
+    permission_classes = [IsAuthenticated, IsAdmin]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request):
+        try:
+            rows = _import_rows(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        dry_run = request.query_params.get("dry_run", "").lower() in ("1", "true")
+        actor = set_actor(request.user.pk)
+        try:
+            return Response(PaymentReconciler(dry_run=dry_run).run(rows))
+        finally:
+            reset_actor(actor)
+
+
+class AdmissionStatusView(APIView):
+    """Запросы в работе и отказы контроля допуска в этом процессе."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(admission_controller().snapshot())
+
+
+class AuditLogView(APIView):
+    """Журнал изменений консультаций, новые записи первыми.
+
+    Фильтры ?consultation=, ?doctor=, ?patient=, ?clinic=; страницы по
+    ?before=<id> (next_before из предыдущего ответа) и ?limit= (до 500).
+    """
+    permission_classes = [IsAdmin]
+    lookups = ("consultation", "doctor", "patient", "clinic")
+
+    def get(self, request):
+        params = request.query_params
+        values = {name: params.get(name) for name in (*self.lookups, "before")}
+        limit = params.get("limit", "100")
+        if not all(value.isdigit() for value in (*values.values(), limit) if value):
+            return Response({"error": "Параметры должны быть числами."}, status=400)
+        limit = min(max(int(limit), 1), 500)
+        # Сначала дописываем то, что этот процесс ещё держит в буфере.
+        audit_buffer().flush()
+        entries = ConsultationAuditEntry.objects.order_by("-id")
+        for name in self.lookups:
+            if values[name]:
+                entries = entries.filter(**{f"{name}_id": values[name]})
+        if values["before"]:
+            entries = entries.filter(id__lt=values["before"])
+        entries = list(entries[:limit])
+        return Response({
+            "entries": ConsultationAuditEntrySerializer(entries, many=True).data,
+            "next_before": entries[-1].id if len(entries) == limit else None,
+        })
+
+
+class CalendarFeedTokenView(APIView):
+    """Адрес iCal-ленты текущего пользователя.
+
+    GET только читает адрес (url=null, пока секрета нет): предзагрузка или
+    повтор запроса не должны ломать подписанный календарь. POST выпускает
+    новый секрет — старый адрес перестаёт работать.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        token = request.user.calendar_token
+        return Response({"url": self.feed_url(request, token) if token else None})
+
+    def post(self, request):
+        user = request.user
+        user.calendar_token = secrets.token_urlsafe(32)
+        user.save(update_fields=["calendar_token"])
+        return Response({"url": self.feed_url(request, user.calendar_token)})
+
+    @staticmethod
+    def feed_url(request, token):
+        return request.build_absolute_uri(reverse("calendar_feed", args=[token]))
+
+
+def _calendar_state(request, token):
+    # condition() спрашивает ETag и Last-Modified по отдельности:
+    # агрегаты считаются один раз на запрос.
+    if not hasattr(request, "_calendar_state"):
+        user = User.objects.filter(calendar_token=token).first()
+        request._calendar_state = (
+            (user, *feed_version(user)) if user else (None, None, None))
+    return request._calendar_state
+
+
+@require_safe
+@condition(etag_func=lambda request, token: _calendar_state(request, token)[1],
+           last_modified_func=lambda request, token: _calendar_state(request, token)[2])
+def calendar_feed(request, token):
+    """iCal-лента консультаций по секретному адресу, без JWT.
+
+    Неизменившаяся лента отдаёт 304 по If-None-Match/If-Modified-Since
+    без чтения консультаций; иначе строки потоком из одного запроса.
+    """
+    user = _calendar_state(request, token)[0]
+    if user is None:
+        return JsonResponse({"error": "Календарь не найден."}, status=404)
+    response = StreamingHttpResponse(
+        render_feed(user), content_type="text/calendar; charset=utf-8")
+    response["Cache-Control"] = "private, no-cache"
+    response["Content-Disposition"] = 'inline; filename="consultations.ics"'
+    return response
+
+
 class ProtectedView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -47,13 +243,116 @@ class ProtectedView(APIView):
              "user": request.user.username})
 
 
-class ConsultationViewSet(viewsets.ModelViewSet):
+async def _stream_user(request):
+    # EventSource в браузере не умеет слать заголовки, поэтому токен
+    # можно передать и параметром ?token=.
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = (authentication.get_raw_token(header) if header
+                 else request.GET.get("token"))
+    if not raw_token:
+        return None
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def consultation_events(request):
+    """SSE-поток изменений расписания, фильтр ?doctor= и/или ?clinic=.
+
+    Работает только под ASGI (см. mis_backend/asgi.py).
+    """
+    user = await _stream_user(request)
+    if user is None:
+        return JsonResponse({"error": "Требуется авторизация."}, status=401)
+    try:
+        doctor_id, clinic_id = (
+            int(request.GET[name]) if request.GET.get(name) else None
+            for name in ("doctor", "clinic"))
+    except ValueError:
+        return JsonResponse(
+            {"error": "ID врача и клиники должны быть числами."}, status=400)
+    response = StreamingHttpResponse(
+        event_stream(doctor_id, clinic_id),
+        content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class AuditActorMixin:
+    """Записывает автора изменений консультаций в журнал (core.audit)."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._audit_actor = set_actor(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if hasattr(self, "_audit_actor"):
+            reset_actor(self._audit_actor)
+            del self._audit_actor
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ConsultationViewSet(AuditActorMixin, viewsets.ModelViewSet):
     serializer_class = ConsultationSerializer
     permission_classes = [IsAuthenticated, IsPatientOrAdmin]
     queryset = Consultation.objects.all()
     filterset_fields = ['status', 'clinic', 'doctor', 'patient']
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
 
+    def request_shard(self):
+        """Шард, к которому относится запрос, или None, если нужны все."""
+        if not is_sharded():
+            return None
+        if not hasattr(self, "_request_shard"):
+            pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+            clinic = self.request.query_params.get("clinic", "")
+            if pk is not None:
+                self._request_shard = locate(Consultation, pk)
+            elif clinic.isdigit():
+                self._request_shard = shard_for_clinic(clinic)
+            else:
+                self._request_shard = None
+        return self._request_shard
+
+    # Список, поиск и выгрузка читают модель чтения (core.read_model):
+    # одна таблица в базе-справочнике вместо соединений и обхода шардов.
+    read_model_actions = ("list", "export")
+
+    def get_queryset(self):
+        if self.action in self.read_model_actions:
+            queryset = ConsultationListing.objects.all()
+            text = self.request.query_params.get("search", "")
+            return read_model.search(queryset, text) if text else queryset
+        queryset = super().get_queryset()
+        shard = self.request_shard()
+        return queryset.using(shard) if shard else queryset
+
+    def get_serializer_class(self):
+        if self.action in self.read_model_actions:
+            return ConsultationListingSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """CSV со списком консультаций; фильтры и ?search= как у списка."""
+        if request.user.role != "admin":
+            return Response(
+                {"error": "Выгрузка доступна только администратору."},
+                status=403)
+        response = StreamingHttpResponse(
+            read_model.export_csv(self.filter_queryset(self.get_queryset())),
+            content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = 'attachment; filename="consultations.csv"'
+        return response
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def destroy(self, request, *args, **kwargs):
         consultation = self.get_object()
         if request.user.role != "admin":
@@ -84,20 +383,37 @@ class ConsultationViewSet(viewsets.ModelViewSet):
         if not doctor.doctor_profile.clinics.filter(id=clinic.id).exists():
             raise ValidationError("Этот врач не работает в выбранной клинике.")
         end_time = start_time + timedelta(hours=1)
-        serializer.save(
+        consultation = serializer.save(
             patient=user,
             end_time=end_time,
             status="ожидает",
             clinic=clinic,
             doctor=doctor)
+        send_consultation_changed("created", [snapshot(consultation)],
+                                  using=consultation._state.db)
+
+    def perform_update(self, serializer):
+        previous = snapshot(serializer.instance)
+        consultation = serializer.save()
+        row = dict(snapshot(consultation), previous_status=previous["status"])
+        changed = {field for field, value in previous.items() if row[field] != value}
+        if previous["doctor_id"] != consultation.doctor_id:
+            row["previous_doctor_id"] = previous["doctor_id"]
+        send_consultation_changed(
+            "status" if changed == {"status"} else "rescheduled", [row],
+            using=consultation._state.db)
 
     @action(detail=False, methods=["get"])
     def specializations(self, request):
-        specializations = DoctorProfile.objects.values_list(
-            "specialization", flat=True).distinct()
+        # Как и до справочника, в списке только специальности, по которым
+        # есть врачи: записаться по пустой специальности нельзя.
+        specializations = Specialization.objects.filter(
+            doctors__isnull=False).distinct().order_by(
+            "name").values_list("name", flat=True)
         return Response({"specializations": list(specializations)})
 
     @action(detail=True, methods=["patch"])
+    @idempotent
     def set_schedule(self, request, pk=None):
         consultation = self.get_object()
         if request.user.role != "admin":
@@ -114,20 +430,21 @@ class ConsultationViewSet(viewsets.ModelViewSet):
                 {"error": "Неверный формат даты. Используйте ISO 8601."},
                 status=400)
         end_time = start_time + timedelta(hours=1)
+        previous_status = consultation.status
 
-        overlapping_consultations = Consultation.objects.filter(
+        overlapping_consultations = exists_anywhere(Consultation.objects.filter(
             doctor=consultation.doctor,
             start_time__lt=end_time,
             end_time__gt=start_time
-        ).exists()
+        ))
         if overlapping_consultations:
             return Response(
                 {"error": "Этот врач уже занят в это время!"}, status=400)
 
-        clinic_conflict = Consultation.objects.filter(
+        clinic_conflict = exists_anywhere(Consultation.objects.filter(
             doctor=consultation.doctor,
             start_time__date=start_time.date()
-        ).exclude(clinic=consultation.clinic).exists()
+        ).exclude(clinic=consultation.clinic))
         if clinic_conflict:
             return Response(
                 {
@@ -138,6 +455,10 @@ class ConsultationViewSet(viewsets.ModelViewSet):
         consultation.end_time = end_time
         consultation.status = "подтверждена"
         consultation.save()
+        send_consultation_changed(
+            "rescheduled",
+            [dict(snapshot(consultation), previous_status=previous_status)],
+            using=consultation._state.db)
         return Response(
             {"message": "Время консультации назначено, статус обновлён."},
             status=200)
@@ -145,23 +466,113 @@ class ConsultationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["patch"])
     def update_status(self, request):
         now_time = now()
-        Consultation.objects.filter(
-            status="подтверждена",
-            start_time__lte=now_time).update(
-            status="начата")
-        Consultation.objects.filter(
-            status="начата",
-            end_time__lte=now_time).update(
-            status="завершена")
+        for alias in shard_aliases():
+            Consultation.objects.using(alias).filter(
+                status="подтверждена",
+                start_time__lte=now_time).transition("начата")
+            Consultation.objects.using(alias).filter(
+                status="начата",
+                end_time__lte=now_time).transition("завершена")
         return Response({"message": "Статусы обновлены."}, status=200)
 
+    @action(detail=False, methods=["patch"])
+    def auto_schedule(self, request):
+        if request.user.role != "admin":
+            return Response(
+                {"error": "Только администратор распределяет заявки."},
+                status=403)
+        date_from = parse_date(str(request.data.get("date_from", "")))
+        date_to = parse_date(str(request.data.get("date_to", "")))
+        if not date_from or not date_to or date_from > date_to:
+            return Response(
+                {"error": "Укажите период date_from/date_to (YYYY-MM-DD)."},
+                status=400)
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true")
+        return Response(schedule_pending(date_from, date_to, dry_run=dry_run))
+
+    @action(detail=False, methods=["get"])
+    def agenda(self, request):
+        """Расписание врача за день (?range=day) или неделю (?range=week)
+        с даты ?date=; врач видит своё, администратор — любого ?doctor=."""
+        span = request.query_params.get("range", "day")
+        if span not in SPANS:
+            return Response(
+                {"error": "range должен быть day или week."}, status=400)
+        day = request.query_params.get("date")
+        try:
+            day = parse_date(day) if day else localdate()
+        except ValueError:
+            day = None
+        if not day:
+            return Response(
+                {"error": "Неверный формат даты. Используйте YYYY-MM-DD."},
+                status=400)
+        if request.user.role == "doctor":
+            doctor_id = request.user.id
+        elif request.user.role == "admin":
+            doctor_id = request.query_params.get("doctor", "")
+            if not doctor_id.isdigit():
+                return Response({"error": "Укажите ID врача."}, status=400)
+            doctor_id = int(doctor_id)
+        else:
+            return Response(
+                {"error": "Расписание доступно врачу и администратору."},
+                status=403)
+        return Response(doctor_agenda(doctor_id, day, span))
+
+    @action(detail=False, methods=["get"])
+    def sync(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        tombstones = ConsultationTombstone.objects.all()
+        for field in ("doctor", "patient", "clinic"):
+            value = request.query_params.get(field)
+            if value:
+                tombstones = tombstones.filter(**{f"{field}_id": value})
+
+        now_time = now()
+        since = request.query_params.get("since")
+        since_time = None
+        if since:
+            try:
+                since_time = parse_datetime(since)
+            except ValueError:
+                since_time = None
+            if not since_time:
+                return Response(
+                    {"error": "Неверный формат курсора. Используйте ISO 8601."},
+                    status=400)
+            if is_naive(since_time):
+                since_time = make_aware(since_time)
+            if since_time < now_time - settings.SYNC_TOMBSTONE_RETENTION:
+                # Надгробия старше срока хранения удалены — нужен полный снимок.
+                since_time = None
+        reset = since_time is None
+        if not reset:
+            queryset = queryset.filter(updated_at__gt=since_time)
+            tombstones = tombstones.filter(deleted_at__gt=since_time)
+
+        # Курсор отстаёт от текущего времени, чтобы не потерять транзакции,
+        # зафиксированные позже, чем был выставлен их updated_at.
+        cursor = now_time - settings.SYNC_CURSOR_OVERLAP
+        if since_time and since_time > cursor:
+            cursor = since_time
+        return Response({
+            "cursor": cursor.isoformat(),
+            "reset": reset,
+            "changed": self.get_serializer(fan_out(queryset), many=True).data,
+            "deleted": [] if reset else fan_out(
+                tombstones.values_list("consultation_id", flat=True)),
+        })
+
     @action(detail=False, methods=["get"])
     def clinics_by_specialization(self, request):
         specialization = request.query_params.get("specialization", None)
         if not specialization:
             return Response({"error": "Укажите специальность."}, status=400)
         clinics = Clinic.objects.filter(
-            doctors__specialization=specialization).distinct()
+            doctors__specialization__name=specialization).distinct()
+        if "lat" in request.query_params or "lon" in request.query_params:
+            return self._nearest_clinics(request, clinics)
         return Response(
             {
                 "clinics": [
@@ -172,6 +583,32 @@ class ConsultationViewSet(viewsets.ModelViewSet):
                     for clinic in clinics]
             })
 
+    def _nearest_clinics(self, request, clinics):
+        try:
+            latitude = float(request.query_params.get("lat", ""))
+            longitude = float(request.query_params.get("lon", ""))
+            limit = int(request.query_params.get("limit", 5))
+        except ValueError:
+            return Response(
+                {"error": "lat, lon и limit должны быть числами."}, status=400)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response(
+                {"error": "Координаты вне допустимого диапазона."}, status=400)
+        if not 1 <= limit <= 50:
+            return Response(
+                {"error": "limit должен быть от 1 до 50."}, status=400)
+        return Response({
+            "clinics": [
+                {
+                    "id": clinic.id,
+                    "name": clinic.name,
+                    "physical_address": clinic.physical_address,
+                    "distance_km": round(distance, 2)
+                }
+                for clinic, distance in geo.nearest(
+                    clinics, latitude, longitude, limit)]
+        })
+
     @action(detail=False, methods=["get"])
     def doctors_by_clinic(self, request):
         specialization = request.query_params.get("specialization", None)
@@ -180,7 +617,7 @@ class ConsultationViewSet(viewsets.ModelViewSet):
             return Response({"error": "Укажите специальность и ID клиники."},
                             status=400)
         doctors = DoctorProfile.objects.filter(
-            specialization=specialization, clinics__id=clinic_id
+            specialization__name=specialization, clinics__id=clinic_id
         ).select_related("user")
         return Response([
             {
@@ -197,12 +634,15 @@ class ConsultationViewSet(viewsets.ModelViewSet):
         doctor = User.objects.get(id=doctor_id)
         available_dates = []
         today = now().date()
+        # Одним запросом на шард вместо запроса на каждый день.
+        busy = Counter(fan_out(Consultation.objects.filter(
+            doctor=doctor,
+            start_time__date__gte=today + timedelta(days=1),
+            start_time__date__lt=today + timedelta(days=14),
+        ).values_list("start_time__date", flat=True)))
         for i in range(1, 14):
             check_date = today + timedelta(days=i)
-            busy_slots = Consultation.objects.filter(
-                doctor=doctor,
-                start_time__date=check_date
-            ).count()
+            busy_slots = busy[check_date]
             if busy_slots < 8:
                 available_dates.append(str(check_date))
             if len(available_dates) >= 3:
@@ -210,6 +650,7 @@ class ConsultationViewSet(viewsets.ModelViewSet):
         return Response({"available_dates": available_dates})
 
     @action(detail=True, methods=["patch"])
+    @idempotent
     def set_paid_status(self, request, pk=None):
         consultation = self.get_object()
         if request.user.role != "admin":
@@ -225,4 +666,81 @@ class ConsultationViewSet(viewsets.ModelViewSet):
             )
         consultation.status = "оплачена"
         consultation.save()
+        send_consultation_changed(
+            "status",
+            [dict(snapshot(consultation), previous_status="завершена")],
+            using=consultation._state.db)
         return Response({"message": "Статус консультации обновлён: оплачена."})
+
+
+class ConsultationSeriesViewSet(AuditActorMixin, mixins.CreateModelMixin,
+                                mixins.RetrieveModelMixin,
+                                mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Серии повторяющихся консультаций.
+
+    Пациент создаёт серию по правилу RRULE (?dry_run=1 — только отчёт о
+    повторениях), администратор переносит её, пациент или администратор
+    отменяет оставшиеся повторения.
+    """
+    serializer_class = ConsultationSeriesSerializer
+    permission_classes = [IsAuthenticated, IsPatientOrAdmin]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = ConsultationSeries.objects.order_by("-id")
+        if user.role == "admin":
+            return queryset
+        return queryset.filter(Q(patient=user) | Q(doctor=user))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        dry_run = request.query_params.get("dry_run", "").lower() in ("1", "true")
+        try:
+            series, occurrences = book_series(
+                request.user, data["doctor"], data["clinic"],
+                data["start_time"], data["rule"], dry_run=dry_run)
+        except RuleError as exc:
+            return Response({"error": str(exc)}, status=400)
+        body = {"series": self.get_serializer(series).data if series else None,
+                "occurrences": occurrences}
+        if series is None and not dry_run:
+            body["error"] = "Ни одно повторение серии не свободно."
+            return Response(body, status=400)
+        return Response(body, status=201 if series else 200)
+
+    @action(detail=True, methods=["patch"])
+    def reschedule(self, request, pk=None):
+        series = self.get_object()
+        if series.cancelled_at:
+            return Response({"error": "Серия отменена."}, status=400)
+        try:
+            start_time = parse_datetime(str(request.data.get("start_time", "")))
+        except ValueError:
+            start_time = None
+        if not start_time:
+            return Response(
+                {"error": "Неверный формат даты. Используйте ISO 8601."},
+                status=400)
+        if is_naive(start_time):
+            start_time = make_aware(start_time)
+        moved, occurrences = reschedule_series(series, start_time)
+        if not occurrences:
+            return Response(
+                {"error": "В серии нет предстоящих консультаций."}, status=400)
+        if not moved:
+            return Response(
+                {"error": "Серию нельзя перенести: есть конфликты.",
+                 "occurrences": occurrences}, status=400)
+        return Response({"occurrences": occurrences})
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def cancel(self, request, pk=None):
+        series = self.get_object()
+        if request.user.role != "admin" and series.patient_id != request.user.id:
+            return Response(
+                {"error": "Отменить серию может пациент или администратор."},
+                status=403)
+        return Response({"cancelled": cancel_series(series)})
@@ -0,0 +1,17 @@
+"""Настройки gunicorn (читаются из текущего каталога автоматически).
+
+С preload_app приложение загружается в мастер-процессе один раз, и
+новые воркеры при автомасштабировании получают его через fork уже
+готовым. Всё, что привязано к процессу (соединения с БД, фоновые потоки
+и пулы, счётчики), создаётся в воркере лениво; post_fork закрывает то,
+что могло открыться в мастере.
+"""
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+
+def post_fork(server, worker):
+    from django.db import connections
+
+    connections.close_all()
@@ -3,6 +3,11 @@ ASGI config for mis_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The consultation event stream (``/api/consultations/events/``) is an async
+view that keeps connections open, so serve it with an ASGI server, e.g.::
+
+    uvicorn mis_backend.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -14,3 +19,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mis_backend.settings')
 
 application = get_asgi_application()
+
+# URLconf и представления загружаются при запуске, а не на первом запросе.
+from core.startup import warm_up  # noqa: E402
+
+warm_up()
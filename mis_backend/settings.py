@@ -21,18 +21,19 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'core',
     'django_filters',
-    'drf_spectacular',
     'rest_framework',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'mis_backend.urls'
@@ -57,11 +58,27 @@ WSGI_APPLICATION = 'mis_backend.wsgi.application'
 
 
 env = environ.Env()
-environ.Env.read_env()
+# Явный путь: без него read_env ищет .env рядом с вызывающим модулем
+# через разбор стека.
+environ.Env.read_env(Path(__file__).resolve().parent / '.env')
 DATABASES = {
     'default': env.db(),
 }
 
+# Шарды консультаций: базы из CONSULTATION_SHARD_URLS (через запятую)
+# получают алиасы shard_1, shard_2, … Порядок алиасов задаёт диапазоны
+# ID консультаций, поэтому новые шарды добавляются только в конец.
+for index, url in enumerate(env.list('CONSULTATION_SHARD_URLS', default=[]), 1):
+    DATABASES[f'shard_{index}'] = env.db_url_config(url)
+CONSULTATION_SHARDS = list(DATABASES)
+CONSULTATION_SHARD_ID_STRIDE = 10 ** 12
+CONSULTATION_SHARD_DIRECTORY_TTL = 60
+DATABASE_ROUTERS = ['core.sharding.ClinicShardRouter']
+
+# Кеш агенды врачей. Поколения агенды должны быть общими для всех
+# воркеров, поэтому в продакшене нужен CACHE_URL=redis://host:6379/1.
+CACHES = {'default': env.cache('CACHE_URL', default='locmemcache://')}
+
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', default=False)
 
@@ -85,6 +102,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Вход проверяет пароль в ограниченном пуле потоков (core.backends).
+AUTHENTICATION_BACKENDS = ['core.backends.PooledModelBackend']
+
+# Хеширование паролей. PASSWORD_HASHER=argon2 делает основным Argon2 с
+# параметрами ARGON2_*; старые хеши перехешируются при следующем входе.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'core.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if env('PASSWORD_HASHER', default='pbkdf2') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+ARGON2_TIME_COST = env.int('ARGON2_TIME_COST', default=2)
+ARGON2_MEMORY_COST = env.int('ARGON2_MEMORY_COST', default=19456)  # KiB
+ARGON2_PARALLELISM = env.int('ARGON2_PARALLELISM', default=1)
+# Потоков для проверки паролей в /api/login/ на процесс.
+LOGIN_HASHING_WORKERS = env.int('LOGIN_HASHING_WORKERS', default=os.cpu_count())
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -110,18 +147,120 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Схема OpenAPI и Swagger UI (/api/schema/, /api/docs/). В продакшене их
+# можно выключить (API_DOCS_ENABLED=false): воркер не загружает
+# drf_spectacular и его зависимости.
+API_DOCS_ENABLED = env.bool('API_DOCS_ENABLED', default=True)
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_spectacular')
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
     'SIGNING_KEY': SECRET_KEY,
+    'TOKEN_REFRESH_SERIALIZER':
+        'core.serializers.RevocableTokenRefreshSerializer',
 }
 
+# Отзыв refresh-токенов: фильтр Блума в памяти каждого воркера.
+REVOCATION_FILTER_CAPACITY = 100000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+REVOCATION_FILTER_REFRESH_SECONDS = 5
+REVOCATION_FILTER_REBUILD_SECONDS = 3600
+REVOCATION_FILTER_OVERLAP = timedelta(minutes=1)
+
 AUTH_USER_MODEL = 'core.User'
 TEST_RUNNER = "pytest_django.runner.DiscoverRunner"
 
+# Синхронизация изменений консультаций (GET /api/consultations/sync/)
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+# Поток событий расписания (GET /api/consultations/events/, только ASGI).
+# Для нескольких воркеров: CONSULTATION_EVENTS_BACKEND=core.events.RedisBroker
+CONSULTATION_EVENTS_BACKEND = env(
+    'CONSULTATION_EVENTS_BACKEND', default='core.events.LocalBroker')
+CONSULTATION_EVENTS_REDIS_URL = env(
+    'CONSULTATION_EVENTS_REDIS_URL', default='redis://localhost:6379/0')
+CONSULTATION_EVENTS_HEARTBEAT = 15
+
+# Рабочий день врача для автоматического распределения заявок (часы).
+SCHEDULING_WORKDAY_START = 9
+SCHEDULING_WORKDAY_END = 17
+
+# Число процессов для хеширования паролей при массовом импорте
+# (None — по числу ядер, 0 — хешировать в текущем процессе).
+USER_IMPORT_WORKERS = env.int('USER_IMPORT_WORKERS', default=None)
+
+# Профилирование запросов (core.middleware.RequestProfilingMiddleware):
+# доля случайно профилируемых запросов, заголовок (ключ request.META),
+# по которому профилируется запрос администратора, и каталог для дампов.
+REQUEST_PROFILING_SAMPLE_RATE = env.float(
+    'REQUEST_PROFILING_SAMPLE_RATE', default=0.0)
+REQUEST_PROFILING_HEADER = 'HTTP_X_PROFILE'
+REQUEST_PROFILING_DIR = env(
+    'REQUEST_PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Контроль допуска (core.middleware.AdmissionControlMiddleware).
+# CAPACITY — одновременных запросов на процесс (gunicorn --threads);
+# класс допускается, пока в работе меньше CAPACITY * share запросов
+# (share=None — всегда), и ждёт места не дольше queue_timeout секунд;
+# ждать одновременно могут не больше max_queue запросов класса.
+ADMISSION_CONTROL = {
+    'CAPACITY': env.int('ADMISSION_CAPACITY', default=8),
+    'DEFAULT_CLASS': 'default',
+    'CLASSES': {
+        'critical': {'share': None, 'queue_timeout': 0, 'retry_after': 1},
+        'default': {'share': 1.0, 'queue_timeout': 0.5, 'max_queue': 2,
+                    'retry_after': 1},
+        'browse': {'share': 0.5, 'queue_timeout': 0.1, 'max_queue': 1,
+                   'retry_after': 2},
+    },
+    # Имя URL или "имя МЕТОД": (класс, лимит эндпоинта или None).
+    'ENDPOINTS': {
+        'consultations-list POST': ('critical', None),
+        'consultations-set-schedule': ('critical', None),
+        'consultations-set-paid-status': ('critical', None),
+        'consultations-list GET': ('browse', 4),
+        'consultations-available-dates': ('browse', 4),
+        'consultations-clinics-by-specialization': ('browse', 2),
+        'consultations-doctors-by-clinic': ('browse', 2),
+        'calendar_feed': ('browse', 4),
+        'consultations-export': ('browse', 1),
+    },
+}
+
+# Сколько хранится ответ для повтора запроса с тем же Idempotency-Key.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Через сколько незавершённый запрос с ключом считается оборванным
+# (воркер убит, соединение потеряно) и повтор может выполнить его заново.
+# Должно быть больше самого долгого запроса.
+IDEMPOTENCY_CLAIM_LEASE = timedelta(seconds=60)
+
+# Сколько агенда врача хранится в кеше; после записи в консультации
+# врача она перестраивается сразу (см. core.agenda).
+AGENDA_CACHE_TTL = 300
+
+# iCal-лента консультаций (core.ical): прошедшие консультации остаются
+# в ленте столько дней.
+CALENDAR_FEED_PAST_DAYS = 30
+
+# Наибольшее число повторений в серии консультаций (core.series).
+CONSULTATION_SERIES_MAX_OCCURRENCES = 52
+
+# Журнал изменений консультаций (core.audit): строки пишутся пачками по
+# AUDIT_LOG_BATCH_SIZE не реже раза в AUDIT_LOG_FLUSH_INTERVAL секунд;
+# при сбое процесса теряется не больше этого интервала изменений, в
+# памяти ждут записи не больше AUDIT_LOG_MAX_PENDING строк.
+AUDIT_LOG_BATCH_SIZE = 500
+AUDIT_LOG_FLUSH_INTERVAL = env.float('AUDIT_LOG_FLUSH_INTERVAL', default=1.0)
+AUDIT_LOG_MAX_PENDING = 10000
 
+# Бюджет холодного старта воркера до первого ответа, секунды
+# (manage.py startup_report --check и core/tests/test_startup.py).
+STARTUP_TIME_BUDGET = env.float('STARTUP_TIME_BUDGET', default=3.0)
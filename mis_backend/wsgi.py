@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mis_backend.settings')
 
 application = get_wsgi_application()
+
+# URLconf и представления загружаются при запуске, а не на первом запросе.
+from core.startup import warm_up  # noqa: E402
+
+warm_up()